@@ -10,14 +10,19 @@ This script handles:
 - Exporting data to CSV file
 
 Usage:
-    python products_scraper.py <URL> [--output output.csv] [--max-pages 10]
+    python products_scraper.py <URL> [--output output.csv] [--max-pages 10] [--workers 4]
 """
 
 import argparse
 import csv
 import logging
+import os
+import socket
 import time
-from typing import List, Dict, Optional
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Callable, List, Dict, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 import sys
 
@@ -33,6 +38,51 @@ try:
         StaleElementReferenceException
     )
     from bs4 import BeautifulSoup
+    from scraper_pool import DriverPool
+    from scraper_fetch import (
+        HttpFetcher,
+        FetchStrategySelector,
+        REQUESTS_INSTALLED,
+        STRATEGIES,
+        STRATEGY_BROWSER,
+        is_complete,
+    )
+    from scraper_async import AsyncFetchEngine, AIOHTTP_INSTALLED
+    from scraper_wait import PageWaiter, SiteTimings
+    from scraper_extract import (
+        CompiledExtractor,
+        DESCRIPTION_LIMIT,
+        FIELD_SELECTORS,
+        PRICE_SELECTORS,
+        TITLE_SELECTORS,
+    )
+    from scraper_structured import STRUCTURED_ONLY_FIELDS, extract_structured_data
+    from scraper_sinks import (
+        PSYCOPG2_INSTALLED, PYARROW_INSTALLED, ParquetSink, ProductSink, is_database_url, open_sink,
+        sink_class, sink_extension,
+    )
+    from scraper_state import CrawlStateStore
+    from scraper_cache import CachedPage, PageCache
+    from scraper_delta import DELTA_FIELDS, IncrementalCrawl, content_fingerprint
+    from scraper_pagination import PageTemplate, find_next_link, learn_template
+    from scraper_network import EndpointParser, NetworkCapture, PerformanceLog, enable_network_capture, find_paginated_endpoint
+    from scraper_sitemap import SitemapReader
+    from scraper_classify import UrlClassifier
+    from scraper_ratelimit import HostRateLimiter
+    from scraper_retry import (
+        CircuitBreaker,
+        ExtractionMiss,
+        HostUnavailable,
+        RetryPolicy,
+        RetryScheduler,
+        classify_error,
+        is_driver_crash,
+    )
+    from scraper_queue import SqliteWorkQueue, WorkQueue
+    from scraper_urls import CanonicalRules, CompactHashSet, UrlCanonicalizer, UrlFrontier, canonical_link, load_rules, url_hash
+    from scraper_harvest import HARVEST_COUNTER, LinkHarvester
+    from scraper_inpage import InPageExtractor
+    from scraper_resources import DEFAULT_BLOCK_TYPES, RESOURCE_PATTERNS, TRACKER_DOMAINS, ResourcePolicy
     DEPENDENCIES_INSTALLED = True
 except ImportError as e:
     DEPENDENCIES_INSTALLED = False
@@ -55,11 +105,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Common selectors for product links on listing pages
+PRODUCT_LINK_SELECTORS = [
+    'a[href*="/product"]',
+    'a[href*="/products"]',
+    'a[class*="product"]',
+    '.product a',
+    '.product-item a',
+    '.product-card a',
+    'article a',
+    '[data-product] a',
+]
+
 
 class ProductsScraper:
     """Web scraper for extracting product information from e-commerce websites"""
     
-    def __init__(self, base_url: str, headless: bool = True, timeout: int = 10):
+    def __init__(
+        self,
+        base_url: str,
+        headless: bool = True,
+        timeout: int = 10,
+        fetch_strategy: str = 'auto',
+        load_more_endpoint: bool = False,
+        resource_policy: Optional['ResourcePolicy'] = None,
+        in_page_extraction: bool = False,
+        url_rules: Optional[Dict[str, 'CanonicalRules']] = None,
+        rate_limiter: Optional['HostRateLimiter'] = None,
+        retry_policy: Optional['RetryPolicy'] = None,
+    ):
         """
         Initialize the scraper
         
@@ -67,6 +143,30 @@ class ProductsScraper:
             base_url: The starting URL to scrape
             headless: Whether to run browser in headless mode
             timeout: Default timeout for waiting for elements
+            fetch_strategy: How product pages are fetched: 'auto' tries plain
+                HTTP first and remembers per domain whether a browser is
+                needed, 'http' never uses the browser for product pages,
+                'browser' always renders them in Chrome
+            load_more_endpoint: Record the browser's network traffic while
+                "Load More" is clicked and, once the endpoint behind the
+                button is known, call it directly instead of clicking
+            resource_policy: Resource types and domains the browser does not
+                download, and the page load strategy (default: download
+                everything)
+            in_page_extraction: Resolve product fields and listing links
+                with one script inside the browser instead of transferring
+                and parsing page_source
+            url_rules: Per-site URL canonicalization rules by host (see
+                scraper_urls.load_rules); tracking and variant parameters,
+                fragments and trailing slashes are always removed
+            rate_limiter: Per-host request pacing shared by the HTTP, async
+                and browser fetches (default: HostRateLimiter()); unless it
+                has its own robots_fetcher, each host's robots.txt is read
+                with the scraper's HTTP session for its Crawl-delay
+            retry_policy: How failed product pages are retried (default:
+                RetryPolicy(), three attempts with jittered exponential
+                backoff); hosts that keep failing are paused by a circuit
+                breaker
         """
         if not DEPENDENCIES_INSTALLED:
             raise ImportError(
@@ -75,44 +175,156 @@ class ProductsScraper:
             )
         
         self.base_url = base_url
+        self.headless = headless
         self.timeout = timeout
-        self.product_urls = set()
+        self.canonicalizer = UrlCanonicalizer(url_rules)
+        self.product_urls = UrlFrontier(self.canonicalizer)
         self.products_data = []
+        self.products_scraped = 0
+        self.sink = None
+        self.state = None
+        self.page_cache = None
+        self.incremental = None
+        self.work_queue = None
+        self._fingerprints: Dict[str, str] = {}
+        self._emitted_early: set = set()
+        # rel=canonical of parsed pages, and hashes of the products emitted
+        self._canonicals: Dict[str, str] = {}
+        self._claimed = CompactHashSet()
+        self.dedup_counts = {'aliases_skipped': 0, 'duplicates': 0}
+        self._unsynced: List[Tuple[str, Optional[str], Dict]] = []
+        
+        if not REQUESTS_INSTALLED and fetch_strategy != STRATEGY_BROWSER:
+            logger.warning("requests is not installed - product pages will be rendered in the browser")
+            fetch_strategy = STRATEGY_BROWSER
+        
+        self.fetch_strategies = FetchStrategySelector(fetch_strategy)
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        if self.rate_limiter.robots_fetcher is None and REQUESTS_INSTALLED:
+            self.rate_limiter.robots_fetcher = self._read_robots_txt
+        # Also used in browser mode to revalidate cached pages
+        self.http_fetcher = HttpFetcher(
+            user_agent=USER_AGENT, timeout=timeout, limiter=self.rate_limiter
+        ) if REQUESTS_INSTALLED else None
+        
+        self.extractor = CompiledExtractor()
+        self.in_page = InPageExtractor(FIELD_SELECTORS, PRODUCT_LINK_SELECTORS) if in_page_extraction else None
+        self.harvester = LinkHarvester(PRODUCT_LINK_SELECTORS)
+        self.classifier = UrlClassifier()
+        self.timings = SiteTimings(default_timeout=timeout)
+        self.waiter = PageWaiter(self.timings)
+        self.resource_policy = resource_policy
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = CircuitBreaker()
+        
+        self.driver = self._create_driver(capture_network=load_more_endpoint)
+        self._share_performance_log(capture_network=load_more_endpoint)
+        self.wait = WebDriverWait(self.driver, self.timeout)
+        
+        logger.info(f"Initialized scraper for {base_url}")
+    
+    def _create_driver(self, capture_network: bool = False):
+        """
+        Create a new Chrome WebDriver session
         
-        # Setup Chrome driver
+        Args:
+            capture_network: Record Network events in the performance log
+            
+        Returns:
+            Configured Chrome WebDriver instance
+        """
         chrome_options = Options()
-        if headless:
+        if self.headless:
             chrome_options.add_argument('--headless')
             chrome_options.add_argument('--no-sandbox')
             chrome_options.add_argument('--disable-dev-shm-usage')
         
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        chrome_options.add_argument(f'user-agent={USER_AGENT}')
+        if capture_network:
+            enable_network_capture(chrome_options)
+        if self.resource_policy is not None:
+            self.resource_policy.apply_to_options(chrome_options)
         
-        self.driver = webdriver.Chrome(options=chrome_options)
+        driver = webdriver.Chrome(options=chrome_options)
+        if self.resource_policy is not None:
+            self.resource_policy.install(driver)
+        return driver
+    
+    def _restart_driver(self) -> None:
+        """Replace a crashed browser session"""
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error closing crashed browser: {e}")
+        capture_network = self.network_capture is not None
+        self.driver = self._create_driver(capture_network=capture_network)
+        self._share_performance_log(capture_network)
         self.wait = WebDriverWait(self.driver, self.timeout)
+    
+    def _share_performance_log(self, capture_network: bool) -> None:
+        """
+        Give the main session's performance log one reader
         
-        logger.info(f"Initialized scraper for {base_url}")
+        Reading the log clears it, so the "Load More" capture and the
+        resource counters share the reader and both see every entry.
+        
+        Args:
+            capture_network: Whether "Load More" requests are captured
+        """
+        self.performance_log = PerformanceLog(self.driver)
+        self.network_capture = NetworkCapture(self.driver, self.performance_log) if capture_network else None
+        if self.resource_policy is not None:
+            self.resource_policy.listen(self.performance_log)
+    
+    def _read_performance_log(self, driver) -> None:
+        """Count the traffic of the pages a session loaded and keep its log from piling up"""
+        if driver is not self.driver:
+            if self.resource_policy is not None:
+                self.resource_policy.collect(driver)
+        elif self.network_capture is not None or self.resource_policy is not None:
+            self.performance_log.read()
     
     def __del__(self):
         """Cleanup - close browser"""
         if hasattr(self, 'driver'):
             self.driver.quit()
     
-    def scroll_and_load_more(self, max_attempts: int = 50) -> None:
+    def scroll_and_load_more(self, max_attempts: int = 50, concurrency: int = 4) -> bool:
         """
         Scroll page and click 'Load More' button if present
         
+        Product links are harvested after every click from the nodes the
+        click added, so a click costs the same however long the page has
+        grown, and clicking stops as soon as a click adds no new products.
+        
+        With load_more_endpoint enabled, the requests made by the first two
+        clicks are read from the performance log. If they reveal a paginated
+        JSON or HTML endpoint, the remaining pages are requested from it
+        directly, several at a time, and the clicking stops.
+        
         Args:
             max_attempts: Maximum number of times to click "Load More"
+            concurrency: Endpoint pages requested at the same time
+            
+        Returns:
+            True if the product links were harvested while loading, False
+            if the loaded page still has to be parsed for them
         """
         logger.info("Starting to load all products...")
         attempts = 0
+        harvesting = self._harvest_product_urls() is not None
+        product_selector = HARVEST_COUNTER if harvesting else ', '.join(PRODUCT_LINK_SELECTORS)
+        
+        capture = self.network_capture if self.http_fetcher is not None else None
+        rounds: List = []
+        if capture is not None:
+            capture.discard()
         
         while attempts < max_attempts:
             # Scroll to bottom
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)  # Wait for content to load
+            self.waiter.wait_for_quiet(self.driver, 'scroll')  # Wait for lazy content to load
             
             # Try to find and click "Load More" button
             load_more_selectors = [
@@ -130,11 +342,14 @@ class ProductsScraper:
                     button = self.driver.find_element(By.XPATH, selector)
                     if button.is_displayed() and button.is_enabled():
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", button)
-                        time.sleep(1)
+                        before = self.waiter.count(self.driver, product_selector)
                         button.click()
                         logger.info(f"Clicked 'Load More' button (attempt {attempts + 1})")
                         button_found = True
-                        time.sleep(3)  # Wait for new content to load
+                        # Wait for new content to load
+                        after = self.waiter.wait_for_growth(self.driver, 'load_more', product_selector, before)
+                        if after <= before:
+                            logger.info("No new products appeared after clicking 'Load More'")
                         break
                 except (NoSuchElementException, StaleElementReferenceException):
                     continue
@@ -147,19 +362,73 @@ class ProductsScraper:
                 break
             
             attempts += 1
+            
+            if harvesting:
+                new_urls = self._harvest_product_urls()
+                if new_urls is None:
+                    harvesting = False
+                    product_selector = ', '.join(PRODUCT_LINK_SELECTORS)
+                elif not new_urls:
+                    logger.info("Last 'Load More' click added no new products - stopping")
+                    break
+            
+            if capture is not None:
+                rounds.append(capture.drain())
+                if len(rounds) == 2:
+                    if self._load_more_via_endpoint(rounds[0], rounds[1], max_attempts + 1, concurrency):
+                        return True
+                    logger.info("No usable 'Load More' endpoint found - clicking through")
+                    capture = None
         
         # Final scroll to ensure all lazy-loaded content is visible
         self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)
+        self.waiter.wait_for_quiet(self.driver, 'scroll')
+        return harvesting and self._harvest_product_urls() is not None
     
-    def handle_pagination(self, max_pages: int = 10) -> None:
+    def _harvest_product_urls(self) -> Optional[List[str]]:
         """
-        Handle traditional pagination by clicking next page buttons
+        Add the product links that appeared on the listing since the last harvest
+        
+        Returns:
+            Product URLs that had not been seen before, or None if the
+            page could not be harvested
+        """
+        hrefs = self.harvester.drain(self.driver)
+        if hrefs is None:
+            return None
+        new_urls = self._add_product_urls(self._product_urls_from_hrefs(hrefs))
+        if new_urls:
+            logger.info(f"Found {len(new_urls)} new product URLs (total: {len(self.product_urls)})")
+        return new_urls
+    
+    def handle_pagination(self, max_pages: int = 10, start_page: int = 1, concurrency: int = 4) -> None:
+        """
+        Handle traditional pagination
+        
+        The URL of the next page is read from the current page and, if the
+        two URLs reveal the page URL pattern (?page=N, /page/N, offsets),
+        the remaining listing pages are fetched directly over HTTP, several
+        at a time. Clicking next page buttons is the fallback for listings
+        without such a pattern or that need a browser to render.
         
         Args:
             max_pages: Maximum number of pages to scrape
+            start_page: Number of the page currently loaded (when resuming)
+            concurrency: Listing pages fetched at the same time
         """
-        page = 1
+        page = start_page
+        
+        if page <= max_pages and self.http_fetcher is not None:
+            self.extract_product_urls_from_page()
+            current_url = self.driver.current_url
+            next_url = find_next_link(self.driver.page_source, current_url)
+            template = learn_template(current_url, next_url, page) if next_url else None
+            if template is None:
+                logger.info("No page URL pattern found - clicking through pages")
+            elif self._paginate_by_template(template, page + 1, max_pages, concurrency):
+                return
+            else:
+                logger.info(f"Listing pages for {template} need a browser - clicking through pages")
         
         while page <= max_pages:
             logger.info(f"Scraping page {page}...")
@@ -183,10 +452,16 @@ class ProductsScraper:
                     next_button = self.driver.find_element(By.XPATH, selector)
                     if next_button.is_displayed() and next_button.is_enabled():
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", next_button)
-                        time.sleep(1)
+                        previous = self.waiter.snapshot(self.driver)
                         next_button.click()
-                        time.sleep(3)  # Wait for page to load
+                        # Wait for page to load
+                        self.waiter.wait_for_navigation(
+                            self.driver, 'pagination', previous, required=[PRODUCT_LINK_SELECTORS]
+                        )
                         button_found = True
+                        if self.state is not None:
+                            self.state.set_meta('listing_url', self.driver.current_url)
+                            self.state.set_meta('listing_page', page + 1)
                         break
                 except (NoSuchElementException, StaleElementReferenceException):
                     continue
@@ -198,41 +473,200 @@ class ProductsScraper:
                 logger.info("No next page button found - reached end of pagination")
                 break
             
+            self._read_performance_log(self.driver)
             page += 1
     
-    def extract_product_urls_from_page(self) -> None:
-        """Extract all product URLs from the current page"""
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-        
-        # Common selectors for product links
-        product_link_selectors = [
-            'a[href*="/product"]',
-            'a[href*="/products"]',
-            'a[class*="product"]',
-            '.product a',
-            '.product-item a',
-            '.product-card a',
-            'article a',
-            '[data-product] a',
-        ]
-        
-        initial_count = len(self.product_urls)
-        
-        for selector in product_link_selectors:
+    def _paginate_by_template(
+        self,
+        template: 'PageTemplate',
+        first_page: int,
+        max_pages: int,
+        concurrency: int,
+        extract: Optional[Callable[[str], List[str]]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        checkpoint: bool = True,
+    ) -> bool:
+        """
+        Fetch listing pages straight from their URLs
+        
+        Pages are fetched over HTTP in rounds of `concurrency` and processed
+        in page order. Pagination stops at the first page that fails or
+        yields no new product URLs.
+        
+        Args:
+            template: Learned page URL template
+            first_page: First page number to fetch
+            max_pages: Last page number to fetch
+            concurrency: Listing pages fetched at the same time
+            extract: Callable returning the product URLs in a response
+                (defaults to reading product links from listing HTML)
+            headers: Extra request headers
+            checkpoint: Save the listing cursor for --resume
+            
+        Returns:
+            False if the first page had no product links over HTTP, so the
+            listing has to be paginated in the browser instead
+        """
+        logger.info(f"Fetching listing pages {first_page}-{max_pages} directly ({template})")
+        extract = extract or self._product_urls_from_html
+        concurrency = max(1, concurrency)
+        page = first_page
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while page <= max_pages:
+                numbers = list(range(page, min(max_pages, page + concurrency - 1) + 1))
+                urls = [template.url_for(number) for number in numbers]
+                results = executor.map(lambda url: self._fetch_listing_page(url, headers), urls)
+                
+                for number, url, html in zip(numbers, urls, results):
+                    if html is None:
+                        logger.info(f"Listing page {number} could not be fetched - stopping")
+                        return number > first_page
+                    
+                    found = extract(html)
+                    if not found and number == first_page:
+                        return False
+                    
+                    new_urls = self._add_product_urls(found)
+                    logger.info(
+                        f"Page {number}: {len(new_urls)} new product URLs (total: {len(self.product_urls)})"
+                    )
+                    if not new_urls:
+                        logger.info("No new products - reached end of pagination")
+                        return True
+                    
+                    if checkpoint and self.state is not None:
+                        self.state.set_meta('listing_url', template.url_for(number + 1))
+                        self.state.set_meta('listing_page', number + 1)
+                
+                page = numbers[-1] + 1
+        
+        return True
+    
+    def _fetch_listing_page(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Fetch a listing page over HTTP, or return None on failure"""
+        try:
+            if headers:
+                return self.http_fetcher.get(url, headers=headers).text
+            return self.http_fetcher.fetch(url)
+        except Exception as e:
+            logger.debug(f"Could not fetch listing page {url}: {e}")
+            return None
+    
+    def _load_more_via_endpoint(self, first: List, second: List, max_pages: int, concurrency: int) -> bool:
+        """
+        Load the remaining "Load More" pages from the endpoint behind the button
+        
+        Args:
+            first: Requests captured during the first click (page 2)
+            second: Requests captured during the second click (page 3)
+            max_pages: Last page number to request
+            concurrency: Endpoint pages requested at the same time
+            
+        Returns:
+            True if the endpoint was found and used, False to keep clicking
+        """
+        endpoint = find_paginated_endpoint(first, second)
+        if endpoint is None:
+            return False
+        template, headers = endpoint
+        
+        # The products loaded so far tell us where the endpoint puts product URLs
+        if self._harvest_product_urls() is None:
+            self.extract_product_urls_from_page()
+        cookies = '; '.join(f"{c['name']}={c['value']}" for c in self.driver.get_cookies())
+        if cookies:
+            headers['Cookie'] = cookies
+        
+        parser = EndpointParser(self.base_url, self._product_urls_from_html, self._is_product_url)
+        samples = [self._fetch_listing_page(template.url_for(page), headers) for page in (2, 3)]
+        if None in samples or not parser.learn(samples, self.product_urls):
+            logger.info("'Load More' endpoint responses do not contain the loaded products")
+            return False
+        
+        self._paginate_by_template(
+            template, 4, max_pages, concurrency,
+            extract=parser.product_urls, headers=headers, checkpoint=False,
+        )
+        return True
+    
+    def extract_product_urls_from_page(self) -> List[str]:
+        """
+        Extract all product URLs from the current page
+        
+        Returns:
+            Product URLs that had not been seen before
+        """
+        hrefs = self.in_page.extract_links(self.driver) if self.in_page is not None else None
+        if hrefs is not None:
+            urls = self._product_urls_from_hrefs(hrefs)
+        else:
+            urls = self._product_urls_from_html(self.driver.page_source)
+        new_urls = self._add_product_urls(urls)
+        if new_urls:
+            logger.info(f"Found {len(new_urls)} new product URLs (total: {len(self.product_urls)})")
+        return new_urls
+    
+    def _product_urls_from_html(self, html: str) -> List[str]:
+        """
+        Find product links in a listing page
+        
+        Args:
+            html: Listing page HTML
+            
+        Returns:
+            Absolute product URLs in page order (may contain duplicates)
+        """
+        soup = BeautifulSoup(html, 'lxml')
+        
+        hrefs = []
+        for selector in PRODUCT_LINK_SELECTORS:
             links = soup.select(selector)
             for link in links:
                 href = link.get('href')
                 if href:
-                    # Convert relative URLs to absolute
-                    full_url = urljoin(self.base_url, href)
-                    
-                    # Filter out non-product URLs
-                    if self._is_product_url(full_url):
-                        self.product_urls.add(full_url)
+                    hrefs.append(href)
         
-        new_count = len(self.product_urls) - initial_count
-        if new_count > 0:
-            logger.info(f"Found {new_count} new product URLs (total: {len(self.product_urls)})")
+        return self._product_urls_from_hrefs(hrefs)
+    
+    def _product_urls_from_hrefs(self, hrefs: List[str]) -> List[str]:
+        """
+        Turn product link hrefs into absolute product URLs
+        
+        Args:
+            hrefs: href values of product links, in page order
+            
+        Returns:
+            Absolute product URLs (may contain duplicates)
+        """
+        # Convert relative URLs to absolute, then drop non-product URLs
+        urls = [urljoin(self.base_url, href) for href in hrefs]
+        return [url for url, is_product in zip(urls, self.classifier.classify(urls)) if is_product]
+    
+    def _add_product_urls(self, urls) -> List[str]:
+        """
+        Add product URLs to the frontier and checkpoint the new ones
+        
+        Args:
+            urls: Candidate product URLs
+            
+        Returns:
+            URLs whose canonical form had not been seen before, as first
+            spelled, in the order given
+        """
+        new_urls = []
+        for url in urls:
+            # The frontier compares canonical URLs and returns the new ones
+            new_url = self.product_urls.add(url)
+            if new_url is not None:
+                new_urls.append(new_url)
+        
+        if new_urls and self.state is not None:
+            self.state.add_urls(new_urls)
+        if new_urls and self.work_queue is not None:
+            # Workers start on these while the listing is still being read
+            self.work_queue.add(new_urls)
+        return new_urls
     
     def _is_product_url(self, url: str) -> bool:
         """
@@ -244,21 +678,32 @@ class ProductsScraper:
         Returns:
             True if URL appears to be a product page
         """
-        # Avoid URLs that are likely not product pages
-        exclude_patterns = [
-            '/cart', '/checkout', '/account', '/login', '/signup',
-            '/category', '/categories', '/search', '/about', '/contact',
-            '/blog', '/news', '/faq', '/terms', '/privacy',
-            '#', 'javascript:', 'mailto:', 'tel:',
-            '.pdf', '.jpg', '.png', '.gif'
-        ]
-        
-        url_lower = url.lower()
-        for pattern in exclude_patterns:
-            if pattern in url_lower:
-                return False
+        return self.classifier.is_product(url)
+    
+    def _load_page(self, driver, url: str) -> None:
+        """
+        Navigate a browser session to a URL once the host's rate allows it
         
-        return True
+        Args:
+            driver: WebDriver session
+            url: Page URL
+        """
+        self.rate_limiter.acquire(url)
+        start = time.monotonic()
+        try:
+            driver.get(url)
+        except TimeoutException:
+            self.rate_limiter.record(url, error=True)
+            raise
+        # Render times are not comparable with HTTP response times, so only
+        # the outcome is reported
+        self.rate_limiter.record(url)
+        logger.debug(f"Loaded {url} in {time.monotonic() - start:.2f}s")
+    
+    def _read_robots_txt(self, root: str) -> Optional[str]:
+        """Fetch a site's robots.txt for the rate limiter"""
+        response = self.http_fetcher.session.get(urljoin(root, 'robots.txt'), timeout=self.timeout)
+        return response.text if response.status_code == 200 else None
     
     def scrape_product_details(self, url: str) -> Optional[Dict]:
         """
@@ -271,43 +716,194 @@ class ProductsScraper:
             Dictionary containing product details or None if scraping failed
         """
         try:
-            logger.info(f"Scraping product: {url}")
-            self.driver.get(url)
-            time.sleep(2)  # Wait for page to load
-            
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            
-            # Extract product details
-            product = {
-                'url': url,
-                'title': self._extract_title(soup),
-                'price': self._extract_price(soup),
-                'description': self._extract_description(soup),
-                'image_url': self._extract_image(soup),
-                'sku': self._extract_sku(soup),
-                'availability': self._extract_availability(soup),
-                'category': self._extract_category(soup),
-                'brand': self._extract_brand(soup),
-            }
-            
-            return product
-            
+            return self._scrape_product(url, self.driver)
         except Exception as e:
             logger.error(f"Error scraping product {url}: {e}")
             return None
     
+    def _scrape_product(self, url: str, driver) -> Dict:
+        """
+        Fetch a product page and extract details
+        
+        Tries the HTTP fast path first when the fetch strategy allows it and
+        falls back to loading the page in the given driver when the HTTP
+        result is incomplete. With a page cache, the page is first
+        revalidated with a conditional request; if it is unchanged the
+        stored product is returned without fetching or parsing the page
+        again. Unlike scrape_product_details, errors are
+        raised so callers such as the driver pool can tell a crashed browser
+        from a bad page.
+        
+        Args:
+            url: Product page URL
+            driver: WebDriver session to load the page in if needed
+            
+        Returns:
+            Dictionary containing product details
+        """
+        logger.info(f"Scraping product: {url}")
+        allows_browser = self.fetch_strategies.allows_browser()
+        
+        page = self._fetch_cached(url) if self.page_cache is not None else None
+        if page is not None and page.product is not None:
+            if is_complete(page.product) or not allows_browser:
+                if self._fingerprinting():
+                    self._fingerprints[url] = content_fingerprint(page.html)
+                return page.product
+        
+        # An unchanged page whose stored product was incomplete needs the browser
+        if self.fetch_strategies.should_try_http(url) and not (page is not None and page.not_modified):
+            product = self._scrape_product_http(url, page)
+            if product is not None:
+                if is_complete(product) or not allows_browser:
+                    self._store_cached(page, product)
+                    return product
+                logger.debug(f"Incomplete HTTP result for {url} - falling back to browser")
+        
+        self._load_page(driver, url)
+        self.waiter.wait_for_page(driver, 'product', required=[TITLE_SELECTORS, PRICE_SELECTORS])
+        self._read_performance_log(driver)
+        
+        product = self._extract_in_page(url, driver) if self.in_page is not None else None
+        if product is None:
+            product = self._parse_product(url, driver.page_source)
+        self._store_cached(page, product)
+        return product
+    
+    def _extract_in_page(self, url: str, driver) -> Optional[Dict]:
+        """
+        Extract the loaded product page inside the browser
+        
+        Only the page's structured-data tags are returned by the script, so
+        the page is neither serialized nor parsed again in Python.
+        Incremental crawls fingerprint the full page and are skipped here.
+        
+        Args:
+            url: Product page URL
+            driver: WebDriver with the page loaded
+            
+        Returns:
+            Product dictionary, or None if the page must be parsed instead
+        """
+        if self._fingerprinting():
+            return None
+        result = self.in_page.extract_product(driver)
+        if result is None:
+            return None
+        
+        self._note_canonical(url, result['head'])
+        heuristic = result['fields']
+        if heuristic.get('image_url'):
+            heuristic['image_url'] = urljoin(self.base_url, heuristic['image_url'])
+        return self._assemble_product(url, extract_structured_data(result['head'], url), heuristic)
+    
+    def _fetch_cached(self, url: str) -> Optional['CachedPage']:
+        """
+        Fetch a page through the page cache
+        
+        Args:
+            url: Page URL
+            
+        Returns:
+            The cached or freshly fetched page, or None if the request
+            failed and the browser may be used instead
+        """
+        try:
+            return self.page_cache.fetch(url, self.http_fetcher)
+        except Exception as e:
+            if not self.fetch_strategies.allows_browser():
+                raise
+            logger.debug(f"Cache revalidation failed for {url}: {e}")
+            return None
+    
+    def _store_cached(self, page: Optional['CachedPage'], product: Dict) -> None:
+        """Store a fetched page and its product in the page cache"""
+        if page is not None and self.page_cache is not None:
+            self.page_cache.store(page, product)
+    
+    def _scrape_product_http(self, url: str, page: Optional['CachedPage'] = None) -> Optional[Dict]:
+        """
+        Fetch a product page over plain HTTP and extract details
+        
+        Args:
+            url: Product page URL
+            page: Page already fetched through the page cache
+            
+        Returns:
+            Dictionary containing product details, or None if the request
+            failed and the browser may be used instead
+        """
+        if page is not None:
+            html = page.html
+        else:
+            try:
+                html = self.http_fetcher.fetch(url)
+            except Exception as e:
+                if not self.fetch_strategies.allows_browser():
+                    raise
+                logger.debug(f"HTTP fetch failed for {url}: {e}")
+                self.fetch_strategies.record(url, http_complete=False)
+                return None
+        
+        product = self._parse_product(url, html)
+        self.fetch_strategies.record(url, http_complete=is_complete(product))
+        return product
+    
+    def _parse_product(self, url: str, html: str) -> Dict:
+        """
+        Extract product details from a product page's HTML
+        
+        Structured data (JSON-LD, OpenGraph, microdata meta tags) is read
+        first. Only the fields it leaves out are resolved from the page by
+        the compiled extractor, in a single walk of the lxml tree with the
+        same selectors and priority order as the _extract_* methods, so a
+        page with complete structured data is never parsed. In an
+        incremental crawl, a page whose content fingerprint matches the
+        previous run is not extracted at all.
+        
+        Args:
+            url: Product page URL
+            html: Page HTML
+            
+        Returns:
+            Dictionary containing product details
+        """
+        if self._fingerprinting():
+            fingerprint = content_fingerprint(html)
+            self._fingerprints[url] = fingerprint
+            if self.incremental is not None:
+                product = self.incremental.unchanged(url, fingerprint)
+                if product is not None:
+                    return product
+        
+        self._note_canonical(url, html)
+        structured = extract_structured_data(html, url)
+        missing = [field for field in FIELD_SELECTORS if field not in structured]
+        heuristic = self.extractor.extract(html, self.base_url, missing) if missing else {}
+        return self._assemble_product(url, structured, heuristic)
+    
+    def _note_canonical(self, url: str, html: str) -> None:
+        """Remember a page's rel=canonical when it names another URL"""
+        href = canonical_link(html)
+        if not href:
+            return
+        canonical = self.canonicalizer.canonical(urljoin(url, href))
+        if canonical != self.canonicalizer.canonical(url) and urlparse(canonical).netloc == urlparse(url).netloc:
+            self._canonicals[url] = canonical
+    
+    def _assemble_product(self, url: str, structured: Dict[str, str], heuristic: Dict[str, str]) -> Dict:
+        """Merge structured data with selector-based fields, structured data first"""
+        product = {'url': url}
+        for field in FIELD_SELECTORS:
+            product[field] = structured.get(field) or heuristic.get(field, "N/A")
+        for field in STRUCTURED_ONLY_FIELDS:
+            product[field] = structured.get(field, "N/A")
+        
+        return product
+    
     def _extract_title(self, soup: BeautifulSoup) -> str:
         """Extract product title"""
-        selectors = [
-            'h1[class*="product"]',
-            'h1[class*="title"]',
-            '.product-title',
-            '.product-name',
-            'h1',
-            '[itemprop="name"]',
-        ]
-        
-        for selector in selectors:
+        for selector in TITLE_SELECTORS:
             element = soup.select_one(selector)
             if element:
                 return element.get_text(strip=True)
@@ -316,14 +912,7 @@ class ProductsScraper:
     
     def _extract_price(self, soup: BeautifulSoup) -> str:
         """Extract product price"""
-        selectors = [
-            '[class*="price"]',
-            '[itemprop="price"]',
-            '.product-price',
-            'span[class*="amount"]',
-        ]
-        
-        for selector in selectors:
+        for selector in PRICE_SELECTORS:
             element = soup.select_one(selector)
             if element:
                 price_text = element.get_text(strip=True)
@@ -334,32 +923,18 @@ class ProductsScraper:
     
     def _extract_description(self, soup: BeautifulSoup) -> str:
         """Extract product description"""
-        selectors = [
-            '[class*="description"]',
-            '[itemprop="description"]',
-            '.product-description',
-            '.product-details',
-        ]
-        
-        for selector in selectors:
+        for selector in FIELD_SELECTORS['description']:
             element = soup.select_one(selector)
             if element:
                 desc = element.get_text(strip=True)
                 # Limit description length
-                return desc[:500] if len(desc) > 500 else desc
+                return desc[:DESCRIPTION_LIMIT]
         
         return "N/A"
     
     def _extract_image(self, soup: BeautifulSoup) -> str:
         """Extract product main image URL"""
-        selectors = [
-            'img[class*="product"]',
-            '[itemprop="image"]',
-            '.product-image img',
-            '.product-gallery img',
-        ]
-        
-        for selector in selectors:
+        for selector in FIELD_SELECTORS['image_url']:
             element = soup.select_one(selector)
             if element:
                 img_url = element.get('src') or element.get('data-src')
@@ -370,13 +945,7 @@ class ProductsScraper:
     
     def _extract_sku(self, soup: BeautifulSoup) -> str:
         """Extract product SKU"""
-        selectors = [
-            '[itemprop="sku"]',
-            '.sku',
-            '[class*="sku"]',
-        ]
-        
-        for selector in selectors:
+        for selector in FIELD_SELECTORS['sku']:
             element = soup.select_one(selector)
             if element:
                 return element.get_text(strip=True)
@@ -385,13 +954,7 @@ class ProductsScraper:
     
     def _extract_availability(self, soup: BeautifulSoup) -> str:
         """Extract product availability status"""
-        selectors = [
-            '[itemprop="availability"]',
-            '.availability',
-            '[class*="stock"]',
-        ]
-        
-        for selector in selectors:
+        for selector in FIELD_SELECTORS['availability']:
             element = soup.select_one(selector)
             if element:
                 return element.get_text(strip=True)
@@ -407,13 +970,7 @@ class ProductsScraper:
     
     def _extract_category(self, soup: BeautifulSoup) -> str:
         """Extract product category"""
-        selectors = [
-            '[class*="breadcrumb"] a',
-            '.category',
-            '[class*="category"]',
-        ]
-        
-        for selector in selectors:
+        for selector in FIELD_SELECTORS['category']:
             elements = soup.select(selector)
             if elements:
                 # Get the last category in breadcrumb
@@ -423,64 +980,682 @@ class ProductsScraper:
     
     def _extract_brand(self, soup: BeautifulSoup) -> str:
         """Extract product brand"""
-        selectors = [
-            '[itemprop="brand"]',
-            '.brand',
-            '[class*="brand"]',
-        ]
-        
-        for selector in selectors:
+        for selector in FIELD_SELECTORS['brand']:
             element = soup.select_one(selector)
             if element:
                 return element.get_text(strip=True)
         
         return "N/A"
     
-    def scrape_all_products(self, use_load_more: bool = True, max_pages: int = 10) -> None:
+    def scrape_all_products(
+        self,
+        use_load_more: bool = True,
+        max_pages: int = 10,
+        workers: int = 1,
+        max_per_host: int = 4,
+        ordered: bool = True,
+        async_concurrency: int = 0,
+        sink: Optional['ProductSink'] = None,
+        state: Optional['CrawlStateStore'] = None,
+        resume: bool = False,
+        cache: Optional['PageCache'] = None,
+        incremental: Optional['IncrementalCrawl'] = None,
+        sitemap: Optional[str] = None,
+        retry_failed: bool = False,
+    ) -> None:
         """
         Main scraping workflow
         
         Args:
             use_load_more: Whether to handle "Load More" buttons
             max_pages: Maximum pages to scrape if using pagination
+            workers: Number of browser sessions scraping product pages in parallel
+            max_per_host: Maximum concurrent page loads per host when workers > 1
+            ordered: Keep products in URL order (not completion order) when workers > 1
+            async_concurrency: If > 0, fetch product pages over HTTP with an
+                asyncio engine keeping this many requests in flight; pages
+                that need a browser are scraped afterwards
+            sink: Stream each product to this sink as soon as it is scraped
+                instead of keeping it in products_data
+            state: Checkpoint the frontier, completed/failed URLs and the
+                listing cursor to this store
+            resume: Continue the crawl recorded in state instead of starting over
+            cache: Revalidate product pages against this page cache and
+                reuse the stored product when a page is unchanged
+            incremental: Reuse products from a previous run for pages whose
+                content did not change, and record added/changed/removed
+                products
+            sitemap: Discover product URLs from sitemaps instead of the
+                listing UI: 'auto' reads robots.txt, or give a sitemap URL.
+                The listing is used if no product URLs are found.
+            retry_failed: When resuming, scrape the URLs that failed in
+                earlier runs again
         """
+        self.sink = sink
+        self.state = state
+        self.incremental = incremental
+        if incremental is not None:
+            self.classifier.loads(incremental.previous.get_meta('url_includes'))
+        self.page_cache = cache if self.http_fetcher is not None else None
+        if cache is not None and self.page_cache is None:
+            logger.warning("requests is not installed - the page cache is disabled")
         try:
-            # Load initial page
-            logger.info(f"Loading initial page: {self.base_url}")
-            self.driver.get(self.base_url)
-            time.sleep(3)
-            
-            # Handle loading all products
-            if use_load_more:
-                self.scroll_and_load_more()
-            else:
-                self.handle_pagination(max_pages)
+            listing_done = self._start_state(resume, retry_failed)
             
-            # Extract product URLs from the final loaded page
-            self.extract_product_urls_from_page()
+            if not listing_done:
+                self._discover_product_urls(use_load_more, max_pages, resume, max_per_host, sitemap)
+            
+            if self._emitted_early:
+                # Products reused during discovery must be marked done first
+                if self.sink is not None:
+                    self.sink.flush()
+                self._sync_state()
             
-            if not self.product_urls:
+            # With a state store the frontier lives on disk: this also picks
+            # up URLs found by an earlier, interrupted run and skips done ones
+            urls = self.state.pending_urls() if self.state is not None else list(self.product_urls)
+            urls = [url for url in urls if url not in self._emitted_early]
+            
+            if not urls:
                 logger.warning("No product URLs found!")
                 return
             
-            logger.info(f"Found total of {len(self.product_urls)} product URLs")
+            logger.info(f"Found total of {len(urls)} product URLs to scrape")
             
             # Visit each product page and extract details
             logger.info("Starting to scrape individual product pages...")
-            for i, url in enumerate(self.product_urls, 1):
-                logger.info(f"Progress: {i}/{len(self.product_urls)}")
-                product_data = self.scrape_product_details(url)
-                if product_data:
-                    self.products_data.append(product_data)
-                
-                # Small delay to avoid overwhelming the server
-                time.sleep(1)
+            browser_urls = urls
+            if async_concurrency > 0:
+                browser_urls = self._scrape_products_async(urls, async_concurrency, max_per_host)
             
-            logger.info(f"Successfully scraped {len(self.products_data)} products")
+            scheduler = RetryScheduler(self.retry_policy, self.circuit_breaker)
+            if not browser_urls:
+                pass
+            elif workers > 1:
+                self._scrape_products_parallel(browser_urls, workers, max_per_host, ordered, scheduler)
+            else:
+                self._scrape_products_serial(browser_urls, scheduler)
+            
+            logger.info(f"Successfully scraped {self.products_scraped} products")
+            for line in self.timings.summary():
+                logger.info(f"Wait timings: {line}")
+            if self.resource_policy is not None:
+                for line in self.resource_policy.summary():
+                    logger.info(line)
+            if self.page_cache is not None:
+                for line in self.page_cache.summary():
+                    logger.info(line)
+            logger.info(self._dedup_summary())
+            for line in scheduler.summary():
+                logger.info(line)
+            for line in self.rate_limiter.summary():
+                logger.info(line)
+            if self.incremental is not None:
+                self.incremental.finish(self.state.urls() if self.state is not None else self.product_urls)
+                for line in self.incremental.summary():
+                    logger.info(line)
             
         except Exception as e:
             logger.error(f"Error during scraping: {e}")
             raise
+        finally:
+            # Sink first: a URL is only marked done once its row is on disk
+            if self.sink is not None:
+                self.sink.flush()
+            self._sync_state()
+            if self.state is not None:
+                self.state.set_meta('url_includes', self.classifier.dumps())
+                self.state.flush()
+            self.sink = None
+            self.state = None
+            self.page_cache = None
+            self.incremental = None
+            self._fingerprints.clear()
+            self._emitted_early.clear()
+            self._canonicals.clear()
+    
+    def scrape_with_queue(
+        self,
+        queue: 'WorkQueue',
+        use_load_more: bool = True,
+        max_pages: int = 10,
+        max_per_host: int = 4,
+        sitemap: Optional[str] = None,
+        resume: bool = False,
+        sink: Optional['ProductSink'] = None,
+    ) -> None:
+        """
+        Coordinate a crawl shared with other workers through a work queue
+        
+        Product URLs are queued as they are discovered, so workers started
+        with scrape_from_queue() begin right away. This scraper then works
+        through the queue as well, waits for the other workers and collects
+        every product from the queue.
+        
+        Args:
+            queue: Work queue shared with the workers
+            use_load_more: Whether to handle "Load More" buttons
+            max_pages: Maximum pages to scrape if using pagination
+            max_per_host: Listing pages fetched at the same time when the
+                page URL pattern is known
+            sitemap: 'auto' or a sitemap URL to read product URLs from
+            resume: Continue the crawl recorded in the queue instead of
+                starting over
+            sink: Stream the collected products to this sink instead of
+                keeping them in products_data
+        """
+        self.sink = sink
+        try:
+            if not resume:
+                queue.reset()
+            if not queue.discovery_done():
+                self.work_queue = queue
+                try:
+                    self._discover_product_urls(use_load_more, max_pages, False, max_per_host, sitemap)
+                finally:
+                    self.work_queue = None
+                queue.finish_discovery()
+            
+            self.scrape_from_queue(queue)
+            
+            for product in queue.results():
+                self._emit_product(product)
+            counts = queue.counts()
+            logger.info(
+                f"Collected {self.products_scraped} products from the work queue "
+                f"({counts.get('failed', 0)} URLs failed)"
+            )
+            logger.info(self._dedup_summary())
+        finally:
+            if self.sink is not None:
+                self.sink.flush()
+            self.sink = None
+            self._fingerprints.clear()
+            self._canonicals.clear()
+    
+    def scrape_from_queue(self, queue: 'WorkQueue', worker_id: Optional[str] = None,
+                          idle_wait: float = 1.0) -> int:
+        """
+        Scrape product pages leased from a work queue until the crawl is finished
+        
+        Each page is leased, scraped and its product pushed back to the
+        queue. Failures are returned to the queue with the retry policy's
+        backoff, so any worker may retry them; pages of a host whose
+        circuit is open are handed back untouched.
+        
+        Args:
+            queue: Work queue of the crawl
+            worker_id: Name recorded with this worker's leases (default:
+                host name and process id)
+            idle_wait: Seconds to wait when no URL can be leased yet
+            
+        Returns:
+            Number of products this worker pushed
+        """
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        pushed = 0
+        lease = None
+        try:
+            while True:
+                leases = queue.lease(worker_id)
+                if not leases:
+                    if queue.finished():
+                        break
+                    # Discovery is still running or other workers hold the rest
+                    time.sleep(idle_wait)
+                    continue
+                
+                lease = leases[0]
+                wait = self.circuit_breaker.wait_time(lease.url)
+                if wait is None:
+                    queue.fail(lease, "host_down: circuit open", retry=False)
+                    lease = None
+                    continue
+                if wait:
+                    queue.release(lease, wait)
+                    lease = None
+                    continue
+                
+                try:
+                    product = self._scrape_product_checked(lease.url, self.driver)
+                except Exception as e:
+                    if is_driver_crash(e):
+                        logger.warning(f"Browser crashed on {lease.url}: {e}")
+                        self._restart_driver()
+                    failure = classify_error(e)
+                    self.circuit_breaker.record(lease.url, failure)
+                    if self.retry_policy.should_retry(failure, lease.attempt):
+                        delay = self.retry_policy.delay(lease.attempt)
+                        logger.info(f"Returning {lease.url} to the queue for a retry in {delay:.1f}s: "
+                                    f"{failure.describe()}")
+                        queue.fail(lease, failure.describe(), retry=True, delay=delay)
+                    elif isinstance(e, ExtractionMiss) and e.product is not None:
+                        # Out of retries: keep what the page had
+                        pushed += queue.complete(lease, e.product)
+                    else:
+                        logger.error(f"Error scraping product {lease.url}: {failure.describe()}")
+                        queue.fail(lease, failure.describe(), retry=False)
+                    lease = None
+                    continue
+                
+                self.circuit_breaker.record_success(lease.url)
+                pushed += queue.complete(lease, product)
+                lease = None
+        finally:
+            if lease is not None:
+                # Interrupted: let another worker have it now instead of after the timeout
+                queue.release(lease)
+        
+        logger.info(f"Worker {worker_id} pushed {pushed} products")
+        return pushed
+    
+    def _start_state(self, resume: bool, retry_failed: bool = False) -> bool:
+        """
+        Prepare the state store for this run
+        
+        Args:
+            resume: Continue the crawl recorded in the store
+            retry_failed: Requeue the URLs that failed in earlier runs
+            
+        Returns:
+            True if an earlier run already finished discovering product URLs
+        """
+        if self.state is None:
+            return False
+        
+        # The state store keeps the URL strings; the frontier only needs hashes
+        if isinstance(self.product_urls, UrlFrontier):
+            self.product_urls.drop_urls()
+        
+        # Product path prefixes learned by earlier runs of this state file
+        self.classifier.loads(self.state.get_meta('url_includes'))
+        
+        if not resume:
+            self.state.reset()
+            self.state.set_meta('started_at', datetime.now(timezone.utc).isoformat())
+        elif self.state.get_meta('base_url') not in (None, self.base_url):
+            raise ValueError(
+                f"State file {self.state.path} belongs to a crawl of "
+                f"{self.state.get_meta('base_url')}, not {self.base_url}"
+            )
+        
+        self.state.set_meta('base_url', self.base_url)
+        
+        if resume:
+            counts = self.state.counts()
+            logger.info(
+                f"Resuming crawl: {counts.get('done', 0)} done, "
+                f"{counts.get('pending', 0)} pending, {counts.get('failed', 0)} failed"
+            )
+            if retry_failed and counts.get('failed'):
+                logger.info(f"Retrying {self.state.requeue_failed()} failed URLs")
+        return resume and self.state.get_meta('listing_done') == '1'
+    
+    def _discover_product_urls(self, use_load_more: bool, max_pages: int, resume: bool,
+                               max_per_host: int = 4, sitemap: Optional[str] = None) -> None:
+        """
+        Load the listing and collect product URLs
+        
+        Args:
+            use_load_more: Whether to handle "Load More" buttons
+            max_pages: Maximum pages to scrape if using pagination
+            resume: Continue from the listing cursor saved in the state store
+            max_per_host: Listing pages fetched at the same time when the
+                page URL pattern is known
+            sitemap: 'auto' or a sitemap URL to read product URLs from
+                sitemaps instead of the listing
+        """
+        if sitemap and self.http_fetcher is not None:
+            if self.discover_from_sitemaps(None if sitemap == 'auto' else sitemap):
+                if self.state is not None:
+                    self.state.set_meta('listing_done', '1')
+                    self.state.flush()
+                return
+            logger.info("No product URLs in sitemaps - loading the listing instead")
+        
+        start_url = self.base_url
+        start_page = 1
+        if resume and self.state is not None and not use_load_more:
+            start_url = self.state.get_meta('listing_url', self.base_url)
+            start_page = int(self.state.get_meta('listing_page', '1'))
+            if start_page > 1:
+                logger.info(f"Resuming pagination at page {start_page}: {start_url}")
+        
+        # Load initial page
+        logger.info(f"Loading initial page: {start_url}")
+        self._load_page(self.driver, start_url)
+        self.waiter.wait_for_page(self.driver, 'listing', required=[PRODUCT_LINK_SELECTORS])
+        
+        # Handle loading all products
+        harvested = False
+        if use_load_more:
+            harvested = self.scroll_and_load_more(concurrency=max_per_host)
+        else:
+            self.handle_pagination(max_pages, start_page=start_page, concurrency=max_per_host)
+        
+        # Extract product URLs from the final loaded page
+        if not harvested:
+            self.extract_product_urls_from_page()
+        # Count the listing's traffic before product pages are loaded
+        self._read_performance_log(self.driver)
+        
+        if self.state is not None:
+            self.state.set_meta('listing_done', '1')
+            self.state.flush()
+    
+    def discover_from_sitemaps(self, sitemap_url: Optional[str] = None, batch_size: int = 1000) -> int:
+        """
+        Fill product_urls from the site's XML sitemaps
+        
+        Sitemaps are streamed, so memory use does not grow with their size.
+        In an incremental crawl, products whose <lastmod> is older than the
+        previous run are taken from that run without being fetched.
+        
+        Args:
+            sitemap_url: Sitemap or sitemap index to read (defaults to the
+                sitemaps listed in robots.txt, or /sitemap.xml)
+            batch_size: URLs added to the frontier at a time
+            
+        Returns:
+            Number of product URLs found
+        """
+        reader = SitemapReader(self.http_fetcher)
+        sitemap_urls = [sitemap_url] if sitemap_url else reader.discover(self.base_url)
+        host = urlparse(self.base_url).netloc.lower()
+        
+        found = 0
+        batch: List[str] = []
+        for entry in reader.entries(sitemap_urls):
+            url = entry.loc
+            if urlparse(url).netloc.lower() != host or not self._is_product_url(url):
+                continue
+            found += 1
+            
+            if self.incremental is not None and url not in self.product_urls:
+                product = self.incremental.unchanged_since(url, entry.lastmod)
+                if product is not None:
+                    self._add_product_urls(batch + [url])
+                    batch = []
+                    self._emitted_early.add(url)
+                    self._emit_product(product)
+                    continue
+            
+            batch.append(url)
+            if len(batch) >= batch_size:
+                self._add_product_urls(batch)
+                batch = []
+        
+        self._add_product_urls(batch)
+        logger.info(
+            f"Read {reader.urls_read} URLs from {reader.sitemaps_read} sitemaps: "
+            f"{found} product URLs, {len(self._emitted_early)} unchanged since the last run"
+        )
+        return found
+    
+    def _emit_product(self, product: Dict) -> None:
+        """
+        Hand a scraped product to the sink, or keep it in products_data
+        
+        Args:
+            product: Product dictionary
+        """
+        if not self._claim(product['url']):
+            return
+        
+        self.products_scraped += 1
+        if self.sink is not None:
+            self.sink.write(product)
+        else:
+            self.products_data.append(product)
+        if is_complete(product):
+            self.classifier.learn(product['url'])
+        
+        fingerprint = self._fingerprints.pop(product['url'], None)
+        if self.incremental is not None:
+            self.incremental.record(product)
+            if fingerprint is None:
+                fingerprint = self.incremental.previous_fingerprint(product['url'], product)
+        
+        if self.state is not None:
+            self._unsynced.append((product['url'], fingerprint, product))
+            if self.sink is None or self.sink.synced == self.sink.count:
+                self._sync_state()
+    
+    def _claim(self, url: str) -> bool:
+        """
+        Record that a product page was emitted under its URL and rel=canonical
+        
+        Returns:
+            False if an earlier page already produced the same product
+        """
+        keys = [url_hash(self.canonicalizer.canonical(url))]
+        page_canonical = self._canonicals.pop(url, None)
+        if page_canonical is not None:
+            keys.append(url_hash(page_canonical))
+        
+        if any(key in self._claimed for key in keys):
+            self.dedup_counts['duplicates'] += 1
+            logger.info(f"Skipping {url}: same product as {page_canonical or 'an earlier page'}")
+            self._fingerprints.pop(url, None)
+            if self.state is not None:
+                self.state.mark_done(url)
+            return False
+        
+        for key in keys:
+            self._claimed.add(key)
+        return True
+    
+    def _is_alias(self, url: str) -> bool:
+        """
+        Check whether a page already emitted declared this URL as its rel=canonical
+        
+        The URL is marked done, so its visit is saved.
+        """
+        if url_hash(self.canonicalizer.canonical(url)) not in self._claimed:
+            return False
+        self.dedup_counts['aliases_skipped'] += 1
+        logger.debug(f"Skipping {url}: already scraped through an alias")
+        if self.state is not None:
+            self.state.mark_done(url)
+        return True
+    
+    def _fingerprinting(self) -> bool:
+        """Whether page fingerprints are needed (to save or to compare)"""
+        return self.state is not None or self.incremental is not None
+    
+    def _sync_state(self) -> None:
+        """Mark products done once the sink has their rows on disk"""
+        if self.state is not None:
+            for url, fingerprint, product in self._unsynced:
+                self.state.mark_done(url, fingerprint, product)
+        self._unsynced = []
+    
+    def _dedup_summary(self) -> str:
+        """Describe the page visits URL deduplication saved"""
+        merged = getattr(self.product_urls, 'merged', 0)
+        skipped = self.dedup_counts['aliases_skipped']
+        return (
+            f"URL dedup: {merged} duplicate links merged by canonicalization, "
+            f"{skipped} rel=canonical aliases skipped, {self.dedup_counts['duplicates']} "
+            f"duplicate products dropped ({merged + skipped} page visits saved)"
+        )
+    
+    def _record_failure(self, url: str, error: str) -> None:
+        """
+        Remember a product URL that could not be scraped
+        
+        Args:
+            url: Product page URL
+            error: Short description of the failure
+        """
+        if self.state is not None:
+            self.state.mark_failed(url, error)
+    
+    def _scrape_products_async(self, urls: List[str], concurrency: int, max_per_host: int) -> List[str]:
+        """
+        Fetch and parse product pages with the asyncio HTTP engine
+        
+        Args:
+            urls: Product page URLs to scrape
+            concurrency: Maximum requests in flight
+            max_per_host: Maximum open connections per host
+            
+        Returns:
+            URLs that still need to be scraped: pages that need the browser,
+            and pages whose fetch failed and will be retried
+        """
+        
+        if not AIOHTTP_INSTALLED:
+            logger.warning("aiohttp is not installed - skipping the async HTTP engine")
+            return urls
+        if not self.fetch_strategies.should_try_http(self.base_url):
+            logger.warning("Fetch strategy is 'browser' - skipping the async HTTP engine")
+            return urls
+        
+        allow_browser = self.fetch_strategies.allows_browser()
+        browser_urls = []
+        
+        def collect(url: str, product: Optional[Dict]) -> None:
+            if product is not None and (is_complete(product) or not allow_browser):
+                self._emit_product(product)
+            else:
+                # Rendered in the browser, or retried over HTTP with backoff
+                browser_urls.append(url)
+        
+        engine = AsyncFetchEngine(
+            parse_fn=self._parse_product,
+            user_agent=USER_AGENT,
+            concurrency=concurrency,
+            max_per_host=max_per_host,
+            timeout=self.timeout,
+            cache=self.page_cache,
+            limiter=self.rate_limiter,
+        )
+        engine.run(urls, emit=collect)
+        
+        if browser_urls:
+            logger.info(f"{len(browser_urls)} product pages left for the browser or a retry")
+        return browser_urls
+    
+    def _scrape_products_serial(self, urls: List[str], scheduler: 'RetryScheduler') -> None:
+        """
+        Scrape product pages one at a time in the scraper's browser session
+        
+        Failed pages are retried after a backoff while the other pages are
+        scraped, and pages of a host whose circuit is open wait for it.
+        
+        Args:
+            urls: Product page URLs to scrape
+            scheduler: RetryScheduler for this run
+        """
+        scheduler.add(urls)
+        finished = 0
+        while True:
+            task = scheduler.next()
+            if task is None:
+                break
+            url = task.url
+            
+            if task.host_down:
+                failure = scheduler.failure(task, HostUnavailable(url))
+                self._record_failure(url, failure.describe())
+                finished += 1
+                continue
+            if self._is_alias(url):
+                scheduler.skip(task)
+                finished += 1
+                continue
+            
+            try:
+                product = self._scrape_product_checked(url, self.driver)
+            except Exception as e:
+                if is_driver_crash(e):
+                    logger.warning(f"Browser crashed on {url}: {e}")
+                    self._restart_driver()
+                failure = scheduler.failure(task, e)
+                if failure is None:
+                    continue
+                finished += 1
+                logger.info(f"Progress: {finished}/{len(urls)}")
+                if isinstance(e, ExtractionMiss) and e.product is not None:
+                    # Out of retries: keep what the page had
+                    self._emit_product(e.product)
+                else:
+                    logger.error(f"Error scraping product {url}: {failure.describe()}")
+                    self._record_failure(url, failure.describe())
+                continue
+            
+            scheduler.success(task)
+            finished += 1
+            logger.info(f"Progress: {finished}/{len(urls)}")
+            self._emit_product(product)
+    
+    def _scrape_product_checked(self, url: str, driver) -> Dict:
+        """
+        Scrape a product page, treating a rendered page without the product
+        fields as a failure that may be retried
+        
+        Raises:
+            ExtractionMiss: If the browser could be used but the product is
+                incomplete; the partial product is attached
+        """
+        product = self._scrape_product(url, driver)
+        if not is_complete(product) and self.fetch_strategies.allows_browser():
+            raise ExtractionMiss(url, product)
+        return product
+    
+    def _scrape_products_parallel(
+        self,
+        urls: List[str],
+        workers: int,
+        max_per_host: int,
+        ordered: bool,
+        scheduler: Optional['RetryScheduler'] = None,
+    ) -> None:
+        """
+        Scrape product pages with a pool of browser sessions
+        
+        Args:
+            urls: Product page URLs to scrape
+            workers: Number of browser sessions
+            max_per_host: Maximum concurrent page loads per host
+            ordered: Keep products in URL order instead of completion order
+            scheduler: RetryScheduler for this run
+        """
+        scheduler = scheduler or RetryScheduler(self.retry_policy, self.circuit_breaker)
+        pool = DriverPool(
+            driver_factory=self._create_driver,
+            scrape_fn=self._scrape_product_checked,
+            workers=workers,
+            max_per_host=max_per_host,
+            ordered=ordered,
+            skip_fn=self._is_alias,
+            scheduler=scheduler,
+        )
+        pool.run(urls, emit=self._emit_product)
+        
+        if pool.failed_urls:
+            logger.warning(f"Failed to scrape {len(pool.failed_urls)} products")
+            for url in pool.failed_urls:
+                self._record_failure(url, scheduler.failed.get(url, "scrape failed"))
+    
+    def export(self, filename: str) -> None:
+        """
+        Export scraped products in the format of the file's extension
+        
+        Products are written in batches with the fixed output schema (see
+        scraper_sinks.open_sink for the formats).
+        
+        Args:
+            filename: Output filename, e.g. products.parquet
+        """
+        if not self.products_data:
+            logger.warning("No product data to export")
+            return
+        
+        with open_sink(filename, flush_every=10_000, flush_interval=3600) as sink:
+            for product in self.products_data:
+                sink.write(product)
     
     def export_to_csv(self, filename: str = 'products.csv') -> None:
         """
@@ -513,8 +1688,8 @@ class ProductsScraper:
             raise
 
 
-def main():
-    """Main entry point for the script"""
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Command-line options of a single-site crawl"""
     parser = argparse.ArgumentParser(
         description='Scrape product information from e-commerce websites',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -523,6 +1698,9 @@ Examples:
   python products_scraper.py https://example.com/products
   python products_scraper.py https://example.com/products --output my_products.csv
   python products_scraper.py https://example.com/products --no-load-more --max-pages 5
+  python products_scraper.py https://example.com/products --workers 4
+  python products_scraper.py https://example.com/products --resume
+  python products_scraper.py https://example.com/products -o today.csv --since yesterday.csv.state.db
         """
     )
     
@@ -534,7 +1712,24 @@ Examples:
     parser.add_argument(
         '--output', '-o',
         default='products.csv',
-        help='Output CSV filename (default: products.csv)'
+        help='Output filename; rows are written as they are scraped. The extension picks the '
+             'format: .csv, .jsonl, .jsonl.gz, .parquet (needs pyarrow) or .db/.sqlite (a table '
+             'upserted by URL). A postgresql:// URL upserts into a PostgreSQL table instead '
+             '(needs psycopg2) (default: products.csv)'
+    )
+    
+    parser.add_argument(
+        '--db-table',
+        default='scraped_products',
+        help='PostgreSQL table for a postgresql:// --output, created if missing '
+             '(default: scraped_products)'
+    )
+    
+    parser.add_argument(
+        '--db-key',
+        choices=['url', 'sku'],
+        default='url',
+        help='Column identifying a product in the PostgreSQL table (default: url)'
     )
     
     parser.add_argument(
@@ -550,6 +1745,13 @@ Examples:
         help='Disable "Load More" button handling and use pagination instead'
     )
     
+    parser.add_argument(
+        '--load-more-endpoint',
+        action='store_true',
+        help='Watch the network while "Load More" is clicked and call the endpoint behind '
+             'it directly once found'
+    )
+    
     parser.add_argument(
         '--visible',
         action='store_true',
@@ -563,42 +1765,356 @@ Examples:
         help='Timeout for waiting for elements (default: 10 seconds)'
     )
     
-    args = parser.parse_args()
+    parser.add_argument(
+        '--fetch-strategy',
+        choices=STRATEGIES,
+        default='auto',
+        help='How product pages are fetched: "auto" tries plain HTTP first and falls back '
+             'to the browser, "http" never renders product pages, "browser" always does '
+             '(default: auto)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of browser sessions scraping product pages in parallel (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--max-per-host',
+        type=int,
+        default=4,
+        help='Maximum concurrent page loads per host when using --workers, and listing pages '
+             'fetched at once when paginating by URL (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--async-http',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Fetch product pages over HTTP with an asyncio engine keeping N requests '
+             'in flight (capped per host by --max-per-host); requires aiohttp'
+    )
+    
+    parser.add_argument(
+        '--unordered',
+        action='store_true',
+        help='With --workers, write products in completion order instead of URL order'
+    )
+    
+    parser.add_argument(
+        '--state',
+        help='SQLite file checkpointing the crawl frontier and progress '
+             '(default: <output>.state.db, or <db-table>.state.db for PostgreSQL output)'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted crawl from its state file, appending to the output'
+    )
+    
+    parser.add_argument(
+        '--retry-failed',
+        action='store_true',
+        help='Like --resume, and also scrape the URLs that failed in earlier runs again'
+    )
+    
+    parser.add_argument(
+        '--max-attempts',
+        type=int,
+        default=3,
+        help='Attempts per product page before it is recorded as failed; retries back off '
+             'with jitter (default: 3)'
+    )
+    
+    parser.add_argument(
+        '--queue',
+        metavar='PATH',
+        help='Share the crawl through this SQLite work queue: this run discovers product URLs, '
+             'scrapes alongside any --queue-worker runs and writes every product to --output'
+    )
+    
+    parser.add_argument(
+        '--queue-worker',
+        action='store_true',
+        help='With --queue, only scrape product pages leased from the queue until the crawl is done'
+    )
+    
+    parser.add_argument(
+        '--lease-timeout',
+        type=float,
+        default=300.0,
+        help='Seconds a worker may hold a product URL before the queue hands it to another '
+             'worker (default: 300)'
+    )
+    
+    parser.add_argument(
+        '--cache',
+        metavar='PATH',
+        help='SQLite page cache; unchanged product pages are revalidated with conditional '
+             'requests and not parsed again'
+    )
+    
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=512,
+        metavar='MB',
+        help='Size limit of the page cache; least recently used pages are evicted (default: 512)'
+    )
+    
+    parser.add_argument(
+        '--since',
+        metavar='STATE_DB',
+        help='Incremental crawl: state file of a previous run; pages whose content did not '
+             'change reuse the previous product instead of being extracted again'
+    )
+    
+    parser.add_argument(
+        '--delta',
+        metavar='PATH',
+        help='With --since, file receiving added, changed and removed products '
+             '(default: <output name>.delta<output extension>, or <db-table>.delta.csv for '
+             'PostgreSQL output)'
+    )
+    
+    parser.add_argument(
+        '--sitemap',
+        nargs='?',
+        const='auto',
+        metavar='URL',
+        help='Discover product URLs from XML sitemaps instead of the listing: without a URL '
+             'they are found through robots.txt; with --since, products whose <lastmod> '
+             'predates the previous run are not fetched'
+    )
+    
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=4.0,
+        help='Requests per second each host starts at; the rate then adapts to errors, '
+             'Retry-After and response times (default: 4)'
+    )
     
+    parser.add_argument(
+        '--max-rate',
+        type=float,
+        default=20.0,
+        help='Highest requests per second per host; a robots.txt Crawl-delay lowers it (default: 20)'
+    )
+    
+    parser.add_argument(
+        '--url-rules',
+        metavar='FILE',
+        help='JSON file of per-site URL canonicalization rules, e.g. '
+             '{"shop.com": {"drop_params": ["color"]}}; tracking and variant parameters, '
+             'fragments and trailing slashes are always removed'
+    )
+    
+    parser.add_argument(
+        '--in-page-extraction',
+        action='store_true',
+        help='Extract product fields and listing links with one script inside the browser '
+             'instead of transferring and parsing the page HTML'
+    )
+    
+    parser.add_argument(
+        '--block',
+        default=','.join(DEFAULT_BLOCK_TYPES),
+        metavar='TYPES',
+        help=f"Comma-separated resource types the browser does not download "
+             f"({', '.join(RESOURCE_PATTERNS)}), or 'none' (default: {','.join(DEFAULT_BLOCK_TYPES)})"
+    )
+    
+    parser.add_argument(
+        '--block-domains',
+        metavar='DOMAINS',
+        help='Comma-separated extra domains whose requests the browser blocks'
+    )
+    
+    parser.add_argument(
+        '--allow-trackers',
+        action='store_true',
+        help='Do not block the built-in list of analytics and advertising domains'
+    )
+    
+    parser.add_argument(
+        '--page-load-strategy',
+        choices=['eager', 'normal'],
+        default='eager',
+        help='"eager" returns from page loads once the DOM is ready, "normal" waits for '
+             'every subresource (default: eager)'
+    )
+    
+    return parser
+
+
+def run_from_args(args: argparse.Namespace) -> Dict[str, int]:
+    """
+    Run one crawl configured by parsed command-line options
+    
+    Args:
+        args: Options from build_arg_parser()
+        
+    Returns:
+        Number of product URLs per status in the crawl state ('done',
+        'failed', 'pending')
+        
+    Raises:
+        ValueError: If the options are invalid
+    """
     # Validate URL
     parsed_url = urlparse(args.url)
     if not parsed_url.scheme or not parsed_url.netloc:
-        logger.error("Invalid URL provided. Please provide a complete URL (e.g., https://example.com)")
-        sys.exit(1)
+        raise ValueError("Invalid URL provided. Please provide a complete URL (e.g., https://example.com)")
+    
+    database = is_database_url(args.output)
+    sink_options = {'table': args.db_table, 'key': args.db_key} if database else {}
+    state_path = args.state or (f"{args.db_table}.state.db" if database else f"{args.output}.state.db")
+    if args.since:
+        if not os.path.exists(args.since):
+            raise ValueError(f"Previous state file not found: {args.since}")
+        if os.path.abspath(args.since) == os.path.abspath(state_path):
+            raise ValueError("--since must point to a different state file than this run's --state")
+    
+    if args.retry_failed:
+        args.resume = True
+    if args.queue_worker and not args.queue:
+        raise ValueError("--queue-worker needs --queue")
+    if args.queue and (args.since or args.retry_failed):
+        raise ValueError("--since and --retry-failed cannot be combined with --queue")
+    if args.max_attempts < 1:
+        raise ValueError("--max-attempts must be at least 1")
+    
+    if sink_class(args.output) is ParquetSink and not PYARROW_INSTALLED:
+        raise ValueError("Parquet output needs pyarrow: pip install pyarrow")
+    if database and not PSYCOPG2_INSTALLED:
+        raise ValueError("PostgreSQL output needs psycopg2: pip install psycopg2-binary")
+    
+    if args.rate <= 0 or args.max_rate <= 0:
+        raise ValueError("--rate and --max-rate must be greater than 0")
+    
+    url_rules = None
+    if args.url_rules:
+        try:
+            url_rules = load_rules(args.url_rules)
+        except (OSError, ValueError, TypeError) as e:
+            raise ValueError(f"Could not load URL rules from {args.url_rules}: {e}")
+    
+    block_types = [] if args.block == 'none' else [t.strip() for t in args.block.split(',') if t.strip()]
+    unknown = [t for t in block_types if t not in RESOURCE_PATTERNS]
+    if unknown:
+        raise ValueError(f"Unknown resource types for --block: {', '.join(unknown)} "
+                         f"(choose from {', '.join(RESOURCE_PATTERNS)} or 'none')")
+    block_domains = [] if args.allow_trackers else list(TRACKER_DOMAINS)
+    block_domains += [d for d in (args.block_domains or '').split(',') if d.strip()]
+    resource_policy = ResourcePolicy(
+        block_types, block_domains, eager=args.page_load_strategy == 'eager'
+    )
+    
+    rate_limiter = HostRateLimiter(initial_rate=args.rate, max_rate=args.max_rate)
     
     # Create scraper instance
     scraper = ProductsScraper(
         base_url=args.url,
         headless=not args.visible,
-        timeout=args.timeout
+        timeout=args.timeout,
+        fetch_strategy=args.fetch_strategy,
+        load_more_endpoint=args.load_more_endpoint,
+        resource_policy=resource_policy,
+        in_page_extraction=args.in_page_extraction,
+        url_rules=url_rules,
+        rate_limiter=rate_limiter,
+        retry_policy=RetryPolicy(max_attempts=args.max_attempts)
     )
     
+    if args.queue:
+        try:
+            with SqliteWorkQueue(args.queue, visibility_timeout=args.lease_timeout,
+                                 max_attempts=args.max_attempts) as queue:
+                if args.queue_worker:
+                    scraper.scrape_from_queue(queue)
+                else:
+                    with open_sink(args.output, **sink_options) as sink:
+                        scraper.scrape_with_queue(
+                            queue,
+                            use_load_more=not args.no_load_more,
+                            max_pages=args.max_pages,
+                            max_per_host=args.max_per_host,
+                            sitemap=args.sitemap,
+                            resume=args.resume,
+                            sink=sink
+                        )
+                return queue.counts()
+        finally:
+            del scraper
+    
+    cache = PageCache(args.cache, max_bytes=args.cache_size * 1024 * 1024) if args.cache else None
+    
     try:
-        # Run scraping
-        scraper.scrape_all_products(
-            use_load_more=not args.no_load_more,
-            max_pages=args.max_pages
-        )
-        
-        # Export results
-        scraper.export_to_csv(args.output)
+        # Run scraping, streaming results to the output file and
+        # checkpointing progress so an interrupted run can be resumed
+        with ExitStack() as stack:
+            state = stack.enter_context(CrawlStateStore(state_path))
+            sink = stack.enter_context(open_sink(args.output, append=args.resume, **sink_options))
+            
+            incremental = None
+            if args.since:
+                if database:
+                    delta_path = args.delta or f"{args.db_table}.delta.csv"
+                else:
+                    extension = sink_extension(args.output)
+                    stem = args.output[:len(args.output) - len(extension)]
+                    delta_path = args.delta or f"{stem}.delta{extension}"
+                previous = stack.enter_context(CrawlStateStore(args.since))
+                delta = stack.enter_context(
+                    open_sink(delta_path, fieldnames=DELTA_FIELDS, append=args.resume)
+                )
+                incremental = IncrementalCrawl(previous, delta)
+            
+            scraper.scrape_all_products(
+                use_load_more=not args.no_load_more,
+                max_pages=args.max_pages,
+                workers=args.workers,
+                max_per_host=args.max_per_host,
+                ordered=not args.unordered,
+                async_concurrency=args.async_http,
+                sink=sink,
+                state=state,
+                resume=args.resume,
+                cache=cache,
+                incremental=incremental,
+                sitemap=args.sitemap,
+                retry_failed=args.retry_failed
+            )
         
+            counts = state.counts()
+    finally:
+        # Cleanup
+        if cache is not None:
+            cache.close()
+        del scraper
+    return counts
+
+
+def main():
+    """Main entry point for the script"""
+    args = build_arg_parser().parse_args()
+    try:
+        run_from_args(args)
         logger.info("Scraping completed successfully!")
-        
     except KeyboardInterrupt:
         logger.info("Scraping interrupted by user")
         sys.exit(1)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
     except Exception as e:
         logger.error(f"Scraping failed: {e}")
         sys.exit(1)
-    finally:
-        # Cleanup
-        del scraper
 
 
 if __name__ == '__main__':
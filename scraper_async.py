@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Async Fetch Engine - keep hundreds of product-page requests in flight
+
+This module handles:
+- Concurrent HTTP fetching on an asyncio event loop
+- A global in-flight cap and a per-host connection cap
+- A bounded queue between fetching and parsing, so fetchers wait when
+  parsing falls behind instead of buffering every page in memory
+- Parsing in a small thread pool so the event loop keeps servicing sockets
+- Optional conditional requests against a PageCache; unchanged pages are
+  answered from the cache without parsing
+- Optional pacing by a HostRateLimiter shared with the other fetch paths
+
+Usage:
+    engine = AsyncFetchEngine(scraper._parse_product, user_agent=USER_AGENT)
+    engine.run(urls, emit=products.append)
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+try:
+    import aiohttp
+    AIOHTTP_INSTALLED = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_INSTALLED = False
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFetchEngine:
+    """Fetch pages concurrently with asyncio and feed them to a parser"""
+
+    def __init__(
+        self,
+        parse_fn: Callable[[str, str], Optional[Dict]],
+        user_agent: str,
+        concurrency: int = 200,
+        max_per_host: int = 8,
+        queue_size: int = 64,
+        parse_workers: int = 4,
+        timeout: float = 10,
+        cache=None,
+        limiter=None,
+    ):
+        """
+        Initialize the engine
+
+        Args:
+            parse_fn: Callable taking (url, html) and returning a product dict
+            user_agent: User-Agent header sent with every request
+            concurrency: Maximum requests in flight across all hosts
+            max_per_host: Maximum open connections per host
+            queue_size: Fetched pages allowed to wait for parsing
+            parse_workers: Threads parsing HTML
+            timeout: Total timeout per request in seconds
+            cache: PageCache to revalidate and store pages with
+            limiter: HostRateLimiter each request waits for and reports to
+        """
+        if not AIOHTTP_INSTALLED:
+            raise ImportError(
+                "The async fetch engine requires aiohttp. "
+                "Please run: pip install aiohttp"
+            )
+
+        self.parse_fn = parse_fn
+        self.user_agent = user_agent
+        self.concurrency = max(1, concurrency)
+        self.max_per_host = max(1, max_per_host)
+        self.queue_size = max(1, queue_size)
+        self.parse_workers = max(1, parse_workers)
+        self.timeout = timeout
+        self.cache = cache
+        self.limiter = limiter
+
+        self.fetched = 0
+        self.bytes_fetched = 0
+        self.failed_urls: List[str] = []
+        self._handled = 0
+
+    def run(self, urls: Iterable[str], emit: Callable[[str, Optional[Dict]], None]) -> None:
+        """
+        Fetch and parse all URLs
+
+        Args:
+            urls: Page URLs to fetch
+            emit: Callback receiving (url, product) for every parsed page, or
+                (url, None) for pages that could not be fetched or parsed
+        """
+        asyncio.run(self._run(list(urls), emit))
+
+    async def _run(self, urls: List[str], emit: Callable[[str, Optional[Dict]], None]) -> None:
+        """Run fetchers and parsers until every URL is handled"""
+        if not urls:
+            return
+
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        pending = iter(urls)
+        total = len(urls)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.max_per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        headers = {
+            'User-Agent': self.user_agent,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9',
+        }
+
+        logger.info(
+            f"Fetching {total} pages with up to {self.concurrency} requests in flight "
+            f"({self.max_per_host} per host)"
+        )
+
+        with ThreadPoolExecutor(max_workers=self.parse_workers) as executor:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+                fetchers = [
+                    asyncio.create_task(self._fetcher(session, pending, pages))
+                    for _ in range(min(self.concurrency, total))
+                ]
+                parsers = [
+                    asyncio.create_task(self._parser(pages, executor, emit, total))
+                    for _ in range(self.parse_workers)
+                ]
+
+                await asyncio.gather(*fetchers)
+                for _ in parsers:
+                    await pages.put(None)
+                await asyncio.gather(*parsers)
+
+        logger.info(
+            f"Async fetch finished: {self.fetched} pages, {self.bytes_fetched} bytes, "
+            f"{len(self.failed_urls)} failed"
+        )
+
+    async def _fetcher(self, session, pending, pages: asyncio.Queue) -> None:
+        """Fetch URLs from the shared iterator and queue their HTML"""
+        loop = asyncio.get_running_loop()
+        for url in pending:
+            try:
+                # The cache waits for its lock (held by parsers storing pages),
+                # writes and decompresses: keep it off the event loop
+                headers = None
+                if self.cache is not None:
+                    headers = await loop.run_in_executor(None, self.cache.revalidation_headers, url)
+                status, html, size, response_headers = await self._request(session, url, headers)
+                page = None
+                if self.cache is not None:
+                    page = await loop.run_in_executor(
+                        None, self.cache.page_from_response, url, status, html, response_headers
+                    )
+                    if page is None:
+                        # The stored copy was evicted while the request was in flight
+                        status, html, size, response_headers = await self._request(session, url, None)
+                        page = await loop.run_in_executor(
+                            None, self.cache.page_from_response, url, status, html, response_headers
+                        )
+                    html = page.html
+            except Exception as e:
+                logger.debug(f"Async fetch failed for {url}: {e}")
+                self.failed_urls.append(url)
+                await pages.put((url, None, None))
+                continue
+
+            self.fetched += 1
+            self.bytes_fetched += size
+            # Blocks while the parsers are behind - this is the backpressure
+            await pages.put((url, html, page))
+
+    async def _request(self, session, url: str, headers: Optional[Dict[str, str]]):
+        """
+        Make one request, paced by the rate limiter
+
+        Returns:
+            Tuple of (status, decoded body, body size in bytes, response headers)
+
+        Raises:
+            aiohttp.ClientError: On network errors or error statuses
+        """
+        if self.limiter is not None:
+            if self.limiter.knows(url):
+                wait = self.limiter.reserve(url)
+            else:
+                # The first request to a host reads its robots.txt with a
+                # blocking request: keep it off the event loop
+                wait = await asyncio.get_running_loop().run_in_executor(None, self.limiter.reserve, url)
+            if wait > 0:
+                await asyncio.sleep(wait)
+        start = time.monotonic()
+        try:
+            async with session.get(url, headers=headers) as response:
+                if self.limiter is not None:
+                    self.limiter.record(
+                        url, time.monotonic() - start, response.status, response.headers.get('Retry-After')
+                    )
+                if response.status != 304:
+                    response.raise_for_status()
+                body = await response.read()
+                charset = response.charset or 'utf-8'
+                status = response.status
+                response_headers = response.headers
+        except Exception as e:
+            if self.limiter is not None and not isinstance(e, aiohttp.ClientResponseError):
+                self.limiter.record(url, error=True)
+            raise
+
+        try:
+            html = body.decode(charset, errors='replace')
+        except LookupError:
+            html = body.decode('utf-8', errors='replace')
+        return status, html, len(body), response_headers
+
+    async def _parser(self, pages: asyncio.Queue, executor, emit, total: int) -> None:
+        """Parse queued pages until a sentinel arrives"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item = await pages.get()
+            if item is None:
+                return
+
+            url, html, page = item
+            product = None
+            if page is not None and page.product is not None:
+                product = page.product
+            elif html is not None:
+                try:
+                    product = await loop.run_in_executor(executor, self._parse, url, html, page)
+                except Exception as e:
+                    logger.error(f"Error parsing product {url}: {e}")
+
+            emit(url, product)
+
+            self._handled += 1
+            if self._handled % 100 == 0 or self._handled == total:
+                logger.info(f"Progress: {self._handled}/{total}")
+
+    def _parse(self, url: str, html: str, page) -> Optional[Dict]:
+        """Parse a page and store it in the cache (runs in the thread pool)"""
+        product = self.parse_fn(url, html)
+        if page is not None:
+            self.cache.store(page, product)
+        return product
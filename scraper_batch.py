@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Batch Mode - crawl many sites in one run across a pool of processes
+
+This module handles:
+- Reading a sites file: one listing URL per line, followed by the
+  products_scraper options for that site
+- Running the sites in worker processes, never two sites of the same host
+  at once, so each host's rate limiter stays in charge while the other
+  hosts keep the remaining processes busy
+- Starting the sites that took longest in the previous batch first, so a
+  slow site does not begin last and hold up the whole run
+- Writing each site's products, crawl state, log and summary to its own
+  files, plus a summary of the whole batch
+
+Usage:
+    python scraper_batch.py sites.txt --output-dir nightly --processes 8
+
+A sites file looks like:
+    # url                               options for this site
+    https://shop-a.example.com/products
+    https://shop-b.example.com/shop      --no-load-more --max-pages 40
+    https://shop-c.example.com/all       --fetch-strategy http --sitemap
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shlex
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from contextlib import redirect_stderr
+from io import StringIO
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+from urllib.parse import urlsplit
+
+from products_scraper import build_arg_parser, run_from_args
+
+
+logger = logging.getLogger(__name__)
+
+# Batch summary written to the output directory
+SUMMARY_FILE = 'batch_summary.json'
+
+# Options the batch sets for every site
+RESERVED_OPTIONS = ('--output', '-o', '--state')
+
+SITE_OK = 'ok'
+SITE_FAILED = 'failed'
+
+
+class SiteJob(NamedTuple):
+    """One site of a batch"""
+
+    name: str
+    url: str
+    # Sites of the same host never run at the same time
+    host: str
+    # products_scraper arguments, the URL and output paths included
+    argv: List[str]
+
+
+def site_name(url: str) -> str:
+    """
+    File-name-safe name of a site, e.g. 'shop.com-products' for https://shop.com/products/
+
+    Args:
+        url: Listing URL
+
+    Returns:
+        Host and path joined with '-'
+    """
+    parts = urlsplit(url)
+    name = f"{parts.netloc}{parts.path}".lower()
+    return re.sub(r'[^a-z0-9.]+', '-', name).strip('-.') or 'site'
+
+
+def parse_options(argv: Sequence[str]) -> argparse.Namespace:
+    """
+    Parse products_scraper options without exiting on errors
+
+    Args:
+        argv: Arguments, the URL first
+
+    Returns:
+        Parsed options
+
+    Raises:
+        ValueError: If the options are invalid
+    """
+    errors = StringIO()
+    try:
+        with redirect_stderr(errors):
+            return build_arg_parser().parse_args(list(argv))
+    except SystemExit:
+        message = errors.getvalue().strip().splitlines()
+        raise ValueError(message[-1] if message else 'invalid options') from None
+
+
+def load_sites(path: str, output_dir: str, defaults: Sequence[str] = (), extension: str = '.csv') -> List[SiteJob]:
+    """
+    Read a sites file
+
+    Blank lines and text after '#' are ignored. Sites that would share a
+    name are numbered.
+
+    Args:
+        path: Sites file
+        output_dir: Directory of the per-site outputs
+        defaults: Options placed before every site's own options
+        extension: Output extension ('.csv' or '.jsonl')
+
+    Returns:
+        Jobs in file order
+
+    Raises:
+        ValueError: If a line has an invalid URL, or invalid or reserved options
+    """
+    jobs = []
+    names: Dict[str, int] = {}
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            where = f"{path}:{line_number}"
+            try:
+                tokens = shlex.split(line, comments=True)
+            except ValueError as e:
+                raise ValueError(f"{where}: {e}") from None
+            if not tokens:
+                continue
+
+            url, options = tokens[0], tokens[1:]
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.netloc:
+                raise ValueError(f"{where}: {url} is not a complete http(s) URL")
+            reserved = [o.split('=', 1)[0] for o in options if o.split('=', 1)[0] in RESERVED_OPTIONS]
+            if reserved:
+                raise ValueError(f"{where}: {reserved[0]} is set by the batch for each site")
+
+            name = site_name(url)
+            names[name] = names.get(name, 0) + 1
+            if names[name] > 1:
+                name = f"{name}-{names[name]}"
+
+            argv = [url, *defaults, *options, '--output', os.path.join(output_dir, name + extension)]
+            try:
+                parse_options(argv)
+            except ValueError as e:
+                raise ValueError(f"{where}: {e}") from None
+            jobs.append(SiteJob(name, url, parts.netloc.lower(), argv))
+    return jobs
+
+
+def order_by_previous_duration(jobs: Sequence[SiteJob], previous: Dict[str, float]) -> List[SiteJob]:
+    """
+    Put the sites that took longest last time first
+
+    Sites without a previous duration are treated as the longest, and
+    equal sites keep their file order.
+
+    Args:
+        jobs: Sites in file order
+        previous: Site name -> seconds, from the previous batch summary
+
+    Returns:
+        Reordered jobs
+    """
+    return sorted(jobs, key=lambda job: -previous.get(job.name, float('inf')))
+
+
+def read_previous_durations(output_dir: str) -> Dict[str, float]:
+    """Site durations from the batch summary of an earlier run, if any"""
+    try:
+        with open(os.path.join(output_dir, SUMMARY_FILE), encoding='utf-8') as f:
+            sites = json.load(f).get('sites', [])
+        return {site['site']: float(site['seconds']) for site in sites}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def run_site(job: SiteJob) -> Dict:
+    """
+    Crawl one site (runs in a worker process)
+
+    The site's log goes to <name>.log and its summary to
+    <name>.summary.json next to its output.
+
+    Args:
+        job: Site to crawl
+
+    Returns:
+        Summary of the site
+    """
+    args = parse_options(job.argv)
+    stem = os.path.splitext(args.output)[0]
+    handler = logging.FileHandler(f"{stem}.log", encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    root = logging.getLogger()
+    root.addHandler(handler)
+
+    summary = {'site': job.name, 'url': job.url, 'output': args.output, 'status': SITE_OK, 'error': None}
+    start = time.monotonic()
+    try:
+        counts = run_from_args(args)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"{job.name} failed: {e}")
+        counts = {}
+        summary.update(status=SITE_FAILED, error=str(e) or type(e).__name__)
+    finally:
+        root.removeHandler(handler)
+        handler.close()
+
+    summary.update(
+        done=counts.get('done', 0),
+        failed=counts.get('failed', 0),
+        pending=counts.get('pending', 0),
+        seconds=round(time.monotonic() - start, 1),
+    )
+    with open(f"{stem}.summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def run_batch(
+    jobs: Sequence[SiteJob],
+    processes: int,
+    run_fn: Callable[[SiteJob], Dict] = run_site,
+    executor: Optional[Executor] = None,
+) -> List[Dict]:
+    """
+    Crawl sites in parallel, one site per host at a time
+
+    Args:
+        jobs: Sites, in the order they should start
+        processes: Sites crawled at the same time
+        run_fn: Crawls one site and returns its summary
+        executor: Executor to run sites in (default: a process pool)
+
+    Returns:
+        Site summaries in the order the jobs were given
+    """
+    processes = max(1, processes)
+    own_executor = executor is None
+    if own_executor:
+        # Fresh interpreters: no locks or browser handles inherited from the parent
+        executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+
+    waiting = list(jobs)
+    running: Dict = {}
+    busy_hosts = set()
+    summaries: Dict[str, Dict] = {}
+    try:
+        while waiting or running:
+            for job in list(waiting):
+                if len(running) >= processes:
+                    break
+                if job.host in busy_hosts:
+                    continue
+                waiting.remove(job)
+                busy_hosts.add(job.host)
+                running[executor.submit(run_fn, job)] = job
+                logger.info(f"Started {job.name}")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = running.pop(future)
+                busy_hosts.discard(job.host)
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    # The worker process died (e.g. killed for memory)
+                    summary = {
+                        'site': job.name, 'url': job.url, 'output': None, 'status': SITE_FAILED,
+                        'error': str(e) or type(e).__name__, 'done': 0, 'failed': 0, 'pending': 0,
+                        'seconds': 0.0,
+                    }
+                summaries[job.name] = summary
+                logger.info(
+                    f"Finished {job.name}: {summary['status']}, {summary['done']} products, "
+                    f"{summary['failed']} failed in {summary['seconds']:.0f}s "
+                    f"({len(summaries)}/{len(jobs)} sites)"
+                )
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return [summaries[job.name] for job in jobs if job.name in summaries]
+
+
+def write_summary(output_dir: str, summaries: Sequence[Dict], seconds: float) -> str:
+    """
+    Write the batch summary
+
+    Args:
+        output_dir: Batch output directory
+        summaries: Site summaries from run_batch()
+        seconds: Wall time of the batch
+
+    Returns:
+        Path of the summary file
+    """
+    path = os.path.join(output_dir, SUMMARY_FILE)
+    totals = {
+        'sites': len(summaries),
+        'sites_failed': sum(1 for s in summaries if s['status'] != SITE_OK),
+        'products': sum(s['done'] for s in summaries),
+        'products_failed': sum(s['failed'] for s in summaries),
+        'seconds': round(seconds, 1),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'totals': totals, 'sites': list(summaries)}, f, indent=2)
+    return path
+
+
+def main():
+    """Main entry point for batch mode"""
+    parser = argparse.ArgumentParser(
+        description='Scrape many e-commerce sites in one run, in parallel processes',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Each line of the sites file is a listing URL followed by products_scraper
+options for that site, e.g.:
+  https://example.com/shop --no-load-more --max-pages 40
+
+Examples:
+  python scraper_batch.py sites.txt
+  python scraper_batch.py sites.txt --output-dir nightly --processes 8 --jsonl
+  python scraper_batch.py sites.txt --defaults="--fetch-strategy auto --rate 2"
+        """
+    )
+    parser.add_argument('sites', help='File with one listing URL and its options per line')
+    parser.add_argument(
+        '--output-dir', '-d',
+        default='batch_output',
+        help='Directory for each site\'s products, state, log and summary (default: batch_output)'
+    )
+    parser.add_argument(
+        '--processes', '-p',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Sites crawled at the same time (default: number of CPUs)'
+    )
+    parser.add_argument(
+        '--defaults',
+        default='',
+        help='Options applied to every site before its own options, as one quoted string '
+             '(use --defaults="...")'
+    )
+    parser.add_argument(
+        '--jsonl',
+        action='store_true',
+        help='Write products as JSON Lines instead of CSV'
+    )
+    args = parser.parse_args()
+
+    if args.processes < 1:
+        logger.error("--processes must be at least 1")
+        sys.exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    try:
+        jobs = load_sites(
+            args.sites, args.output_dir, shlex.split(args.defaults), '.jsonl' if args.jsonl else '.csv'
+        )
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read sites: {e}")
+        sys.exit(1)
+    if not jobs:
+        logger.error(f"No sites in {args.sites}")
+        sys.exit(1)
+
+    jobs = order_by_previous_duration(jobs, read_previous_durations(args.output_dir))
+    processes = min(args.processes, len(jobs))
+    logger.info(f"Scraping {len(jobs)} sites with {processes} processes")
+
+    start = time.monotonic()
+    try:
+        summaries = run_batch(jobs, processes)
+    except KeyboardInterrupt:
+        logger.info("Batch interrupted by user - rerun with --defaults=--resume to continue")
+        sys.exit(1)
+    path = write_summary(args.output_dir, summaries, time.monotonic() - start)
+
+    failed = [s['site'] for s in summaries if s['status'] != SITE_OK]
+    logger.info(
+        f"Batch finished: {len(summaries) - len(failed)}/{len(summaries)} sites succeeded, "
+        f"{sum(s['done'] for s in summaries)} products. Summary: {path}"
+    )
+    if failed:
+        logger.error(f"Failed sites: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
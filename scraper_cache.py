@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Page Cache - keep fetched pages on disk and revalidate them on the next run
+
+This module handles:
+- A SQLite database of compressed page bodies keyed by normalized URL,
+  together with their ETag / Last-Modified validators and the product
+  extracted from them
+- Conditional GET requests (If-None-Match / If-Modified-Since); a 304
+  answer returns the stored product so the page is not parsed again; a
+  304 for a page evicted meanwhile is fetched again unconditionally
+- A size limit with least-recently-used eviction
+- Hit/miss statistics for the end-of-run report
+
+Usage:
+    with PageCache('pages.db', max_bytes=512 * 1024 * 1024) as cache:
+        page = cache.fetch(url, http_fetcher)
+        if page.product is None:
+            product = parse(page.html)
+            cache.store(page, product)
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+logger = logging.getLogger(__name__)
+
+# Default size limit for stored bodies
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# After an eviction the cache is trimmed to this fraction of its limit, so
+# evictions happen in batches instead of on every store
+EVICT_TO = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    body BLOB,
+    product TEXT,
+    size INTEGER NOT NULL,
+    fetched REAL,
+    accessed REAL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed);
+"""
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def cache_key(url: str) -> str:
+    """
+    Normalize a URL for use as a cache key
+
+    Lowercases the scheme and host, drops default ports and the fragment,
+    and sorts query parameters, so trivially different spellings of the
+    same page share one entry.
+
+    Args:
+        url: Page URL
+
+    Returns:
+        Normalized URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+class CachedPage:
+    """Result of fetching a page through the cache"""
+
+    __slots__ = ('url', 'html', 'product', 'etag', 'last_modified', 'not_modified')
+
+    def __init__(self, url: str, html: str, product: Optional[Dict] = None,
+                 etag: Optional[str] = None, last_modified: Optional[str] = None,
+                 not_modified: bool = False):
+        self.url = url
+        self.html = html
+        # Product stored with an unchanged page; None means it must be parsed
+        self.product = product
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+
+
+class PageCache:
+    """On-disk page cache with conditional revalidation and LRU eviction"""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, compression_level: int = 6):
+        """
+        Open (or create) the cache database
+
+        Args:
+            path: SQLite database file
+            max_bytes: Limit for the total size of stored entries
+            compression_level: zlib level used for page bodies
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+        row = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()
+        self.total_bytes = row[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.parses_skipped = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    def _lookup(self, key: str):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT etag, last_modified, body, product FROM pages WHERE key = ?', (key,)
+            ).fetchone()
+
+    def revalidation_headers(self, url: str) -> Dict[str, str]:
+        """
+        Conditional request headers for a stored page
+
+        Marks the page as used, so it is not evicted while the request is
+        in flight.
+
+        Args:
+            url: Page URL
+
+        Returns:
+            If-None-Match / If-Modified-Since headers, or an empty dict when
+            the page is not cached
+        """
+        key = cache_key(url)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified FROM pages WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute('UPDATE pages SET accessed = ? WHERE key = ?', (time.time(), key))
+                self._conn.commit()
+        headers = {}
+        if row is not None:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def page_from_response(self, url: str, status: int, html: str, headers) -> Optional[CachedPage]:
+        """
+        Turn the response to a (conditional) request into a CachedPage
+
+        Args:
+            url: Page URL
+            status: HTTP status code
+            html: Response body (empty for a 304)
+            headers: Response headers
+
+        Returns:
+            The stored page and product for a 304, otherwise the new page;
+            None for a 304 whose stored copy is gone (evicted since the
+            request was made), which must be fetched again without
+            conditional headers
+        """
+        key = cache_key(url)
+        row = self._lookup(key) if status == 304 else None
+
+        if status == 304 and row is None:
+            logger.debug(f"Stored copy of {url} was evicted during revalidation")
+            return None
+
+        if row is not None:
+            html = zlib.decompress(row[2]).decode('utf-8') if row[2] else ''
+            product = json.loads(row[3]) if row[3] else None
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += len(html)
+                if product is not None:
+                    self.parses_skipped += 1
+                self._conn.execute('UPDATE pages SET accessed = ? WHERE key = ?', (time.time(), key))
+                self._conn.commit()
+            return CachedPage(url, html, product, row[0], row[1], not_modified=True)
+
+        with self._lock:
+            self.misses += 1
+
+        return CachedPage(
+            url,
+            html,
+            etag=headers.get('ETag'),
+            last_modified=headers.get('Last-Modified'),
+        )
+
+    def fetch(self, url: str, fetcher) -> CachedPage:
+        """
+        Fetch a page, revalidating a stored copy with a conditional request
+
+        Args:
+            url: Page URL
+            fetcher: HttpFetcher used for the request
+
+        Returns:
+            CachedPage; its product is set when the server confirmed the
+            stored copy is unchanged and a product was stored with it
+
+        Raises:
+            requests.RequestException: On network errors or non-2xx responses
+        """
+        response = fetcher.get(url, headers=self.revalidation_headers(url))
+        html = '' if response.status_code == 304 else response.text
+        page = self.page_from_response(url, response.status_code, html, response.headers)
+        if page is None:
+            response = fetcher.get(url)
+            page = self.page_from_response(url, response.status_code, response.text, response.headers)
+        return page
+
+    def store(self, page: CachedPage, product: Optional[Dict]) -> None:
+        """
+        Store a page and the product extracted from it
+
+        Pages without an ETag or Last-Modified header cannot be revalidated
+        and are not stored, nor are pages without a body.
+
+        Args:
+            page: Page returned by fetch()
+            product: Product dictionary extracted from the page
+        """
+        if not (page.etag or page.last_modified) or not page.html:
+            return
+
+        key = cache_key(page.url)
+        body = zlib.compress(page.html.encode('utf-8'), self.compression_level)
+        product_json = json.dumps(product, ensure_ascii=False) if product is not None else None
+        size = len(body) + len(product_json or '') + len(key)
+        now = time.time()
+
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM pages WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages '
+                '(key, url, etag, last_modified, body, product, size, fetched, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, page.url, page.etag, page.last_modified, body, product_json, size, now, now),
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * EVICT_TO))
+            self._conn.commit()
+
+    def _evict(self, target: int) -> None:
+        """Delete least recently used entries until the cache fits in target bytes"""
+        rows = self._conn.execute('SELECT key, size FROM pages ORDER BY accessed').fetchall()
+        doomed = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            doomed.append((key,))
+            self.total_bytes -= size
+
+        self._conn.executemany('DELETE FROM pages WHERE key = ?', doomed)
+        self.evictions += len(doomed)
+        logger.debug(f"Evicted {len(doomed)} cached pages")
+
+    def summary(self) -> List[str]:
+        """Describe cache activity for this run"""
+        requests_made = self.hits + self.misses
+        hit_rate = 100.0 * self.hits / requests_made if requests_made else 0.0
+        return [
+            f"Page cache: {self.hits} hits, {self.misses} misses ({hit_rate:.0f}% hit rate)",
+            f"Page cache: {self.parses_skipped} parses skipped, {self.bytes_saved} bytes not "
+            f"downloaded, {self.evictions} evictions, {self.total_bytes} bytes stored",
+        ]
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
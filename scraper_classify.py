@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+URL Classification - decide which links are product pages
+
+This module handles:
+- One compiled pattern for the site sections that are never product pages
+  (cart, checkout, account, search, blog, ...), matched against the URL
+  path only
+- Rejecting non-web schemes, in-page anchors and file downloads from the
+  parsed URL instead of substring checks over the whole string
+- Classifying a page's links as a batch, with verdicts cached so links
+  repeated across selectors and pages are classified once
+- Learning the path prefix of confirmed product pages per host; once a
+  host has one, links under it are accepted without further checks, and
+  links outside it are still judged by the rules above
+
+Usage:
+    classifier = UrlClassifier()
+    product_urls = [url for url, ok in zip(urls, classifier.classify(urls)) if ok]
+    classifier.learn(product['url'])      # a page that turned out to be a product
+"""
+
+import json
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+
+# Leading path segments of site sections that are not product pages
+EXCLUDED_SECTIONS = (
+    'cart', 'checkout', 'account', 'login', 'signup', 'category', 'categories',
+    'search', 'about', 'contact', 'blog', 'news', 'faq', 'terms', 'privacy',
+)
+
+# File extensions of downloads and media
+EXCLUDED_EXTENSIONS = frozenset(('pdf', 'jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'zip'))
+
+# Confirmed product pages needed before a host's prefix is trusted
+MIN_SAMPLES = 20
+
+# Verdicts kept before the cache is cleared
+CACHE_SIZE = 100_000
+
+# A section segment anywhere in the path: /cart, /cart/, /help/faq.html, but not /cartier
+_SECTION_RE = re.compile(
+    r'/(?:%s)(?![a-z0-9])' % '|'.join(sorted(EXCLUDED_SECTIONS, key=len, reverse=True))
+)
+_WEB_SCHEMES = ('http', 'https', '')
+
+
+def common_prefix(paths: Sequence[str]) -> str:
+    """
+    Longest common directory prefix of URL paths
+
+    Args:
+        paths: URL paths, e.g. '/products/rose'
+
+    Returns:
+        The shared leading segments ending in '/', e.g. '/products/', or
+        '/' when the paths have nothing in common
+    """
+    if not paths:
+        return '/'
+    directories = [path.split('/')[1:-1] for path in paths]
+    shared = []
+    for segments in zip(*directories):
+        if any(segment != segments[0] for segment in segments):
+            break
+        shared.append(segments[0])
+    return '/' + ''.join(segment + '/' for segment in shared)
+
+
+class UrlClassifier:
+    """Classify links as product pages, learning each site's product paths"""
+
+    def __init__(self, min_samples: int = MIN_SAMPLES, cache_size: int = CACHE_SIZE):
+        """
+        Initialize the classifier
+
+        Args:
+            min_samples: Confirmed product pages of a host needed before
+                their common path prefix is used
+            cache_size: Verdicts cached before the cache is cleared
+        """
+        self.min_samples = max(1, min_samples)
+        self.cache_size = cache_size
+        # Host -> learned product path prefix
+        self.includes: Dict[str, str] = {}
+        self._samples: Dict[str, List[str]] = defaultdict(list)
+        self._cache: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def is_product(self, url: str) -> bool:
+        """
+        Determine if a URL is likely a product detail page
+
+        Args:
+            url: Absolute URL
+
+        Returns:
+            True if the URL appears to be a product page
+        """
+        verdict = self._cache.get(url)
+        if verdict is None:
+            verdict = self._classify(url)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[url] = verdict
+        return verdict
+
+    def classify(self, urls: Iterable[str]) -> List[bool]:
+        """
+        Classify a batch of URLs, e.g. every link of a listing page
+
+        Args:
+            urls: Absolute URLs (repeats are classified once)
+
+        Returns:
+            One verdict per URL, in the order given
+        """
+        return [self.is_product(url) for url in urls]
+
+    def _classify(self, url: str) -> bool:
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return False
+        if parts.scheme.lower() not in _WEB_SCHEMES or parts.fragment or url.endswith('#'):
+            return False
+
+        path = parts.path.lower()
+        name = path.rsplit('/', 1)[-1]
+        if '.' in name and name.rsplit('.', 1)[-1] in EXCLUDED_EXTENSIONS:
+            return False
+
+        prefix = self.includes.get(parts.netloc.lower())
+        if prefix is not None and path.startswith(prefix):
+            return True
+        # The prefix comes from the products seen so far, which may all share
+        # one category: it never rules a link out
+        return _SECTION_RE.search(path) is None
+
+    def learn(self, url: str) -> None:
+        """
+        Record a URL confirmed to be a product page
+
+        After min_samples confirmations of a host, the common path prefix
+        of its product pages (if deeper than '/') becomes its include rule:
+        links under it are accepted even if a section name appears in them.
+
+        Args:
+            url: Product page URL
+        """
+        parts = urlsplit(url)
+        host = parts.netloc.lower()
+        with self._lock:
+            if host in self.includes:
+                return
+            samples = self._samples[host]
+            samples.append(parts.path.lower())
+            if len(samples) < self.min_samples:
+                return
+
+            prefix = common_prefix(samples)
+            del self._samples[host]
+            if prefix != '/':
+                self.includes[host] = prefix
+                self._cache.clear()
+
+    def dumps(self) -> str:
+        """Learned prefixes as JSON, to be stored with the crawl state"""
+        return json.dumps(self.includes, sort_keys=True)
+
+    def loads(self, data: Optional[str]) -> None:
+        """
+        Restore prefixes saved by dumps()
+
+        Args:
+            data: JSON from dumps(), or None
+        """
+        if not data:
+            return
+        try:
+            includes = json.loads(data)
+        except ValueError:
+            return
+        if isinstance(includes, dict):
+            with self._lock:
+                self.includes.update({
+                    str(host).lower(): prefix for host, prefix in includes.items()
+                    if isinstance(prefix, str) and prefix.startswith('/')
+                })
+                self._cache.clear()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Incremental Crawls - only re-extract product pages that changed since the last run
+
+This module handles:
+- Fingerprinting the product-relevant part of a page (structured data,
+  product meta tags and the main content) while ignoring scripts, styles,
+  comments and per-request tokens
+- Comparing fingerprints with the previous run's state file and reusing
+  the stored product when a page is unchanged
+- Writing a delta of added, changed and removed products
+
+Usage:
+    with CrawlStateStore('yesterday.csv.state.db') as previous, \
+            open_sink('today.delta.jsonl', fieldnames=DELTA_FIELDS) as delta:
+        scraper.scrape_all_products(
+            state=state, incremental=IncrementalCrawl(previous, delta)
+        )
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from scraper_sinks import PRODUCT_FIELDS
+
+
+logger = logging.getLogger(__name__)
+
+# Change types written to the delta output
+CHANGE_ADDED = 'added'
+CHANGE_CHANGED = 'changed'
+CHANGE_REMOVED = 'removed'
+
+# Delta output columns: the change type, then the product columns
+DELTA_FIELDS = ['change'] + PRODUCT_FIELDS
+
+# Markup that changes between requests without the product changing.
+# JSON-LD scripts are kept: they usually carry the price and availability.
+_NOISE_RE = re.compile(
+    r'<script\b(?![^>]*ld\+json)[^>]*>.*?</script\s*>'
+    r'|<style\b[^>]*>.*?</style\s*>'
+    r'|<noscript\b[^>]*>.*?</noscript\s*>'
+    r'|<svg\b[^>]*>.*?</svg\s*>'
+    r'|<!--.*?-->'
+    r'|<input\b[^>]*type\s*=\s*["\']?hidden[^>]*>'
+    r'|\s(?:nonce|data-csrf[\w-]*|data-request-id)\s*=\s*(?:"[^"]*"|\'[^\']*\'|[^\s>]+)',
+    re.IGNORECASE | re.DOTALL,
+)
+_META_RE = re.compile(r'<meta\b[^>]*\b(?:property|itemprop)\s*=[^>]*>', re.IGNORECASE)
+_LD_JSON_RE = re.compile(r'<script\b[^>]*ld\+json[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+_MAIN_START_RE = re.compile(r'<main\b', re.IGNORECASE)
+_MAIN_END_RE = re.compile(r'</main\s*>', re.IGNORECASE)
+_BODY_START_RE = re.compile(r'<body\b', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def _content_region(html: str) -> str:
+    """The main product content: <main> if the page has one, else <body>"""
+    start = _MAIN_START_RE.search(html)
+    if start:
+        ends = list(_MAIN_END_RE.finditer(html, start.start()))
+        if ends:
+            return html[start.start():ends[-1].end()]
+
+    start = _BODY_START_RE.search(html)
+    return html[start.start():] if start else html
+
+
+def content_fingerprint(html: str) -> str:
+    """
+    Fingerprint the product-relevant content of a page
+
+    The fingerprint covers JSON-LD blocks, OpenGraph / microdata meta tags
+    and the main content region, with scripts, styles, comments, hidden
+    inputs, nonces and whitespace differences removed. Pages that differ
+    only in that noise get the same fingerprint.
+
+    Args:
+        html: Page HTML
+
+    Returns:
+        Hex digest
+    """
+    cleaned = _NOISE_RE.sub('', html or '')
+
+    digest = hashlib.blake2b(digest_size=16)
+    for part in _LD_JSON_RE.findall(cleaned):
+        digest.update(_SPACE_RE.sub(' ', part).encode('utf-8'))
+    for part in _META_RE.findall(cleaned):
+        digest.update(part.encode('utf-8'))
+
+    region = _LD_JSON_RE.sub('', _content_region(cleaned))
+    digest.update(_SPACE_RE.sub(' ', region).strip().encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _comparable(product: Optional[Dict]) -> Dict:
+    """Product columns used to decide whether a product changed"""
+    product = product or {}
+    return {field: product.get(field, '') for field in PRODUCT_FIELDS}
+
+
+class IncrementalCrawl:
+    """Reuse unchanged products from the previous run and record the delta"""
+
+    def __init__(self, previous, delta_sink=None):
+        """
+        Initialize the incremental crawl
+
+        Args:
+            previous: CrawlStateStore of the previous run
+            delta_sink: ProductSink (with DELTA_FIELDS) receiving added,
+                changed and removed products
+        """
+        self.previous = previous
+        self.delta_sink = delta_sink
+
+        self.counts = {
+            'unchanged': 0,
+            CHANGE_ADDED: 0,
+            CHANGE_CHANGED: 0,
+            CHANGE_REMOVED: 0,
+        }
+        self._lock = threading.Lock()
+
+        started = previous.get_meta('started_at')
+        try:
+            self.previous_started: Optional[datetime] = datetime.fromisoformat(started) if started else None
+        except ValueError:
+            self.previous_started = None
+
+    def unchanged(self, url: str, fingerprint: str) -> Optional[Dict]:
+        """
+        Get the previous product if the page content did not change
+
+        Args:
+            url: Product page URL
+            fingerprint: Fingerprint of the page just fetched
+
+        Returns:
+            A copy of the previous run's product, or None if the page is new
+            or changed and must be extracted
+        """
+        completed = self.previous.completed(url)
+        if completed is None:
+            return None
+
+        previous_fingerprint, product = completed
+        if product is None or previous_fingerprint != fingerprint:
+            return None
+
+        with self._lock:
+            self.counts['unchanged'] += 1
+        return dict(product)
+
+    def unchanged_since(self, url: str, lastmod: Optional[datetime]) -> Optional[Dict]:
+        """
+        Get the previous product if the sitemap says the page did not change
+
+        Args:
+            url: Product page URL
+            lastmod: <lastmod> of the page (timezone aware)
+
+        Returns:
+            A copy of the previous run's product if the page was last
+            modified before the previous run started, else None
+        """
+        if lastmod is None or self.previous_started is None or lastmod >= self.previous_started:
+            return None
+
+        completed = self.previous.completed(url)
+        if completed is None or completed[1] is None:
+            return None
+
+        with self._lock:
+            self.counts['unchanged'] += 1
+        return dict(completed[1])
+
+    def previous_fingerprint(self, url: str, product: Dict) -> Optional[str]:
+        """
+        Fingerprint to carry over for a product that was not fingerprinted,
+        e.g. one served from the page cache
+
+        Returns:
+            The previous fingerprint if the product is unchanged, else None
+        """
+        completed = self.previous.completed(url)
+        if completed is None or _comparable(completed[1]) != _comparable(product):
+            return None
+        return completed[0]
+
+    def record(self, product: Dict) -> None:
+        """
+        Compare a scraped product with the previous run and write any change
+
+        Args:
+            product: Product dictionary
+        """
+        completed = self.previous.completed(product['url'])
+        if completed is None:
+            change = CHANGE_ADDED
+        elif _comparable(completed[1]) != _comparable(product):
+            change = CHANGE_CHANGED
+        else:
+            return
+
+        self._write(change, product)
+
+    def finish(self, current_urls: Iterable[str]) -> None:
+        """
+        Write the products of the previous run that no longer exist
+
+        Args:
+            current_urls: Every product URL discovered in this run
+        """
+        current = set(current_urls)
+        for url, product in self.previous.completed_products():
+            if url not in current:
+                self._write(CHANGE_REMOVED, product or {'url': url})
+
+    def _write(self, change: str, product: Dict) -> None:
+        with self._lock:
+            self.counts[change] += 1
+        if self.delta_sink is not None:
+            row = dict(product)
+            row['change'] = change
+            self.delta_sink.write(row)
+
+    def summary(self) -> List[str]:
+        """Describe what changed since the previous run"""
+        return [
+            f"Incremental crawl: {self.counts['unchanged']} unchanged pages not re-extracted, "
+            f"{self.counts[CHANGE_ADDED]} added, {self.counts[CHANGE_CHANGED]} changed, "
+            f"{self.counts[CHANGE_REMOVED]} removed"
+        ]
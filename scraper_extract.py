@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Compiled Extractor - resolve every product field in one walk of the page
+
+This module handles:
+- The CSS selector lists for each product field, in priority order
+- Compiling those selectors once into matchers indexed by tag, class and
+  attribute name
+- Parsing pages with lxml and resolving all fields in a single tree walk,
+  with the same priority rules as the ProductsScraper._extract_* methods
+
+Usage:
+    extractor = CompiledExtractor()
+    fields = extractor.extract(html, base_url='https://example.com')
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urljoin
+
+try:
+    import lxml.html
+    from lxml import etree
+    LXML_INSTALLED = True
+except ImportError:
+    lxml = None
+    etree = None
+    LXML_INSTALLED = False
+
+
+# Selectors for each product field, highest priority first. The keys match
+# the columns of the product dictionary.
+FIELD_SELECTORS: Dict[str, List[str]] = {
+    'title': [
+        'h1[class*="product"]',
+        'h1[class*="title"]',
+        '.product-title',
+        '.product-name',
+        'h1',
+        '[itemprop="name"]',
+    ],
+    'price': [
+        '[class*="price"]',
+        '[itemprop="price"]',
+        '.product-price',
+        'span[class*="amount"]',
+    ],
+    'description': [
+        '[class*="description"]',
+        '[itemprop="description"]',
+        '.product-description',
+        '.product-details',
+    ],
+    'image_url': [
+        'img[class*="product"]',
+        '[itemprop="image"]',
+        '.product-image img',
+        '.product-gallery img',
+    ],
+    'sku': [
+        '[itemprop="sku"]',
+        '.sku',
+        '[class*="sku"]',
+    ],
+    'availability': [
+        '[itemprop="availability"]',
+        '.availability',
+        '[class*="stock"]',
+    ],
+    'category': [
+        '[class*="breadcrumb"] a',
+        '.category',
+        '[class*="category"]',
+    ],
+    'brand': [
+        '[itemprop="brand"]',
+        '.brand',
+        '[class*="brand"]',
+    ],
+}
+
+TITLE_SELECTORS = FIELD_SELECTORS['title']
+PRICE_SELECTORS = FIELD_SELECTORS['price']
+
+# Maximum length of the extracted description
+DESCRIPTION_LIMIT = 500
+
+# Fields whose value comes from the last match of a selector (breadcrumbs)
+LAST_MATCH_FIELDS = ('category',)
+
+_COMPOUND_RE = re.compile(r'([a-zA-Z][\w-]*|\*)?((?:[.#][\w-]+|\[[^\]]+\])*)$')
+_PART_RE = re.compile(r'[.#][\w-]+|\[[^\]]+\]')
+_ATTRIBUTE_RE = re.compile(
+    r'\[\s*([\w:-]+)\s*(?:([*^$~|]?=)\s*(?:"([^"]*)"|\'([^\']*)\'|([^\]\s]+)))?\s*\]$'
+)
+
+# Text nodes as BeautifulSoup's get_text() sees them: script, style and
+# template contents and comments are left out
+if LXML_INSTALLED:
+    _TEXT_XPATH = etree.XPath(
+        './/text()[not(ancestor::script or ancestor::style or ancestor::template)]'
+    )
+
+
+class Compound:
+    """One compound selector such as 'span.price[itemprop="price"]'"""
+
+    __slots__ = ('tag', 'classes', 'ids', 'attributes')
+
+    def __init__(self, text: str):
+        match = _COMPOUND_RE.match(text)
+        if not match:
+            raise ValueError(f"Unsupported selector: {text}")
+
+        tag = match.group(1)
+        self.tag = tag.lower() if tag and tag != '*' else None
+        self.classes: List[str] = []
+        self.ids: List[str] = []
+        self.attributes: List[Tuple[str, Optional[str], str]] = []
+
+        for part in _PART_RE.findall(match.group(2) or ''):
+            if part[0] == '.':
+                self.classes.append(part[1:])
+            elif part[0] == '#':
+                self.ids.append(part[1:])
+            else:
+                attribute = _ATTRIBUTE_RE.match(part)
+                if not attribute:
+                    raise ValueError(f"Unsupported attribute selector: {part}")
+                name, operator, double, single, bare = attribute.groups()
+                value = next((v for v in (double, single, bare) if v is not None), '')
+                self.attributes.append((name.lower(), operator, value))
+
+    def matches(self, element) -> bool:
+        """Check whether an lxml element matches this compound"""
+        if self.tag is not None and element.tag != self.tag:
+            return False
+
+        if self.classes:
+            classes = (element.get('class') or '').split()
+            for name in self.classes:
+                if name not in classes:
+                    return False
+
+        for element_id in self.ids:
+            if element.get('id') != element_id:
+                return False
+
+        for name, operator, value in self.attributes:
+            actual = element.get(name)
+            if actual is None:
+                return False
+            if operator is None:
+                continue
+            if operator == '=':
+                if actual != value:
+                    return False
+            elif operator == '*=':
+                if not value or value not in actual:
+                    return False
+            elif operator == '^=':
+                if not value or not actual.startswith(value):
+                    return False
+            elif operator == '$=':
+                if not value or not actual.endswith(value):
+                    return False
+            elif operator == '~=':
+                if value not in actual.split():
+                    return False
+            elif operator == '|=':
+                if actual != value and not actual.startswith(value + '-'):
+                    return False
+
+        return True
+
+
+class CompiledSelector:
+    """A selector made of compounds joined by descendant combinators"""
+
+    __slots__ = ('text', 'field', 'priority', 'compounds')
+
+    def __init__(self, text: str, field: str, priority: int):
+        if any(combinator in text for combinator in ('>', '+', '~ ', ',')):
+            raise ValueError(f"Unsupported selector combinator: {text}")
+
+        self.text = text
+        self.field = field
+        self.priority = priority
+        self.compounds = [Compound(part) for part in text.split()]
+
+    @property
+    def key(self) -> Compound:
+        """The compound the matched element itself must satisfy"""
+        return self.compounds[-1]
+
+    def matches(self, element) -> bool:
+        """Check whether an lxml element matches the full selector"""
+        if not self.key.matches(element):
+            return False
+
+        remaining = len(self.compounds) - 2
+        if remaining < 0:
+            return True
+
+        for ancestor in element.iterancestors():
+            if self.compounds[remaining].matches(ancestor):
+                remaining -= 1
+                if remaining < 0:
+                    return True
+
+        return False
+
+
+def element_text(element) -> str:
+    """Text of an element, joined like BeautifulSoup's get_text(strip=True)"""
+    return ''.join(text.strip() for text in _TEXT_XPATH(element))
+
+
+def parse_html(html: str):
+    """
+    Parse an HTML document with lxml
+
+    Args:
+        html: Page HTML
+
+    Returns:
+        Root element of the document, or None for an empty document
+    """
+    if not html or not html.strip():
+        return None
+
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # Unicode strings with an XML encoding declaration must be bytes
+        return lxml.html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        return None
+
+
+class CompiledExtractor:
+    """Resolve all product fields with one walk of an lxml tree"""
+
+    def __init__(self, field_selectors: Optional[Dict[str, Sequence[str]]] = None):
+        """
+        Compile the field selectors
+
+        Args:
+            field_selectors: Mapping of field name to selectors in priority
+                order (defaults to FIELD_SELECTORS)
+        """
+        if not LXML_INSTALLED:
+            raise ImportError(
+                "The compiled extractor requires lxml. "
+                "Please run: pip install -r requirements.txt"
+            )
+
+        self.field_selectors = field_selectors or FIELD_SELECTORS
+        self.fields = list(self.field_selectors)
+
+        # Index selectors by what their matched element must have, so each
+        # element is only tested against selectors that could match it
+        self._by_tag: Dict[str, List[CompiledSelector]] = {}
+        self._by_class: Dict[str, List[CompiledSelector]] = {}
+        self._by_attribute: Dict[str, List[CompiledSelector]] = {}
+        self._generic: List[CompiledSelector] = []
+
+        for field, selectors in self.field_selectors.items():
+            for priority, text in enumerate(selectors):
+                selector = CompiledSelector(text, field, priority)
+                key = selector.key
+                if key.tag is not None:
+                    self._by_tag.setdefault(key.tag, []).append(selector)
+                elif key.classes:
+                    self._by_class.setdefault(key.classes[0], []).append(selector)
+                elif key.attributes:
+                    self._by_attribute.setdefault(key.attributes[0][0], []).append(selector)
+                elif key.ids:
+                    self._by_attribute.setdefault('id', []).append(selector)
+                else:
+                    self._generic.append(selector)
+
+        self._accept: Dict[str, Callable] = {
+            'price': self._accept_price,
+            'description': self._accept_description,
+            'image_url': self._accept_image,
+        }
+
+    def extract(self, html: str, base_url: str, fields: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """
+        Extract product fields from a page
+
+        Args:
+            html: Page HTML
+            base_url: URL that relative image URLs are resolved against
+            fields: Only resolve these fields (defaults to all)
+
+        Returns:
+            Dictionary of field name to value ("N/A" when not found)
+        """
+        return self.extract_tree(parse_html(html), base_url, fields)
+
+    def extract_tree(self, root, base_url: str, fields: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """
+        Extract product fields from a parsed lxml tree
+
+        Args:
+            root: Root element from parse_html (or None)
+            base_url: URL that relative image URLs are resolved against
+            fields: Only resolve these fields (defaults to all)
+
+        Returns:
+            Dictionary of field name to value ("N/A" when not found)
+        """
+        wanted = self.fields if fields is None else [f for f in self.fields if f in fields]
+        result = {field: "N/A" for field in wanted}
+        if root is None:
+            return result
+
+        # Best accepted priority per field; fields that are not wanted start
+        # below every priority so their selectors are skipped
+        best: Dict[str, int] = {field: -1 for field in self.fields if field not in result}
+        # (field, priority) pairs whose first match has been seen
+        seen = set()
+        # Last element matched per (field, priority), for breadcrumb fields
+        last: Dict[Tuple[str, int], object] = {}
+
+        by_tag = self._by_tag
+        by_class = self._by_class
+        by_attribute = self._by_attribute
+        generic = self._generic
+
+        for element in root.iter():
+            tag = element.tag
+            if not isinstance(tag, str):
+                continue  # Comments and processing instructions
+
+            candidates = list(generic)
+            indexed = by_tag.get(tag)
+            if indexed:
+                candidates.extend(indexed)
+            for name in element.keys():
+                indexed = by_attribute.get(name)
+                if indexed:
+                    candidates.extend(indexed)
+            class_attr = element.get('class')
+            if class_attr:
+                for name in class_attr.split():
+                    indexed = by_class.get(name)
+                    if indexed:
+                        candidates.extend(indexed)
+
+            for selector in candidates:
+                field = selector.field
+                priority = selector.priority
+                if priority > best.get(field, priority):
+                    continue
+
+                if field in LAST_MATCH_FIELDS:
+                    if selector.matches(element):
+                        last[(field, priority)] = element
+                        best[field] = priority
+                    continue
+
+                key = (field, priority)
+                if key in seen or not selector.matches(element):
+                    continue
+
+                # Like select_one: only the first match of each selector counts
+                seen.add(key)
+                accept = self._accept.get(field, element_text)
+                value = accept(element, base_url) if field == 'image_url' else accept(element)
+                if value is not None and priority < best.get(field, len(self.field_selectors[field])):
+                    best[field] = priority
+                    result[field] = value
+
+        for field in LAST_MATCH_FIELDS:
+            if field in result and field in best:
+                result[field] = element_text(last[(field, best[field])])
+
+        if 'availability' in result and 'availability' not in best:
+            result['availability'] = self._availability_from_text(root)
+
+        return result
+
+    @staticmethod
+    def _accept_price(element) -> Optional[str]:
+        text = element_text(element)
+        if text and any(char.isdigit() for char in text):
+            return text
+        return None
+
+    @staticmethod
+    def _accept_description(element) -> str:
+        return element_text(element)[:DESCRIPTION_LIMIT]
+
+    @staticmethod
+    def _accept_image(element, base_url: str) -> Optional[str]:
+        img_url = element.get('src') or element.get('data-src')
+        if img_url:
+            return urljoin(base_url, img_url)
+        return None
+
+    @staticmethod
+    def _availability_from_text(root) -> str:
+        """Check the whole page text for common availability indicators"""
+        text = ''.join(_TEXT_XPATH(root)).lower()
+        if 'in stock' in text:
+            return "In Stock"
+        elif 'out of stock' in text:
+            return "Out of Stock"
+        return "N/A"
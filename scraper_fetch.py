@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Fetch Strategies - choose between a plain HTTP GET and a full browser render
+
+This module handles:
+- A pooled keep-alive HTTP session for server-rendered pages
+- Deciding whether an HTTP-fetched product is complete enough to keep
+- Remembering per domain whether the HTTP fast path works
+
+Usage:
+    fetcher = HttpFetcher(user_agent=USER_AGENT)
+    strategies = FetchStrategySelector()
+    if strategies.should_try_http(url):
+        html = fetcher.fetch(url)
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_INSTALLED = True
+except ImportError:
+    requests = None
+    HTTPAdapter = None
+    REQUESTS_INSTALLED = False
+
+
+logger = logging.getLogger(__name__)
+
+# Fetch strategy names
+STRATEGY_AUTO = 'auto'
+STRATEGY_HTTP = 'http'
+STRATEGY_BROWSER = 'browser'
+STRATEGIES = (STRATEGY_AUTO, STRATEGY_HTTP, STRATEGY_BROWSER)
+
+# Fields that must be found for an HTTP-fetched page to count as complete
+DEFAULT_REQUIRED_FIELDS = ('title', 'price')
+
+
+class HttpFetcher:
+    """Fetch pages over pooled keep-alive HTTP connections"""
+
+    def __init__(self, user_agent: str, timeout: float = 10, pool_size: int = 10, limiter=None):
+        """
+        Initialize the fetcher
+
+        Args:
+            user_agent: User-Agent header sent with every request
+            timeout: Request timeout in seconds
+            pool_size: Maximum kept-alive connections per host
+            limiter: HostRateLimiter every request waits for and reports to
+        """
+        if not REQUESTS_INSTALLED:
+            raise ImportError(
+                "The HTTP fast path requires requests. "
+                "Please run: pip install -r requirements.txt"
+            )
+
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.limiter = limiter
+        self._local = threading.local()
+
+    @property
+    def session(self) -> "requests.Session":
+        """HTTP session for the current thread"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({
+                'User-Agent': self.user_agent,
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.9',
+            })
+            self._local.session = session
+        return session
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, stream: bool = False) -> "requests.Response":
+        """
+        Send a GET request, e.g. a conditional one
+
+        Args:
+            url: Page URL
+            headers: Extra request headers
+            stream: Leave the body unread, for large files (close the response)
+
+        Returns:
+            Response with a 2xx or 304 status
+
+        Raises:
+            requests.RequestException: On network errors or other statuses
+        """
+        response = self._send(url, headers, stream)
+        if response.status_code != 304:
+            try:
+                response.raise_for_status()
+            except requests.HTTPError:
+                response.close()
+                raise
+        return response
+
+    def fetch(self, url: str) -> str:
+        """
+        Fetch a page's HTML
+
+        Args:
+            url: Page URL
+
+        Returns:
+            Response body as text
+
+        Raises:
+            requests.RequestException: On network errors or non-2xx responses
+        """
+        response = self._send(url)
+        response.raise_for_status()
+        return response.text
+
+    def _send(self, url: str, headers: Optional[Dict[str, str]] = None, stream: bool = False) -> "requests.Response":
+        """Send a GET request paced by the rate limiter"""
+        if self.limiter is None:
+            return self.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+
+        self.limiter.acquire(url)
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+        except requests.RequestException:
+            self.limiter.record(url, error=True)
+            raise
+        self.limiter.record(
+            url, time.monotonic() - start, response.status_code, response.headers.get('Retry-After')
+        )
+        return response
+
+    def close(self) -> None:
+        """Close the current thread's session"""
+        session = getattr(self._local, 'session', None)
+        if session is not None:
+            session.close()
+            self._local.session = None
+
+
+def is_complete(product: Optional[Dict], required_fields: Iterable[str] = DEFAULT_REQUIRED_FIELDS) -> bool:
+    """
+    Check whether an extracted product has all required fields populated
+
+    Args:
+        product: Product dictionary (or None)
+        required_fields: Field names that must not be "N/A" or empty
+
+    Returns:
+        True if every required field has a value
+    """
+    if not product:
+        return False
+
+    for field in required_fields:
+        value = product.get(field)
+        if not value or value == "N/A":
+            return False
+
+    return True
+
+
+class FetchStrategySelector:
+    """
+    Remember, per domain, whether product pages can be fetched without a browser
+
+    The first page of a domain is probed over HTTP. If it yields a complete
+    product, later pages use HTTP and only fall back to the browser when a
+    page comes back incomplete; after several misses in a row the domain is
+    switched to the browser for good.
+    """
+
+    def __init__(self, mode: str = STRATEGY_AUTO, max_consecutive_misses: int = 3):
+        """
+        Initialize the selector
+
+        Args:
+            mode: 'auto' to probe and remember, 'http' to always use HTTP
+                without a browser fallback, 'browser' to always render
+            max_consecutive_misses: Incomplete HTTP pages in a row before a
+                domain is switched to the browser
+        """
+        if mode not in STRATEGIES:
+            raise ValueError(f"Unknown fetch strategy: {mode}")
+
+        self.mode = mode
+        self.max_consecutive_misses = max_consecutive_misses
+        self._domains: Dict[str, str] = {}
+        self._misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _domain(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def strategy_for(self, url: str) -> Optional[str]:
+        """
+        Get the remembered strategy for a URL's domain
+
+        Returns:
+            'http', 'browser', or None if the domain has not been probed yet
+        """
+        if self.mode != STRATEGY_AUTO:
+            return self.mode
+
+        with self._lock:
+            return self._domains.get(self._domain(url))
+
+    def should_try_http(self, url: str) -> bool:
+        """Whether the HTTP fast path should be attempted for a URL"""
+        return self.strategy_for(url) != STRATEGY_BROWSER
+
+    def allows_browser(self) -> bool:
+        """Whether incomplete HTTP pages may fall back to the browser"""
+        return self.mode != STRATEGY_HTTP
+
+    def record(self, url: str, http_complete: bool) -> None:
+        """
+        Record the outcome of an HTTP attempt
+
+        Args:
+            url: URL that was fetched over HTTP
+            http_complete: Whether the HTTP page produced a complete product
+        """
+        if self.mode != STRATEGY_AUTO:
+            return
+
+        domain = self._domain(url)
+        with self._lock:
+            current = self._domains.get(domain)
+
+            if http_complete:
+                self._misses[domain] = 0
+                if current is None:
+                    self._domains[domain] = STRATEGY_HTTP
+                    logger.info(f"Using HTTP fast path for {domain}")
+                return
+
+            if current is None:
+                self._domains[domain] = STRATEGY_BROWSER
+                logger.info(f"Pages on {domain} need a browser - skipping HTTP fast path")
+                return
+
+            self._misses[domain] = self._misses.get(domain, 0) + 1
+            if self._misses[domain] >= self.max_consecutive_misses:
+                self._domains[domain] = STRATEGY_BROWSER
+                logger.info(
+                    f"{self._misses[domain]} incomplete HTTP pages in a row on {domain} - "
+                    "switching to browser"
+                )
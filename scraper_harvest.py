@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Link Harvesting - collect product links as the listing grows
+
+This module handles:
+- A MutationObserver injected into the listing page that checks only the
+  nodes added since the last look (and links whose href changes) against
+  the product-link selectors
+- Draining the links buffered since the previous call, so each "Load More"
+  click costs the same no matter how many cards the page already holds
+- A running count of product links, read by the readiness probe instead
+  of re-running the selectors over the whole page
+
+Usage:
+    harvester = LinkHarvester(PRODUCT_LINK_SELECTORS)
+    hrefs = harvester.drain(driver)     # every link on the page so far
+    click_load_more()
+    hrefs = harvester.drain(driver)     # only the links that appeared
+"""
+
+import logging
+from typing import List, Optional, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+# Page global holding the observer state; '@' + name is the readiness
+# probe's count source for the number of links seen
+HARVEST_GLOBAL = '__scraperHarvest'
+HARVEST_COUNTER = '@' + HARVEST_GLOBAL
+
+# Installs the observer on first use in each document, then returns and
+# clears the buffered hrefs. A link is taken once; links without an href
+# yet are picked up when the attribute is set.
+HARVEST_SCRIPT = """
+var selector = arguments[0];
+var h = window.%(name)s;
+var installed = !h;
+if (!h) {
+  h = window.%(name)s = {seen: new WeakSet(), buffer: [], total: 0};
+  var take = function (link) {
+    var href = link.getAttribute('href');
+    if (!href || h.seen.has(link)) return;
+    h.seen.add(link);
+    h.buffer.push(href);
+    h.total++;
+  };
+  var scan = function (root) {
+    if (!root || root.nodeType !== 1) return;
+    try {
+      if (root.matches(selector)) take(root);
+      var found = root.querySelectorAll(selector);
+      for (var i = 0; i < found.length; i++) take(found[i]);
+    } catch (e) {}
+  };
+  new MutationObserver(function (records) {
+    for (var i = 0; i < records.length; i++) {
+      var record = records[i];
+      if (record.type === 'attributes') {
+        scan(record.target);
+        continue;
+      }
+      for (var j = 0; j < record.addedNodes.length; j++) scan(record.addedNodes[j]);
+    }
+  }).observe(document.documentElement, {
+    childList: true, subtree: true, attributes: true, attributeFilter: ['href']
+  });
+  scan(document.documentElement);
+}
+var links = h.buffer;
+h.buffer = [];
+return {links: links, total: h.total, installed: installed};
+""" % {'name': HARVEST_GLOBAL}
+
+
+class LinkHarvester:
+    """Collect product links from a listing page as they are added"""
+
+    def __init__(self, link_selectors: Sequence[str]):
+        """
+        Initialize the harvester
+
+        Args:
+            link_selectors: Selectors of product links on listing pages
+        """
+        self.selector = ', '.join(link_selectors)
+
+    def drain(self, driver) -> Optional[List[str]]:
+        """
+        Get the product link hrefs added since the previous call
+
+        The first call in a document scans the whole page once.
+
+        Args:
+            driver: WebDriver with a listing page loaded
+
+        Returns:
+            Raw href values in the order they appeared, or None if the
+            script could not run
+        """
+        try:
+            result = driver.execute_script(HARVEST_SCRIPT, self.selector)
+        except Exception as e:
+            logger.debug(f"Link harvesting failed: {e}")
+            return None
+        if not isinstance(result, dict) or not isinstance(result.get('links'), list):
+            return None
+        return [href for href in result['links'] if isinstance(href, str)]
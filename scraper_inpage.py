@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+In-Page Extraction - resolve product fields and links inside the browser
+
+This module handles:
+- Compiling the field selectors and product-link selectors into one
+  script that runs in the page with a single execute_script call
+- The same priority rules as the compiled extractor: first match of each
+  selector, price needs a digit, breadcrumbs use the last match, and the
+  page text is checked for availability as a last resort
+- Returning only the structured-data tags (JSON-LD scripts, meta and link
+  tags, rel=canonical) instead of the whole page, so no page_source crosses the WebDriver
+  wire and nothing is parsed again in Python
+
+Usage:
+    extractor = InPageExtractor(FIELD_SELECTORS, PRODUCT_LINK_SELECTORS)
+    result = extractor.extract_product(driver)
+    structured = extract_structured_data(result['head'], url)
+"""
+
+import json
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from scraper_extract import DESCRIPTION_LIMIT, FIELD_SELECTORS, LAST_MATCH_FIELDS
+
+
+logger = logging.getLogger(__name__)
+
+# Injected with the selectors as JSON. arguments[0] is 'product' or 'links'.
+# Text is gathered like element_text(): stripped text nodes outside script,
+# style and template, joined without separators.
+SCRIPT_TEMPLATE = """
+var config = %(config)s;
+var mode = arguments[0];
+var skip = {SCRIPT: 1, STYLE: 1, TEMPLATE: 1};
+function text(root) {
+  var parts = [];
+  var walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+    acceptNode: function (node) {
+      if (node.nodeType === 3) return NodeFilter.FILTER_ACCEPT;
+      return skip[node.nodeName] ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_SKIP;
+    }
+  });
+  while (walker.nextNode()) {
+    var value = walker.currentNode.nodeValue.trim();
+    if (value) parts.push(value);
+  }
+  return parts.join('');
+}
+function all(selector) {
+  try { return document.querySelectorAll(selector); } catch (e) { return []; }
+}
+function accept(field, element) {
+  if (field === 'price') {
+    var price = text(element);
+    return /[0-9]/.test(price) ? price : null;
+  }
+  if (field === 'image_url') {
+    return element.getAttribute('src') || element.getAttribute('data-src') || null;
+  }
+  if (field === 'description') return text(element).slice(0, config.descriptionLimit);
+  return text(element);
+}
+if (mode === 'links') {
+  var links = [];
+  config.links.forEach(function (selector) {
+    var matches = all(selector);
+    for (var i = 0; i < matches.length; i++) {
+      var href = matches[i].getAttribute('href');
+      if (href) links.push(href);
+    }
+  });
+  return {links: links};
+}
+var fields = {};
+Object.keys(config.fields).forEach(function (field) {
+  var selectors = config.fields[field];
+  for (var i = 0; i < selectors.length; i++) {
+    var matches = all(selectors[i]);
+    if (!matches.length) continue;
+    if (config.lastMatch.indexOf(field) >= 0) {
+      fields[field] = text(matches[matches.length - 1]);
+      return;
+    }
+    var value = accept(field, matches[0]);
+    if (value !== null) {
+      fields[field] = value;
+      return;
+    }
+  }
+});
+if (!('availability' in fields)) {
+  var page = text(document.documentElement).toLowerCase();
+  fields.availability = page.indexOf('in stock') >= 0 ? 'In Stock'
+    : page.indexOf('out of stock') >= 0 ? 'Out of Stock' : null;
+}
+var head = [];
+var tags = all('script[type*="ld+json"], meta, link[itemprop], link[rel="canonical"]');
+for (var j = 0; j < tags.length; j++) head.push(tags[j].outerHTML);
+return {fields: fields, head: '<html><head>' + head.join('') + '</head></html>'};
+"""
+
+
+def build_script(
+    field_selectors: Optional[Dict[str, Sequence[str]]] = None,
+    link_selectors: Sequence[str] = (),
+) -> str:
+    """
+    Compile selectors into the in-page extraction script
+
+    Args:
+        field_selectors: Mapping of field name to selectors in priority
+            order (defaults to FIELD_SELECTORS)
+        link_selectors: Selectors of product links on listing pages
+
+    Returns:
+        JavaScript source for execute_script
+    """
+    config = {
+        'fields': {field: list(selectors) for field, selectors in (field_selectors or FIELD_SELECTORS).items()},
+        'links': list(link_selectors),
+        'lastMatch': list(LAST_MATCH_FIELDS),
+        'descriptionLimit': DESCRIPTION_LIMIT,
+    }
+    return SCRIPT_TEMPLATE % {'config': json.dumps(config)}
+
+
+class InPageExtractor:
+    """Run the extraction script in a browser session"""
+
+    def __init__(self, field_selectors: Optional[Dict[str, Sequence[str]]] = None,
+                 link_selectors: Sequence[str] = ()):
+        """
+        Compile the extraction script
+
+        Args:
+            field_selectors: Mapping of field name to selectors in priority
+                order (defaults to FIELD_SELECTORS)
+            link_selectors: Selectors of product links on listing pages
+        """
+        self.script = build_script(field_selectors, link_selectors)
+
+    def extract_product(self, driver) -> Optional[Dict]:
+        """
+        Resolve the product fields of the loaded page
+
+        Args:
+            driver: WebDriver with a product page loaded
+
+        Returns:
+            Dict with 'fields' (field name to value, raw image src; fields
+            that were not found are left out) and 'head' (a small HTML
+            document of the page's structured-data tags), or None if the
+            script failed
+        """
+        result = self._run(driver, 'product')
+        if result is None or not isinstance(result.get('fields'), dict):
+            return None
+        result['fields'] = {k: v for k, v in result['fields'].items() if v is not None}
+        result.setdefault('head', '')
+        return result
+
+    def extract_links(self, driver) -> Optional[List[str]]:
+        """
+        Collect product link hrefs from the loaded listing page
+
+        Args:
+            driver: WebDriver with a listing page loaded
+
+        Returns:
+            Raw href values in selector order (may contain duplicates), or
+            None if the script failed
+        """
+        result = self._run(driver, 'links')
+        if result is None or not isinstance(result.get('links'), list):
+            return None
+        return [href for href in result['links'] if isinstance(href, str)]
+
+    def _run(self, driver, mode: str) -> Optional[Dict]:
+        try:
+            result = driver.execute_script(self.script, mode)
+        except Exception as e:
+            logger.debug(f"In-page extraction failed: {e}")
+            return None
+        return result if isinstance(result, dict) else None
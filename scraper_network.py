@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Network Capture - find the endpoint behind a "Load More" button
+
+This module handles:
+- Turning on Chrome's performance log, which records DevTools (CDP)
+  Network events for every request the page makes
+- Reading the log in one place: reading clears it, so every consumer
+  (this capture, the resource policy's counters) gets each read
+- Collecting the XHR/fetch requests made while "Load More" was clicked
+- Picking the paginated JSON or HTML-fragment endpoint by learning a page
+  URL template from two consecutive requests
+- Reading product URLs out of the endpoint's JSON or HTML responses
+
+Usage:
+    enable_network_capture(chrome_options)
+    log = PerformanceLog(driver)
+    capture = NetworkCapture(driver, log)
+    capture.drain()                    # forget earlier traffic
+    click_load_more(); first = capture.drain()
+    click_load_more(); second = capture.drain()
+    endpoint = find_paginated_endpoint(first, second)
+"""
+
+import json
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urljoin
+
+from scraper_pagination import PageTemplate, learn_template
+
+
+logger = logging.getLogger(__name__)
+
+# Resource types of requests made by page scripts
+SCRIPT_REQUEST_TYPES = ('XHR', 'Fetch')
+
+# Request headers replayed when calling an endpoint directly
+REPLAYED_HEADERS = ('accept', 'x-requested-with', 'content-type')
+
+# Keys whose values are page fragments rather than URLs
+_MARKUP_START = '<'
+
+
+def enable_network_capture(chrome_options) -> None:
+    """
+    Ask ChromeDriver to record Network events in the performance log
+
+    Args:
+        chrome_options: selenium ChromeOptions for the session
+    """
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+
+class CapturedRequest:
+    """An XHR/fetch request seen in the performance log"""
+
+    __slots__ = ('url', 'method', 'headers', 'mime_type', 'status')
+
+    def __init__(self, url: str, method: str, headers: Dict[str, str]):
+        self.url = url
+        self.method = method
+        self.headers = headers
+        self.mime_type = ''
+        self.status = 0
+
+    @property
+    def is_json(self) -> bool:
+        return 'json' in self.mime_type
+
+    @property
+    def is_html(self) -> bool:
+        return 'html' in self.mime_type
+
+
+class PerformanceLog:
+    """
+    The one reader of a driver's performance log
+
+    ChromeDriver clears the log on every read, so consumers of the same
+    driver must not read it on their own: each read made here is also
+    passed to every listener.
+    """
+
+    def __init__(self, driver):
+        """
+        Initialize the reader
+
+        Args:
+            driver: WebDriver session created with enable_network_capture
+        """
+        self.driver = driver
+        self.available = True
+        self.listeners: List[Callable[[List[Dict]], None]] = []
+
+    def read(self) -> List[Dict]:
+        """
+        Read and clear the log
+
+        Returns:
+            Entries logged since the last read
+        """
+        if not self.available:
+            return []
+        try:
+            entries = self.driver.get_log('performance') or []
+        except Exception as e:
+            logger.debug(f"Performance log not available: {e}")
+            self.available = False
+            return []
+        for listener in self.listeners:
+            listener(entries)
+        return entries
+
+
+class NetworkCapture:
+    """Read script-initiated requests from a driver's performance log"""
+
+    def __init__(self, driver, log: Optional[PerformanceLog] = None):
+        """
+        Initialize the capture
+
+        Args:
+            driver: WebDriver session created with enable_network_capture
+            log: Reader of the driver's log shared with other consumers
+        """
+        self.driver = driver
+        self.log = log or PerformanceLog(driver)
+
+    @property
+    def available(self) -> bool:
+        return self.log.available
+
+    def _entries(self) -> List[Dict]:
+        return self.log.read()
+
+    def discard(self) -> None:
+        """Drop buffered log entries so ChromeDriver does not keep them"""
+        self._entries()
+
+    def drain(self) -> List[CapturedRequest]:
+        """
+        Read and clear the performance log
+
+        Returns:
+            Completed XHR/fetch requests since the last drain, in request order
+        """
+        requests: Dict[str, CapturedRequest] = {}
+        for entry in self._entries():
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.requestWillBeSent':
+                if params.get('type') not in SCRIPT_REQUEST_TYPES:
+                    continue
+                request = params.get('request', {})
+                headers = {k.lower(): v for k, v in request.get('headers', {}).items()}
+                requests[params.get('requestId')] = CapturedRequest(
+                    request.get('url', ''), request.get('method', 'GET'), headers
+                )
+            elif method == 'Network.responseReceived':
+                captured = requests.get(params.get('requestId'))
+                if captured is not None:
+                    response = params.get('response', {})
+                    captured.mime_type = (response.get('mimeType') or '').lower()
+                    captured.status = int(response.get('status') or 0)
+
+        return [r for r in requests.values() if r.status]
+
+
+def find_paginated_endpoint(
+    first: Iterable[CapturedRequest],
+    second: Iterable[CapturedRequest],
+) -> Optional[Tuple[PageTemplate, Dict[str, str]]]:
+    """
+    Find the endpoint two consecutive "Load More" clicks called
+
+    Args:
+        first: Requests made by the first click (page 2)
+        second: Requests made by the second click (page 3)
+
+    Returns:
+        Tuple of (page URL template, headers to replay), or None
+    """
+    candidates = [
+        r for r in first
+        if r.method == 'GET' and 200 <= r.status < 300 and (r.is_json or r.is_html)
+    ]
+    for following in second:
+        if following.method != 'GET' or not (200 <= following.status < 300):
+            continue
+        for previous in candidates:
+            template = learn_template(previous.url, following.url, current_page=2)
+            if template is not None:
+                headers = {k: v for k, v in following.headers.items() if k in REPLAYED_HEADERS}
+                logger.info(f"Found 'Load More' endpoint: {following.url} ({template})")
+                return template, headers
+
+    return None
+
+
+def _strings(data, key: str = '') -> Iterator[Tuple[str, str]]:
+    """Yield (key, value) for every string in a JSON document"""
+    stack = [(key, data)]
+    while stack:
+        key, item = stack.pop()
+        if isinstance(item, str):
+            yield key, item
+        elif isinstance(item, dict):
+            stack.extend((k, v) for k, v in item.items())
+        elif isinstance(item, list):
+            stack.extend((key, v) for v in reversed(item))
+
+
+class EndpointParser:
+    """
+    Read product URLs out of a "Load More" endpoint's responses
+
+    HTML responses (and HTML fragments inside JSON) go through the listing
+    link extraction. For plain JSON values, the keys that hold product URLs
+    are learned from responses whose products are already known from the
+    page.
+    """
+
+    def __init__(self, base_url: str, links_from_html: Callable[[str], List[str]],
+                 is_product_url: Callable[[str], bool]):
+        """
+        Initialize the parser
+
+        Args:
+            base_url: URL relative links are resolved against
+            links_from_html: Callable returning product URLs in an HTML page
+            is_product_url: Filter for candidate product URLs
+        """
+        self.base_url = base_url
+        self.links_from_html = links_from_html
+        self.is_product_url = is_product_url
+        self.url_keys: Set[str] = set()
+
+    def _candidates(self, body: str) -> Iterator[Tuple[str, str]]:
+        """Yield (key, absolute URL) pairs found in a response"""
+        try:
+            data = json.loads(body)
+        except ValueError:
+            for url in self.links_from_html(body):
+                yield '', url
+            return
+
+        for key, value in _strings(data):
+            value = value.strip()
+            if value.startswith(_MARKUP_START):
+                for url in self.links_from_html(value):
+                    yield '', url
+            elif value and ' ' not in value and ('/' in value or value.startswith('http')):
+                yield key, urljoin(self.base_url, value)
+
+    def learn(self, bodies: Iterable[str], known_urls: Set[str]) -> bool:
+        """
+        Learn where product URLs live in the endpoint's responses
+
+        Args:
+            bodies: Responses whose products are already in known_urls
+            known_urls: Product URLs found in the page
+
+        Returns:
+            True if the responses contain known product URLs
+        """
+        found = False
+        for body in bodies:
+            for key, url in self._candidates(body):
+                if url in known_urls:
+                    found = True
+                    if key:
+                        self.url_keys.add(key)
+        return found
+
+    def product_urls(self, body: str) -> List[str]:
+        """
+        Extract product URLs from a response
+
+        Args:
+            body: Response body
+
+        Returns:
+            Product URLs in response order
+        """
+        return [
+            url for key, url in self._candidates(body)
+            if (not key or key in self.url_keys) and self.is_product_url(url)
+        ]
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Pagination Planner - learn a listing's page URL pattern and fetch pages directly
+
+This module handles:
+- Finding the "next page" link in a listing page (rel=next, next buttons)
+  without clicking it
+- Learning the page URL template from the current and next page URLs:
+  ?page=N, /page/N, zero-based pages and offset/limit style parameters
+- Generating the URL of any later page from that template
+
+Usage:
+    next_url = find_next_link(html, page_url)
+    template = learn_template(page_url, next_url, current_page=1)
+    if template:
+        urls = [template.url_for(n) for n in range(2, 11)]
+"""
+
+import logging
+import re
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from scraper_extract import element_text, parse_html
+
+
+logger = logging.getLogger(__name__)
+
+# "Next page" links, in the same order as the buttons handle_pagination clicks
+NEXT_LINK_XPATHS = [
+    "//link[@rel='next']",
+    "//a[@rel='next']",
+    "//a[contains(@class, 'next')]",
+    "//a[contains(@aria-label, 'next')]",
+    "//a[contains(text(), 'Next')]",
+]
+
+_INT_RE = re.compile(r'^\d+$')
+# Path segments such as "page-3" or "p3"
+_PREFIXED_INT_RE = re.compile(r'^(.*?)(\d+)$')
+
+
+class PageTemplate:
+    """
+    URL pattern of a paginated listing
+
+    The varying part is either a query parameter or a path segment. Its
+    value for page n is start + (n - 1) * step, so page numbers (start 1,
+    step 1), zero-based pages (start 0, step 1) and offsets (start 0, step
+    = page size) are all covered.
+    """
+
+    def __init__(self, url: str, kind: str, key, start: int, step: int, prefix: str = ''):
+        """
+        Initialize the template
+
+        Args:
+            url: Any page URL of the listing
+            kind: 'query' or 'path'
+            key: Query parameter name, or path segment index
+            start: Value on page 1
+            step: Increase of the value from one page to the next
+            prefix: Text before the number in a path segment (e.g. 'page-')
+        """
+        self.url = url
+        self.kind = kind
+        self.key = key
+        self.start = start
+        self.step = step
+        self.prefix = prefix
+
+    def value_for(self, page: int) -> int:
+        """Value of the varying part on a page"""
+        return self.start + (page - 1) * self.step
+
+    def url_for(self, page: int) -> str:
+        """
+        Build the URL of a page
+
+        Args:
+            page: 1-based page number
+
+        Returns:
+            Absolute page URL
+        """
+        parts = urlsplit(self.url)
+        value = self.value_for(page)
+
+        if self.kind == 'query':
+            query = parse_qsl(parts.query, keep_blank_values=True)
+            query = [(k, str(value) if k == self.key else v) for k, v in query]
+            if not any(k == self.key for k, _ in query):
+                query.append((self.key, str(value)))
+            return urlunsplit(parts._replace(query=urlencode(query)))
+
+        segments = parts.path.split('/')
+        segments[self.key] = f"{self.prefix}{value}"
+        return urlunsplit(parts._replace(path='/'.join(segments)))
+
+    def __repr__(self) -> str:
+        return f"PageTemplate({self.kind}={self.key!r}, start={self.start}, step={self.step})"
+
+
+def find_next_link(html: str, page_url: str) -> Optional[str]:
+    """
+    Find the URL of the next listing page without clicking anything
+
+    Args:
+        html: Listing page HTML
+        page_url: URL the page was loaded from
+
+    Returns:
+        Absolute URL of the next page, or None
+    """
+    root = parse_html(html)
+    if root is None:
+        return None
+
+    for xpath in NEXT_LINK_XPATHS:
+        for element in root.xpath(xpath):
+            href = (element.get('href') or '').strip()
+            if not href or href.startswith(('#', 'javascript:')):
+                continue
+            if element.tag == 'a' and 'disabled' in (element.get('class') or ''):
+                continue
+            if 'prev' in (element.get('class') or '').lower() or 'prev' in element_text(element).lower():
+                continue
+            return urljoin(page_url, href)
+
+    return None
+
+
+def _start_and_step(current: Optional[int], following: int, current_page: int) -> Tuple[int, int]:
+    """Derive start and step from the values on the current and next page"""
+    if current is not None:
+        step = following - current
+        return current - (current_page - 1) * step, step
+
+    # The current page has no value: it is the first page and the next
+    # value tells the style apart (2 = page numbers, 1 = zero-based pages,
+    # anything else = an offset of one page size)
+    if following == 2:
+        return 1, 1
+    if following == 1:
+        return 0, 1
+    return 0, following
+
+
+def _query_template(current_url: str, next_url: str, current_page: int) -> Optional[PageTemplate]:
+    current_query = dict(parse_qsl(urlsplit(current_url).query))
+    next_query = dict(parse_qsl(urlsplit(next_url).query))
+
+    for key, value in next_query.items():
+        if not _INT_RE.match(value) or current_query.get(key) == value:
+            continue
+        current_value = current_query.get(key)
+        if current_value is not None and not _INT_RE.match(current_value):
+            continue
+
+        current_number = int(current_value) if current_value is not None else None
+        if current_number is None and current_page != 1:
+            continue
+        start, step = _start_and_step(current_number, int(value), current_page)
+        if step > 0:
+            return PageTemplate(next_url, 'query', key, start, step)
+
+    return None
+
+
+def _path_template(current_url: str, next_url: str, current_page: int) -> Optional[PageTemplate]:
+    current_segments = urlsplit(current_url).path.rstrip('/').split('/')
+    next_segments = urlsplit(next_url).path.rstrip('/').split('/')
+
+    # "/shop/page/2" -> "/shop/page/3": one numbered segment changed
+    if len(current_segments) == len(next_segments):
+        changed = [i for i, (a, b) in enumerate(zip(current_segments, next_segments)) if a != b]
+        if len(changed) != 1:
+            return None
+        index = changed[0]
+        current_match = _PREFIXED_INT_RE.match(current_segments[index])
+        next_match = _PREFIXED_INT_RE.match(next_segments[index])
+        if not (current_match and next_match) or current_match.group(1) != next_match.group(1):
+            return None
+        start, step = _start_and_step(int(current_match.group(2)), int(next_match.group(2)), current_page)
+        if step <= 0:
+            return None
+        return PageTemplate(next_url, 'path', index, start, step, next_match.group(1))
+
+    # "/shop" -> "/shop/page/2": the page segment only appears from page 2
+    if current_page == 1 and len(next_segments) > len(current_segments) and \
+            next_segments[:len(current_segments)] == current_segments:
+        index = len(next_segments) - 1
+        next_match = _PREFIXED_INT_RE.match(next_segments[index])
+        if next_match:
+            start, step = _start_and_step(None, int(next_match.group(2)), current_page)
+            return PageTemplate(next_url, 'path', index, start, step, next_match.group(1))
+
+    return None
+
+
+def _same_url(first: str, second: str) -> bool:
+    """Compare URLs ignoring query parameter order and trailing slashes"""
+    a, b = urlsplit(first), urlsplit(second)
+    return (
+        a.netloc.lower() == b.netloc.lower()
+        and a.path.rstrip('/') == b.path.rstrip('/')
+        and sorted(parse_qsl(a.query, keep_blank_values=True))
+        == sorted(parse_qsl(b.query, keep_blank_values=True))
+    )
+
+
+def learn_template(current_url: str, next_url: str, current_page: int = 1) -> Optional[PageTemplate]:
+    """
+    Learn a listing's page URL template from two consecutive page URLs
+
+    Args:
+        current_url: URL of the current page
+        next_url: URL of the next page (from find_next_link)
+        current_page: 1-based number of the current page
+
+    Returns:
+        PageTemplate, or None if the URLs do not follow a recognisable pattern
+    """
+    current = urlsplit(current_url)
+    following = urlsplit(next_url)
+    if current.netloc.lower() != following.netloc.lower():
+        return None
+
+    if current.path.rstrip('/') == following.path.rstrip('/'):
+        template = _query_template(current_url, next_url, current_page)
+    else:
+        template = _path_template(current_url, next_url, current_page)
+
+    if template is None:
+        logger.debug(f"No page URL pattern between {current_url} and {next_url}")
+        return None
+
+    # The template must reproduce both pages, or it is a guess
+    if not (_same_url(template.url_for(current_page + 1), next_url)
+            and (current_page == 1 or _same_url(template.url_for(current_page), current_url))):
+        logger.debug(f"Page URL pattern {template} does not reproduce {next_url}")
+        return None
+
+    return template
+
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Driver Pool - parallel product-detail scraping across several browser sessions
+
+This module handles:
+- A shared work queue of product URLs
+- One WebDriver session per worker thread, created lazily
+- Replacing a worker's driver when the browser session crashes
+- Retrying failed URLs through a shared RetryScheduler, with backoff and
+  per-host circuit breakers
+- Per-host concurrency limits so workers stay polite to a single site
+- Ordered or unordered merging of results
+
+Usage:
+    pool = DriverPool(scraper._create_driver, scraper._scrape_product, workers=4)
+    pool.run(urls, emit=scraper.products_data.append)
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from scraper_retry import (
+    ExtractionMiss,
+    HostUnavailable,
+    RetryPolicy,
+    RetryScheduler,
+    is_driver_crash,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Result recorded for a URL that skip_fn left out
+SKIPPED = object()
+
+
+class LazyDriver:
+    """
+    WebDriver proxy that only starts the browser on first use
+
+    Workers whose pages are all served without a browser (e.g. by the HTTP
+    fast path) never pay Chrome startup.
+    """
+
+    def __init__(self, driver_factory: Callable[[], object]):
+        self._driver_factory = driver_factory
+        self._driver = None
+
+    @property
+    def started(self) -> bool:
+        """Whether the underlying browser has been created"""
+        return self._driver is not None
+
+    def __getattr__(self, name):
+        if self._driver is None:
+            self._driver = self._driver_factory()
+        return getattr(self._driver, name)
+
+    def quit(self) -> None:
+        """Close the browser if it was started"""
+        if self._driver is not None:
+            driver, self._driver = self._driver, None
+            driver.quit()
+
+
+class HostSlots:
+    """Limit how many workers may load pages from the same host at once"""
+
+    def __init__(self, max_per_host: int):
+        """
+        Initialize the host slots
+
+        Args:
+            max_per_host: Maximum concurrent page loads per host
+        """
+        self.max_per_host = max(1, max_per_host)
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+    def acquire(self, url: str) -> threading.BoundedSemaphore:
+        """Block until a slot for the URL's host is free and return it"""
+        semaphore = self._semaphore(url)
+        semaphore.acquire()
+        return semaphore
+
+
+class DriverPool:
+    """Scrape product pages concurrently with a pool of WebDriver sessions"""
+
+    def __init__(
+        self,
+        driver_factory: Callable[[], object],
+        scrape_fn: Callable[[str, object], Optional[Dict]],
+        workers: int = 4,
+        max_per_host: int = 4,
+        delay: float = 0.0,
+        ordered: bool = True,
+        max_attempts: int = 3,
+        skip_fn: Optional[Callable[[str], bool]] = None,
+        scheduler: Optional[RetryScheduler] = None,
+    ):
+        """
+        Initialize the pool
+
+        Args:
+            driver_factory: Callable returning a new WebDriver instance
+            scrape_fn: Callable taking (url, driver) and returning a product dict;
+                it should raise on failure so crashes can be detected. The
+                driver is a LazyDriver, so the browser starts on first use
+            workers: Number of concurrent browser sessions
+            max_per_host: Maximum concurrent page loads against one host
+            delay: Fixed pause (seconds) each worker takes after a page; the
+                scraper leaves this at 0 and paces hosts with its rate limiter
+            ordered: Emit results in input order instead of completion order
+            max_attempts: Attempts per URL (crashes and transient errors)
+                when no scheduler is given
+            skip_fn: Optional callable checked before each URL is loaded;
+                URLs it returns True for are neither scraped nor failed. It
+                is called from one thread at a time, like emit
+            scheduler: RetryScheduler handing out URLs and retries; the
+                default retries right away, without backoff
+        """
+        self.driver_factory = driver_factory
+        self.scrape_fn = scrape_fn
+        self.skip_fn = skip_fn
+        self.workers = max(1, workers)
+        self.delay = delay
+        self.ordered = ordered
+        self.scheduler = scheduler or RetryScheduler(RetryPolicy(max_attempts=max_attempts, base_delay=0.0))
+        self.host_slots = HostSlots(max_per_host)
+
+        self.completed = 0
+        self.skipped = 0
+        self.failed_urls: List[str] = []
+        self.driver_restarts = 0
+
+        self._first_index = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Optional[Dict]] = {}
+        self._next_index = 0
+        self._total = 0
+        self._emit: Callable[[Dict], None] = lambda product: None
+
+    def run(self, urls: Iterable[str], emit: Callable[[Dict], None]) -> None:
+        """
+        Scrape all URLs and pass each product to emit
+
+        Args:
+            urls: Product page URLs to scrape
+            emit: Callback receiving each scraped product dict; it is called
+                from one thread at a time
+        """
+        self._emit = emit
+        self._pending = {}
+        self._next_index = 0
+
+        self._first_index = self.scheduler.added
+        self._total = self.scheduler.add(urls)
+
+        if not self._total:
+            return
+
+        worker_count = min(self.workers, self._total)
+        logger.info(f"Starting {worker_count} browser workers for {self._total} products")
+
+        threads = []
+        for worker_id in range(worker_count):
+            thread = threading.Thread(
+                target=self._worker,
+                args=(worker_id,),
+                name=f"scraper-worker-{worker_id}",
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        logger.info(
+            f"Pool finished: {self.completed} scraped, {len(self.failed_urls)} failed, "
+            f"{self.skipped} skipped, {self.driver_restarts} driver restarts"
+        )
+
+    def _worker(self, worker_id: int) -> None:
+        """Take URLs from the scheduler until every URL is finished"""
+        driver = LazyDriver(self.driver_factory)
+
+        try:
+            while True:
+                task = self.scheduler.next()
+                if task is None:
+                    return
+                index, url = task.index - self._first_index, task.url
+
+                if task.host_down:
+                    failure = self.scheduler.failure(task, HostUnavailable(url))
+                    logger.error(f"Skipping product {url}: {failure.describe()}")
+                    self._record(index, url, None)
+                    continue
+
+                if self.skip_fn is not None:
+                    with self._lock:
+                        skip = self.skip_fn(url)
+                    if skip:
+                        self.scheduler.skip(task)
+                        self._record(index, url, SKIPPED)
+                        continue
+
+                slot = self.host_slots.acquire(url)
+                try:
+                    product = self.scrape_fn(url, driver)
+                except Exception as e:
+                    if is_driver_crash(e):
+                        logger.warning(f"Worker {worker_id} browser crashed on {url}: {e}")
+                        self._quit(driver)
+                        with self._lock:
+                            self.driver_restarts += 1
+
+                    failure = self.scheduler.failure(task, e)
+                    if failure is None:
+                        continue
+                    if isinstance(e, ExtractionMiss):
+                        # Out of retries: keep what the page had
+                        product = e.product
+                    else:
+                        logger.error(f"Error scraping product {url}: {failure.describe()}")
+                        product = None
+                else:
+                    self.scheduler.success(task)
+                finally:
+                    slot.release()
+
+                self._record(index, url, product)
+
+                if self.delay:
+                    time.sleep(self.delay)
+        finally:
+            self._quit(driver)
+
+    def _record(self, index: int, url: str, product) -> None:
+        """Store a result and emit whatever is ready"""
+        with self._lock:
+            if product is SKIPPED:
+                self.skipped += 1
+                product = None
+            elif product is None:
+                self.failed_urls.append(url)
+            else:
+                self.completed += 1
+
+            done = self.completed + len(self.failed_urls) + self.skipped
+            logger.info(f"Progress: {done}/{self._total}")
+
+            if not self.ordered:
+                if product is not None:
+                    self._emit(product)
+                return
+
+            self._pending[index] = product
+            while self._next_index in self._pending:
+                ready = self._pending.pop(self._next_index)
+                self._next_index += 1
+                if ready is not None:
+                    self._emit(ready)
+
+    @staticmethod
+    def _quit(driver) -> None:
+        """Close a driver, ignoring errors from an already-dead session"""
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"Error closing browser: {e}")
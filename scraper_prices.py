@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Price Normalization - turn price text into numeric columns
+
+This module handles:
+- Parsing price strings such as "Rs. 1,299.00 Sale", "$19.99–$24.99" or
+  "1.299,00 €" into an amount, a currency and the min/max of a range
+- Thousands and decimal separators of any locale ("1,299.00", "1.299,00",
+  "1 299,00", "1'299.00"); a separator that could be either ("1,299") is
+  resolved by the separators the same site uses unambiguously
+- Working column by column on a batch of rows: each distinct price string
+  is scanned once, with patterns compiled once per process, and resolved
+  against the separator the site uses as learned so far
+
+Usage:
+    normalizer = PriceNormalizer()
+    rows = normalizer.normalize(products)
+    rows[0]['price_amount'], rows[0]['price_min'], rows[0]['price_max']
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+# Numeric columns added to each row
+PRICE_FIELDS = ('price_amount', 'price_min', 'price_max')
+
+# Values the scraper writes for fields it could not find
+MISSING_VALUES = ('', 'N/A')
+
+# Currency symbols, longest first when matched; ambiguous ones ('$', 'Rs')
+# map to their most common currency and lose to a structured-data currency
+CURRENCY_SYMBOLS = {
+    'US$': 'USD', 'C$': 'CAD', 'A$': 'AUD', 'NZ$': 'NZD', 'HK$': 'HKD', 'S$': 'SGD', 'R$': 'BRL',
+    '$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY', '₹': 'INR', '₩': 'KRW', '₽': 'RUB', '₺': 'TRY',
+    '₫': 'VND', '₱': 'PHP', '฿': 'THB', '₪': 'ILS', 'zł': 'PLN', 'kr': 'SEK', 'Rs': 'PKR',
+    'Rp': 'IDR', 'RM': 'MYR',
+}
+
+# ISO 4217 codes recognized when written out next to the amount
+CURRENCY_CODES = frozenset((
+    'USD', 'EUR', 'GBP', 'JPY', 'CNY', 'INR', 'PKR', 'CAD', 'AUD', 'NZD', 'CHF', 'SEK', 'NOK',
+    'DKK', 'PLN', 'CZK', 'HUF', 'RUB', 'TRY', 'BRL', 'MXN', 'ZAR', 'AED', 'SAR', 'SGD', 'HKD',
+    'KRW', 'IDR', 'MYR', 'THB', 'PHP', 'VND', 'BDT', 'LKR', 'NPR', 'EGP', 'NGN', 'KES', 'ILS',
+))
+
+# A number with thousands groups (1,299 / 1.299,00 / 1 299,00 / 1'299.00) or without (1299 / 19,99)
+_NUMBER_RE = re.compile(
+    r"(?P<whole>\d{1,3}(?P<sep>[,.' \u00a0\u202f])\d{3}(?:(?P=sep)\d{3})*)(?:(?P<point>[.,])(?P<fraction>\d+))?"
+    r"|(?P<plain>\d+)(?:(?P<plain_point>[.,])(?P<plain_fraction>\d+))?"
+)
+_CODE_RE = re.compile(r'\b(%s)\b' % '|'.join(sorted(CURRENCY_CODES)))
+_SYMBOL_RE = re.compile('|'.join(
+    (r'\b' if symbol[0].isalpha() else '') + re.escape(symbol) + (r'\b' if symbol[-1].isalpha() else '')
+    for symbol in sorted(CURRENCY_SYMBOLS, key=len, reverse=True)
+))
+_PERCENT_RE = re.compile(r'\s*%')
+# What may stand between the two ends of a range once symbols and codes are removed
+_RANGE_GAP_RE = re.compile(r'^[\s.]*(?:-|–|—|~|to)[\s.]*$', re.IGNORECASE)
+
+
+class ParsedPrice(NamedTuple):
+    """Numeric reading of a price string"""
+
+    amount: Optional[float]
+    currency: Optional[str]
+    minimum: Optional[float]
+    maximum: Optional[float]
+
+
+class _Number(NamedTuple):
+    start: int
+    end: int
+    # Separator that may be a thousands or a decimal separator ('1,299'), or None
+    ambiguous: Optional[str]
+    # Value reading the ambiguous separator as a thousands separator
+    value: float
+    # Decimal separator the number shows unambiguously, or None
+    decimal: Optional[str]
+
+
+def _read_number(match: 're.Match') -> _Number:
+    """Read one number match"""
+    if match.group('plain'):
+        # No thousands groups: a separator here is the decimal separator
+        fraction = match.group('plain_fraction')
+        value = float(f"{match.group('plain')}.{fraction}" if fraction else match.group('plain'))
+        return _Number(match.start(), match.end(), None, value, match.group('plain_point'))
+
+    sep = match.group('sep')
+    point = match.group('point')
+    fraction = match.group('fraction')
+    whole = re.sub(r'\D', '', match.group('whole'))
+    value = float(f"{whole}.{fraction}" if fraction else whole)
+
+    decimal = None
+    if point and point != sep:
+        decimal = point
+    elif sep in '.,' and match.group('whole').count(sep) > 1:
+        # Repeated groups: sep is the thousands separator, so the other one is decimal
+        decimal = ',' if sep == '.' else '.'
+    ambiguous = sep if sep in '.,' and match.group('whole').count(sep) == 1 and not point else None
+    return _Number(match.start(), match.end(), ambiguous, value, decimal)
+
+
+def _scan(text: str) -> List[_Number]:
+    """Numbers in a price string, leaving out percentages ('20% off')"""
+    return [
+        _read_number(match) for match in _NUMBER_RE.finditer(text)
+        if not _PERCENT_RE.match(text, match.end())
+    ]
+
+
+def _known(value: Optional[str]) -> Optional[str]:
+    """A field value, or None if the scraper recorded it as missing"""
+    value = (value or '').strip()
+    return None if value in MISSING_VALUES else value
+
+
+def _as_decimal(number: _Number) -> float:
+    """Value of an ambiguous number reading its separator as the decimal separator"""
+    return number.value / 1000.0
+
+
+class PriceNormalizer:
+    """Parse price columns of row batches, learning the site's decimal separator"""
+
+    def __init__(self, cache_size: int = 100_000):
+        """
+        Initialize the normalizer
+
+        Args:
+            cache_size: Scanned price strings kept before the cache is cleared
+        """
+        self.cache_size = cache_size
+        # Unambiguous decimal separators seen so far, e.g. {'.': 120, ',': 0}
+        self.decimal_votes: Counter = Counter()
+        # Currency and numbers of each price string; the numbers are resolved
+        # on every call, as the decimal separator may change with more votes
+        self._cache: Dict[Tuple[str, Optional[str]], Tuple[Optional[str], List[_Number]]] = {}
+
+    def decimal_separator(self) -> Optional[str]:
+        """The decimal separator most prices used so far, or None if unknown"""
+        if not self.decimal_votes:
+            return None
+        return self.decimal_votes.most_common(1)[0][0]
+
+    def parse(self, text: Optional[str], currency: Optional[str] = None) -> ParsedPrice:
+        """
+        Parse one price string
+
+        Args:
+            text: Price text as extracted from the page
+            currency: Currency already known for the product (e.g. from
+                structured data); it wins over symbols in the text
+
+        Returns:
+            ParsedPrice; amount is the first price, or the lower end of a range
+        """
+        return self.parse_column([text], [currency])[0]
+
+    def parse_column(self, texts: Sequence[Optional[str]],
+                     currencies: Optional[Sequence[Optional[str]]] = None) -> List[ParsedPrice]:
+        """
+        Parse a column of price strings
+
+        Args:
+            texts: Price texts
+            currencies: Known currency per row, or None
+
+        Returns:
+            One ParsedPrice per text
+        """
+        currencies = currencies or [None] * len(texts)
+        keys = [((text or '').strip(), (_known(currency) or '').upper() or None)
+                for text, currency in zip(texts, currencies)]
+        missing = {key for key in keys if key not in self._cache}
+        if missing:
+            if len(self._cache) + len(missing) > self.cache_size:
+                # Keep only the strings of this column
+                self._cache = {key: self._cache[key] for key in keys if key in self._cache}
+            for key in missing:
+                numbers = _scan(key[0])
+                # Vote on the decimal separator before resolving ambiguous numbers
+                for number in numbers:
+                    if number.decimal:
+                        self.decimal_votes[number.decimal] += 1
+                self._cache[key] = (key[1] or self._currency(key[0]), numbers)
+        decimal = self.decimal_separator()
+        resolved = {key: self._resolve(key[0], *self._cache[key], decimal) for key in set(keys)}
+        return [resolved[key] for key in keys]
+
+    def _resolve(self, text: str, currency: Optional[str], numbers: List[_Number],
+                 decimal: Optional[str]) -> ParsedPrice:
+        """Turn the numbers found in a price string into a ParsedPrice"""
+        if not numbers:
+            return ParsedPrice(None, currency, None, None)
+
+        values = [
+            _as_decimal(n) if n.ambiguous and n.ambiguous == decimal else n.value
+            for n in numbers
+        ]
+        if len(numbers) >= 2:
+            gap = _SYMBOL_RE.sub('', _CODE_RE.sub('', text[numbers[0].end:numbers[1].start]))
+            if _RANGE_GAP_RE.match(gap):
+                low, high = sorted(values[:2])
+                return ParsedPrice(low, currency, low, high)
+        return ParsedPrice(values[0], currency, values[0], values[0])
+
+    @staticmethod
+    def _currency(text: str) -> Optional[str]:
+        code = _CODE_RE.search(text)
+        if code:
+            return code.group(1)
+        symbol = _SYMBOL_RE.search(text)
+        return CURRENCY_SYMBOLS[symbol.group(0)] if symbol else None
+
+    def normalize(self, rows: Sequence[Dict]) -> List[Dict]:
+        """
+        Add numeric price columns to a batch of product rows
+
+        Each row gets price_amount, price_min and price_max (None when the
+        price could not be read), and its currency is filled in from the
+        price text when it had none (empty or 'N/A').
+
+        Args:
+            rows: Product dictionaries with a 'price' field
+
+        Returns:
+            New dictionaries, in the same order
+        """
+        parsed = self.parse_column(
+            [_known(row.get('price')) for row in rows],
+            [_known(row.get('currency')) for row in rows],
+        )
+        normalized = []
+        for row, price in zip(rows, parsed):
+            row = dict(row, price_amount=price.amount, price_min=price.minimum, price_max=price.maximum)
+            if not _known(row.get('currency')) and price.currency:
+                row['currency'] = price.currency
+            normalized.append(row)
+        return normalized
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Work Queue - share one crawl's product pages between several workers
+
+This module handles:
+- A work-queue interface for the product frontier and its results: URLs are
+  leased to a worker for a visibility timeout and reappear for other
+  workers if the lease is not completed in time (e.g. the worker died)
+- Idempotent completion: the first product pushed for a URL is kept, and
+  later or duplicate completions are ignored
+- Failed attempts returned to the queue with a delay, or recorded as failed
+- A SQLite implementation for workers sharing one machine (or a local
+  stand-in while testing); other back ends implement the same methods
+
+Usage:
+    queue = SqliteWorkQueue('crawl.queue.db')
+    queue.add(urls)
+    queue.finish_discovery()
+    while not queue.finished():
+        for lease in queue.lease('worker-1'):
+            queue.complete(lease, scrape(lease.url))
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Task statuses
+TASK_PENDING = 'pending'
+TASK_LEASED = 'leased'
+TASK_DONE = 'done'
+TASK_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    -- Pending: when the task may be leased; leased: when the lease expires
+    visible_at REAL NOT NULL DEFAULT 0,
+    lease_token TEXT,
+    worker TEXT,
+    error TEXT,
+    product TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_visible ON tasks (status, visible_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class Lease(NamedTuple):
+    """A URL handed to one worker until the lease expires"""
+
+    url: str
+    token: str
+    # 1 for the first lease of the URL
+    attempt: int
+    expires_at: float
+
+
+class WorkQueue:
+    """Base class for work queues shared by crawl workers"""
+
+    def add(self, urls: Iterable[str]) -> int:
+        """
+        Queue product URLs (URLs already in the queue are ignored)
+
+        Returns:
+            Number of URLs added
+        """
+        raise NotImplementedError
+
+    def lease(self, worker: str, count: int = 1) -> List[Lease]:
+        """
+        Take URLs to scrape
+
+        Args:
+            worker: Name of the worker, for logs and inspection
+            count: Most URLs to take
+
+        Returns:
+            Leases, possibly none if every URL is leased, waiting or finished
+        """
+        raise NotImplementedError
+
+    def extend(self, lease: Lease, seconds: Optional[float] = None) -> Optional[Lease]:
+        """
+        Keep a lease for longer, e.g. before a slow page
+
+        Returns:
+            The renewed lease, or None if it expired and was taken over
+        """
+        raise NotImplementedError
+
+    def complete(self, lease: Lease, product: Optional[Dict]) -> bool:
+        """
+        Push the product scraped for a leased URL
+
+        Returns:
+            True if this was the URL's first completion
+        """
+        raise NotImplementedError
+
+    def fail(self, lease: Lease, error: str, retry: bool = True, delay: float = 0.0) -> None:
+        """
+        Report a failed attempt
+
+        Args:
+            lease: The lease
+            error: Short description of the failure
+            retry: Return the URL to the queue; otherwise record it as failed
+            delay: Seconds before the URL may be leased again
+        """
+        raise NotImplementedError
+
+    def release(self, lease: Lease, delay: float = 0.0) -> None:
+        """Give a URL back without counting the attempt (e.g. its host is paused)"""
+        raise NotImplementedError
+
+    def finish_discovery(self) -> None:
+        """Record that every product URL has been queued"""
+        raise NotImplementedError
+
+    def discovery_done(self) -> bool:
+        """Whether every product URL has been queued"""
+        raise NotImplementedError
+
+    def finished(self) -> bool:
+        """Whether discovery is done and no URL is pending or leased"""
+        raise NotImplementedError
+
+    def results(self) -> Iterator[Dict]:
+        """Products pushed so far, in the order their URLs were queued"""
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        """Number of URLs per status"""
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """Forget every URL and result, e.g. when starting a fresh crawl"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the queue's resources"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SqliteWorkQueue(WorkQueue):
+    """Work queue in a SQLite database shared by processes on one machine"""
+
+    def __init__(self, path: str, visibility_timeout: float = 300.0, max_attempts: int = 3,
+                 busy_timeout: float = 30.0):
+        """
+        Open (or create) the queue database
+
+        Args:
+            path: SQLite database file; every worker opens the same file
+            visibility_timeout: Seconds a lease lasts before its URL is
+                handed to another worker
+            max_attempts: Expired leases of a URL after which it is recorded
+                as failed, so a page that kills its worker is not retried forever
+            busy_timeout: Seconds to wait for another worker's write
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+
+        # Transactions are managed explicitly so leases can lock the database first
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _write(self, sql: str, params=()) -> int:
+        """Run one write statement and return the rows it changed"""
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def add(self, urls: Iterable[str]) -> int:
+        now = time.time()
+        rows = [(url, now) for url in urls]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany('INSERT OR IGNORE INTO tasks (url, updated) VALUES (?, ?)', rows)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return self._conn.total_changes - before
+
+    def lease(self, worker: str, count: int = 1) -> List[Lease]:
+        now = time.time()
+        expires_at = now + self.visibility_timeout
+        leases = []
+        with self._lock:
+            # Lock the database before reading so two workers never take the same URL
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                given_up = self._conn.execute(
+                    'UPDATE tasks SET status = ?, lease_token = NULL, updated = ?, '
+                    "error = 'lease expired ' || attempts || ' times' "
+                    'WHERE status = ? AND visible_at <= ? AND attempts >= ?',
+                    (TASK_FAILED, now, TASK_LEASED, now, self.max_attempts),
+                ).rowcount
+                rows = self._conn.execute(
+                    'SELECT url, attempts FROM tasks WHERE status IN (?, ?) AND visible_at <= ? '
+                    'ORDER BY rowid LIMIT ?',
+                    (TASK_PENDING, TASK_LEASED, now, max(1, count)),
+                ).fetchall()
+                for url, attempts in rows:
+                    token = uuid.uuid4().hex
+                    self._conn.execute(
+                        'UPDATE tasks SET status = ?, attempts = attempts + 1, visible_at = ?, '
+                        'lease_token = ?, worker = ?, updated = ? WHERE url = ?',
+                        (TASK_LEASED, expires_at, token, worker, now, url),
+                    )
+                    leases.append(Lease(url, token, attempts + 1, expires_at))
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+        if given_up:
+            logger.warning(f"{given_up} URLs failed after their lease expired {self.max_attempts} times")
+        return leases
+
+    def extend(self, lease: Lease, seconds: Optional[float] = None) -> Optional[Lease]:
+        expires_at = time.time() + (self.visibility_timeout if seconds is None else seconds)
+        changed = self._write(
+            'UPDATE tasks SET visible_at = ? WHERE url = ? AND lease_token = ? AND status = ?',
+            (expires_at, lease.url, lease.token, TASK_LEASED),
+        )
+        return lease._replace(expires_at=expires_at) if changed else None
+
+    def complete(self, lease: Lease, product: Optional[Dict]) -> bool:
+        product_json = json.dumps(product, ensure_ascii=False) if product is not None else None
+        # Any worker's result is accepted, even after its lease expired, but only once
+        return self._write(
+            'UPDATE tasks SET status = ?, product = ?, error = NULL, lease_token = NULL, updated = ? '
+            'WHERE url = ? AND status != ?',
+            (TASK_DONE, product_json, time.time(), lease.url, TASK_DONE),
+        ) == 1
+
+    def fail(self, lease: Lease, error: str, retry: bool = True, delay: float = 0.0) -> None:
+        now = time.time()
+        # A lease that expired and went to another worker is not this worker's to fail
+        self._write(
+            'UPDATE tasks SET status = ?, visible_at = ?, error = ?, lease_token = NULL, updated = ? '
+            'WHERE url = ? AND lease_token = ? AND status = ?',
+            (TASK_PENDING if retry else TASK_FAILED, now + delay, error[:500], now,
+             lease.url, lease.token, TASK_LEASED),
+        )
+
+    def release(self, lease: Lease, delay: float = 0.0) -> None:
+        now = time.time()
+        self._write(
+            'UPDATE tasks SET status = ?, visible_at = ?, attempts = attempts - 1, lease_token = NULL, '
+            'updated = ? WHERE url = ? AND lease_token = ? AND status = ?',
+            (TASK_PENDING, now + delay, now, lease.url, lease.token, TASK_LEASED),
+        )
+
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        """Store a crawl setting shared by the workers (None deletes it)"""
+        if value is None:
+            self._write('DELETE FROM meta WHERE key = ?', (key,))
+        else:
+            self._write(
+                'INSERT INTO meta (key, value) VALUES (?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                (key, str(value)),
+            )
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Read a crawl setting shared by the workers"""
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def finish_discovery(self) -> None:
+        self.set_meta('discovery_done', '1')
+
+    def discovery_done(self) -> bool:
+        return self.get_meta('discovery_done') == '1'
+
+    def finished(self) -> bool:
+        if not self.discovery_done():
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT 1 FROM tasks WHERE status IN (?, ?) LIMIT 1', (TASK_PENDING, TASK_LEASED)
+            ).fetchone()
+        return row is None
+
+    def results(self) -> Iterator[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT product FROM tasks WHERE status = ? AND product IS NOT NULL ORDER BY rowid',
+                (TASK_DONE,),
+            ).fetchall()
+        for (product,) in rows:
+            yield json.loads(product)
+
+    def failed_urls(self) -> Dict[str, str]:
+        """URLs recorded as failed, with their last error"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, error FROM tasks WHERE status = ? ORDER BY rowid', (TASK_FAILED,)
+            ).fetchall()
+        return {url: error or '' for url, error in rows}
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall()
+        return dict(rows)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute('DELETE FROM tasks')
+            self._conn.execute('DELETE FROM meta')
+            self._conn.execute('COMMIT')
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Rate Limiting - crawl each host as fast as it tolerates, and no faster
+
+This module handles:
+- A token bucket per host, shared by every fetch path (HTTP, async and
+  browser) and every worker thread
+- AIMD rate control: the rate grows a little after each healthy response
+  and is halved after 429/503 responses, server errors, timeouts or when
+  response times climb well above the host's baseline
+- Pausing a host for as long as a Retry-After header asks
+- Capping the rate at the robots.txt Crawl-delay
+
+Usage:
+    limiter = HostRateLimiter(robots_fetcher=read_robots)
+    limiter.acquire(url)                     # blocks until the host allows a request
+    response = session.get(url)
+    limiter.record(url, latency, response.status_code, response.headers.get('Retry-After'))
+"""
+
+import logging
+import threading
+import time
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean the host wants fewer requests
+THROTTLE_STATUSES = (429, 503)
+
+# Longest pause honored from a Retry-After header, in seconds
+MAX_RETRY_AFTER = 300.0
+
+# Weight of the newest response in the latency average
+LATENCY_SMOOTHING = 0.2
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Read a Retry-After header
+
+    Args:
+        value: Header value, in seconds or as an HTTP date
+        now: Current time.time(), for dates
+
+    Returns:
+        Seconds to wait (capped at MAX_RETRY_AFTER), or None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = when.timestamp() - (time.time() if now is None else now)
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def crawl_delay_from_robots(robots_txt: str, user_agent: str = '*') -> Optional[float]:
+    """
+    Read the Crawl-delay (or Request-rate) that applies to a user agent
+
+    Args:
+        robots_txt: Contents of robots.txt
+        user_agent: User agent to look up
+
+    Returns:
+        Seconds between requests, or None
+    """
+    parser = RobotFileParser()
+    parser.parse(robots_txt.splitlines())
+    delay = parser.crawl_delay(user_agent)
+    rate = parser.request_rate(user_agent)
+    if rate is not None and rate.requests:
+        delay = max(float(delay or 0), rate.seconds / rate.requests)
+    return float(delay) if delay else None
+
+
+class _HostState:
+    """Bucket and rate of one host"""
+
+    __slots__ = (
+        'rate', 'ceiling', 'tokens', 'updated', 'paused_until', 'latency',
+        'baseline', 'last_decrease', 'requests', 'throttled', 'waited',
+    )
+
+    def __init__(self, rate: float, ceiling: float, burst: float, now: float):
+        self.rate = rate
+        self.ceiling = ceiling
+        self.tokens = burst
+        self.updated = now
+        self.paused_until = 0.0
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.last_decrease = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+
+class HostRateLimiter:
+    """Token bucket per host with additive-increase / multiplicative-decrease rates"""
+
+    def __init__(
+        self,
+        initial_rate: float = 4.0,
+        min_rate: float = 0.1,
+        max_rate: float = 20.0,
+        burst: float = 4.0,
+        increase: float = 0.1,
+        decrease: float = 0.5,
+        latency_factor: float = 2.0,
+        latency_floor: float = 0.25,
+        robots_fetcher: Optional[Callable[[str], Optional[str]]] = None,
+        user_agent: str = '*',
+    ):
+        """
+        Initialize the limiter
+
+        Args:
+            initial_rate: Requests per second a host starts at
+            min_rate: Lowest rate after backing off
+            max_rate: Highest rate a host is ramped up to
+            burst: Requests a host may receive back to back after a pause
+            increase: Requests per second added after each healthy response
+            decrease: Factor the rate is multiplied by when the host struggles
+            latency_factor: Responses this many times slower than the host's
+                baseline count as a sign of overload
+            latency_floor: Response times (seconds) below which latency is
+                never treated as overload
+            robots_fetcher: Callable taking a site root URL and returning its
+                robots.txt, or None; read once per host for Crawl-delay
+            user_agent: User agent whose robots.txt rules apply
+        """
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.burst = max(1.0, burst)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.robots_fetcher = robots_fetcher
+        self.user_agent = user_agent
+
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+        self._robots_lock = threading.Lock()
+
+    def _host(self, url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def _state(self, host: str, now: float) -> _HostState:
+        """Get a host's state, creating it on first use (call with the lock held)"""
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState(min(self.initial_rate, self.max_rate), self.max_rate, self.burst, now)
+            self._hosts[host] = state
+        return state
+
+    def _check_robots(self, url: str, host: str) -> None:
+        """Read a host's Crawl-delay the first time it is requested"""
+        if self.robots_fetcher is None or host in self._hosts:
+            return
+        with self._robots_lock:
+            if host in self._hosts:
+                return
+            parts = urlsplit(url)
+            delay = None
+            try:
+                robots_txt = self.robots_fetcher(f"{parts.scheme}://{parts.netloc}/")
+                if robots_txt:
+                    delay = crawl_delay_from_robots(robots_txt, self.user_agent)
+            except Exception as e:
+                logger.debug(f"Could not read robots.txt for {host}: {e}")
+
+            with self._lock:
+                state = self._state(host, time.monotonic())
+                if delay:
+                    state.ceiling = max(min(self.max_rate, 1.0 / delay), 1e-3)
+                    state.rate = min(state.rate, state.ceiling)
+                    state.tokens = min(state.tokens, 1.0)
+                    logger.info(f"{host} asks for a crawl delay of {delay:g}s")
+
+    def reserve(self, url: str) -> float:
+        """
+        Take a request slot for a URL's host without waiting
+
+        Args:
+            url: URL about to be requested
+
+        Returns:
+            Seconds the caller must wait before sending the request
+        """
+        host = self._host(url)
+        self._check_robots(url, host)
+
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(host, now)
+            capacity = min(self.burst, max(1.0, state.rate))
+            state.tokens = min(capacity, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+
+            # Going below zero reserves a future slot for this caller
+            state.tokens -= 1.0
+            wait = -state.tokens / state.rate if state.tokens < 0 else 0.0
+            wait = max(wait, state.paused_until - now)
+            state.requests += 1
+            state.waited += wait
+            return wait
+
+    def acquire(self, url: str) -> float:
+        """
+        Block until a URL's host may receive another request
+
+        Args:
+            url: URL about to be requested
+
+        Returns:
+            Seconds waited
+        """
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record(
+        self,
+        url: str,
+        latency: Optional[float] = None,
+        status: Optional[int] = None,
+        retry_after: Optional[str] = None,
+        error: bool = False,
+    ) -> None:
+        """
+        Adjust a host's rate after a response
+
+        Args:
+            url: URL that was requested
+            latency: Seconds the response took (None if unknown, e.g. a
+                browser page load)
+            status: HTTP status code, if known
+            retry_after: Retry-After header value, if any
+            error: The request failed without a response (timeout,
+                connection reset)
+        """
+        host = self._host(url)
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(host, now)
+
+            if latency is not None and not error:
+                state.latency = latency if state.latency is None else (
+                    LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * state.latency
+                )
+                if state.baseline is None or state.latency < state.baseline:
+                    state.baseline = state.latency
+
+            throttled = status in THROTTLE_STATUSES
+            pause = parse_retry_after(retry_after) if throttled or retry_after else None
+            if pause:
+                state.paused_until = max(state.paused_until, now + pause)
+
+            struggling = error or throttled or (status is not None and status >= 500)
+            slow = (
+                state.latency is not None and state.baseline is not None
+                and state.latency > max(self.latency_floor, state.baseline * self.latency_factor)
+            )
+            if throttled:
+                state.throttled += 1
+
+            if struggling or slow:
+                # Halve at most once per round of in-flight requests
+                if now - state.last_decrease >= max(1.0, 1.0 / state.rate):
+                    state.rate = min(state.ceiling, max(self.min_rate, state.rate * self.decrease))
+                    state.tokens = min(state.tokens, 0.0)
+                    state.last_decrease = now
+                    logger.debug(f"Slowing down {host} to {state.rate:.2f} requests/s")
+            elif status is None or status < 400:
+                state.rate = min(state.ceiling, state.rate + self.increase)
+
+    def knows(self, url: str) -> bool:
+        """Whether a URL's host was requested before (so reserve() will not read robots.txt)"""
+        with self._lock:
+            return self._host(url) in self._hosts
+
+    def rate(self, url: str) -> Optional[float]:
+        """Current requests per second of a URL's host, or None if not seen yet"""
+        with self._lock:
+            state = self._hosts.get(self._host(url))
+            return state.rate if state is not None else None
+
+    def summary(self) -> List[str]:
+        """Describe each host's final rate"""
+        with self._lock:
+            return [
+                f"Rate limit: {host} at {state.rate:.2f} requests/s after {state.requests} requests "
+                f"({state.throttled} throttled responses, {state.waited:.1f}s waited)"
+                for host, state in sorted(self._hosts.items())
+                if state.requests
+            ]
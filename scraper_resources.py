@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Resource Policy - keep the browser from downloading what the scraper never reads
+
+This module handles:
+- Blocking images, fonts, media and other resource types by URL pattern
+  through DevTools (CDP) Network.setBlockedURLs
+- Blocking analytics, advertising and tag-manager domains
+- Chrome options for an 'eager' page load strategy
+- Counting pages, requests blocked and bytes downloaded from the
+  performance log, and estimating the bytes the blocked requests would
+  have cost
+
+Usage:
+    policy = ResourcePolicy(block_types=('image', 'font', 'media'))
+    policy.apply_to_options(chrome_options)
+    driver = webdriver.Chrome(options=chrome_options)
+    policy.install(driver)
+    driver.get(url)
+    policy.collect(driver)
+    # or, when the driver's log is also read for other purposes
+    policy.listen(performance_log)
+"""
+
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from scraper_network import enable_network_capture
+
+
+logger = logging.getLogger(__name__)
+
+# URL patterns blocked for each resource type
+RESOURCE_PATTERNS: Dict[str, Sequence[str]] = {
+    'image': ('jpg', 'jpeg', 'png', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'),
+    'font': ('woff', 'woff2', 'ttf', 'otf', 'eot'),
+    'media': ('mp4', 'webm', 'ogg', 'ogv', 'mp3', 'wav', 'm4a', 'mov', 'm3u8'),
+    'stylesheet': ('css',),
+}
+
+# Resource types blocked unless configured otherwise
+DEFAULT_BLOCK_TYPES = ('image', 'font', 'media')
+
+# Analytics, advertising and tag-manager hosts; none of them serve product data
+TRACKER_DOMAINS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googleadservices.com',
+    'googlesyndication.com',
+    'doubleclick.net',
+    'adservice.google.com',
+    'connect.facebook.net',
+    'analytics.tiktok.com',
+    'snap.licdn.com',
+    'bat.bing.com',
+    'clarity.ms',
+    'hotjar.com',
+    'cdn.segment.com',
+    'api.segment.io',
+    'mixpanel.com',
+    'fullstory.com',
+    'js-agent.newrelic.com',
+    'nr-data.net',
+    'criteo.com',
+    'criteo.net',
+    'taboola.com',
+    'outbrain.com',
+    'klaviyo.com',
+)
+
+# Rough transfer size of one request per resource type, used to estimate
+# bytes saved when no request of that type was downloaded during the run
+TYPICAL_BYTES: Dict[str, int] = {
+    'image': 25_000,
+    'font': 30_000,
+    'media': 250_000,
+    'stylesheet': 15_000,
+    'script': 20_000,
+    'tracker': 20_000,
+    'other': 5_000,
+}
+
+def _extension_patterns(extension: str) -> List[str]:
+    """Patterns matching a file extension with and without a query string"""
+    return [f'*.{extension}', f'*.{extension}?*']
+
+
+def _domain_patterns(domain: str) -> List[str]:
+    """Patterns matching a host and its subdomains"""
+    return [f'*://{domain}/*', f'*.{domain}/*']
+
+
+class ResourcePolicy:
+    """Block resource types and tracker domains in browser sessions"""
+
+    def __init__(
+        self,
+        block_types: Iterable[str] = DEFAULT_BLOCK_TYPES,
+        block_domains: Iterable[str] = TRACKER_DOMAINS,
+        eager: bool = True,
+    ):
+        """
+        Initialize the policy
+
+        Args:
+            block_types: Resource types to block (keys of RESOURCE_PATTERNS)
+            block_domains: Hosts whose requests are blocked, with subdomains
+            eager: Use the 'eager' page load strategy, returning from
+                driver.get once the DOM is parsed instead of after every
+                subresource has loaded
+
+        Raises:
+            ValueError: If a resource type is unknown
+        """
+        self.block_types = tuple(block_types)
+        unknown = [t for t in self.block_types if t not in RESOURCE_PATTERNS]
+        if unknown:
+            raise ValueError(f"Unknown resource types: {', '.join(unknown)}")
+        self.block_domains = tuple(d.strip().lower() for d in block_domains if d.strip())
+        self.eager = eager
+
+        self.patterns: List[str] = []
+        for resource_type in self.block_types:
+            for extension in RESOURCE_PATTERNS[resource_type]:
+                self.patterns.extend(_extension_patterns(extension))
+        for domain in self.block_domains:
+            self.patterns.extend(_domain_patterns(domain))
+
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.requests_loaded = 0
+        self.bytes_loaded = 0
+        self.blocked: Counter = Counter()
+        # Requests and bytes downloaded per resource type, for the bytes-saved estimate
+        self.loaded_by_type: Counter = Counter()
+        self.bytes_by_type: Counter = Counter()
+
+    def apply_to_options(self, chrome_options) -> None:
+        """
+        Set the Chrome options the policy needs
+
+        Args:
+            chrome_options: selenium ChromeOptions for a new session
+        """
+        if self.eager:
+            chrome_options.page_load_strategy = 'eager'
+        # Images are blocked by URL pattern only: disabling them in the
+        # profile would keep them out of the log, and out of the counts
+        if self.patterns:
+            # Blocked requests show up as loadingFailed events
+            enable_network_capture(chrome_options)
+
+    def install(self, driver) -> None:
+        """
+        Turn on request blocking in a new browser session
+
+        Args:
+            driver: Chrome WebDriver created with apply_to_options
+        """
+        if not self.patterns:
+            return
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.patterns})
+        except Exception as e:
+            logger.warning(f"Could not block resources in the browser: {e}")
+
+    def collect(self, driver) -> None:
+        """
+        Count the requests of the pages loaded since the last call
+
+        Reads (and clears) the driver's performance log; use listen()
+        instead for a driver whose log is also read elsewhere.
+
+        Args:
+            driver: Chrome WebDriver the pages were loaded in
+        """
+        if not self.patterns:
+            return
+        try:
+            entries = driver.get_log('performance')
+        except Exception as e:
+            logger.debug(f"Performance log not available: {e}")
+            return
+        self.count(entries)
+
+    def listen(self, log) -> None:
+        """
+        Count the requests in every read of a shared performance log
+
+        Args:
+            log: PerformanceLog of a driver created with apply_to_options
+        """
+        if self.patterns:
+            log.listeners.append(self.count)
+
+    def count(self, entries: Iterable[Dict]) -> None:
+        """
+        Count the pages and requests in performance log entries
+
+        Every document downloaded counts as a browser page, so listing
+        pages are counted as well as product pages.
+
+        Args:
+            entries: Entries read from a driver's performance log
+        """
+        urls: Dict[str, str] = {}
+        types: Dict[str, str] = {}
+        loaded: Counter = Counter()
+        size: Counter = Counter()
+        blocked: Counter = Counter()
+        for entry in entries or []:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+            request_id = params.get('requestId')
+            if method == 'Network.requestWillBeSent':
+                urls[request_id] = params.get('request', {}).get('url', '')
+                if params.get('type'):
+                    types[request_id] = params['type'].lower()
+            elif method == 'Network.responseReceived' and params.get('type'):
+                types[request_id] = params['type'].lower()
+            elif method == 'Network.loadingFinished':
+                resource_type = types.get(request_id, 'other')
+                loaded[resource_type] += 1
+                size[resource_type] += int(params.get('encodedDataLength') or 0)
+            elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+                blocked[self._blocked_kind(urls.get(request_id, ''), params.get('type'))] += 1
+
+        with self._lock:
+            self.pages += loaded['document']
+            self.requests_loaded += sum(loaded.values())
+            self.bytes_loaded += sum(size.values())
+            self.loaded_by_type.update(loaded)
+            self.bytes_by_type.update(size)
+            self.blocked.update(blocked)
+
+    def _blocked_kind(self, url: str, resource_type: Optional[str]) -> str:
+        """Name a blocked request is counted under: 'tracker' or its resource type"""
+        host = url.split('://', 1)[-1].split('/', 1)[0].lower()
+        if any(host == d or host.endswith('.' + d) for d in self.block_domains):
+            return 'tracker'
+        return (resource_type or 'other').lower()
+
+    def estimated_bytes_saved(self) -> int:
+        """
+        Estimate the bytes the blocked requests would have downloaded
+
+        Each blocked request counts as the mean size of the requests of its
+        resource type that were downloaded during the run, or as
+        TYPICAL_BYTES for types (and trackers) that never were.
+
+        Returns:
+            Estimated bytes saved
+        """
+        with self._lock:
+            total = 0
+            for kind, count in self.blocked.items():
+                if kind != 'tracker' and self.loaded_by_type[kind]:
+                    mean = self.bytes_by_type[kind] / self.loaded_by_type[kind]
+                else:
+                    mean = TYPICAL_BYTES.get(kind, TYPICAL_BYTES['other'])
+                total += count * mean
+            return int(total)
+
+    def summary(self) -> List[str]:
+        """Describe what was blocked during this run"""
+        if not self.pages:
+            return []
+        total = sum(self.blocked.values())
+        kinds = ', '.join(f"{count} {kind}" for kind, count in self.blocked.most_common()) or 'none'
+        return [
+            f"Resource policy: {total} requests blocked over {self.pages} browser pages ({kinds})",
+            f"Resource policy: {self.requests_loaded} requests and {self.bytes_loaded} bytes "
+            f"downloaded ({self.bytes_loaded // self.pages} bytes per page)",
+            f"Resource policy: about {self.estimated_bytes_saved()} bytes saved "
+            f"(blocked requests x mean size of their resource type)",
+        ]
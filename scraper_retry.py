@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Retries - classify failed product fetches and try them again later
+
+This module handles:
+- Classifying errors: timeouts, HTTP statuses, connection errors, WebDriver
+  crashes and pages whose product fields were not found
+- Retrying transient failures with jittered exponential backoff through a
+  deferred retry queue, so one slow URL does not hold up the rest
+- A circuit breaker per host that pauses a failing site, probes it again
+  after a cooldown and gives up on it after repeated trips
+
+Usage:
+    scheduler = RetryScheduler(RetryPolicy(max_attempts=3))
+    scheduler.add(urls)
+    while (task := scheduler.next()) is not None:
+        try:
+            product = scrape(task.url)
+        except Exception as e:
+            failure = scheduler.failure(task, e)    # None if it will be retried
+        else:
+            scheduler.success(task)
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+try:
+    from selenium.common.exceptions import (
+        InvalidSessionIdException,
+        TimeoutException,
+        WebDriverException,
+    )
+except ImportError:
+    InvalidSessionIdException = None
+    TimeoutException = None
+    WebDriverException = None
+
+
+logger = logging.getLogger(__name__)
+
+# Failure kinds
+FAILURE_TIMEOUT = 'timeout'
+FAILURE_HTTP = 'http'
+FAILURE_CONNECTION = 'connection'
+FAILURE_DRIVER_CRASH = 'driver_crash'
+FAILURE_EXTRACTION = 'extraction'
+FAILURE_HOST_DOWN = 'host_down'
+FAILURE_ERROR = 'error'
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))
+
+# Fragments of WebDriver error messages that mean the browser session is gone
+DRIVER_CRASH_MESSAGES = (
+    'invalid session id',
+    'chrome not reachable',
+    'session deleted',
+    'disconnected',
+    'target window already closed',
+    'tab crashed',
+    'no such window',
+)
+
+
+def is_driver_crash(error: Exception) -> bool:
+    """
+    Determine if an exception means the WebDriver session is unusable
+
+    Args:
+        error: Exception raised while driving the browser
+
+    Returns:
+        True if the driver should be discarded and replaced
+    """
+    if InvalidSessionIdException is not None and isinstance(error, InvalidSessionIdException):
+        return True
+
+    if WebDriverException is not None and isinstance(error, WebDriverException):
+        message = str(error).lower()
+        return any(fragment in message for fragment in DRIVER_CRASH_MESSAGES)
+
+    return False
+
+
+class ExtractionMiss(Exception):
+    """A page loaded but its product fields were not found"""
+
+    def __init__(self, url: str, product: Optional[Dict] = None):
+        super().__init__(f"product fields missing on {url}")
+        self.product = product
+
+
+class HostUnavailable(Exception):
+    """A host's circuit breaker gave up on it"""
+
+    def __init__(self, url: str):
+        super().__init__(f"{urlsplit(url).netloc} is unavailable (circuit open)")
+
+
+class Failure(NamedTuple):
+    """How a fetch failed and what to do about it"""
+
+    kind: str
+    retryable: bool
+    # Counts against the host's circuit breaker
+    host_failure: bool
+    status: Optional[int] = None
+    message: str = ''
+
+    def describe(self) -> str:
+        """Short description for logs and the crawl state"""
+        kind = f"{self.kind} {self.status}" if self.status else self.kind
+        return f"{kind}: {self.message}" if self.message else kind
+
+
+def classify_error(error: Exception) -> Failure:
+    """
+    Classify an exception raised while fetching a product page
+
+    Args:
+        error: The exception
+
+    Returns:
+        Failure describing it
+    """
+    message = str(error).splitlines()[0][:200] if str(error) else type(error).__name__
+
+    if isinstance(error, ExtractionMiss):
+        return Failure(FAILURE_EXTRACTION, True, False, message=message)
+    if isinstance(error, HostUnavailable):
+        return Failure(FAILURE_HOST_DOWN, False, False, message=message)
+    if is_driver_crash(error):
+        return Failure(FAILURE_DRIVER_CRASH, True, False, message=message)
+
+    timeouts = (TimeoutError, asyncio.TimeoutError)
+    if TimeoutException is not None:
+        timeouts += (TimeoutException,)
+    if requests is not None:
+        timeouts += (requests.Timeout,)
+    if isinstance(error, timeouts):
+        return Failure(FAILURE_TIMEOUT, True, True, message=message)
+
+    if requests is not None and isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return Failure(
+            FAILURE_HTTP, status in RETRYABLE_STATUSES, status == 429 or status >= 500, status, message
+        )
+
+    connection_errors = (ConnectionError,)
+    if requests is not None:
+        connection_errors += (requests.ConnectionError,)
+    if isinstance(error, connection_errors):
+        return Failure(FAILURE_CONNECTION, True, True, message=message)
+
+    return Failure(FAILURE_ERROR, False, False, message=message)
+
+
+class RetryPolicy:
+    """How often and how soon failed fetches are retried"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        extraction_attempts: int = 2,
+        rng: Optional[random.Random] = None,
+    ):
+        """
+        Initialize the policy
+
+        Args:
+            max_attempts: Attempts per URL, the first one included
+            base_delay: Backoff before the first retry (seconds); it doubles
+                with every attempt
+            max_delay: Longest backoff
+            extraction_attempts: Attempts for pages that loaded without
+                product fields (e.g. rendered too late)
+            rng: Random generator for the jitter
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.extraction_attempts = max(1, min(extraction_attempts, self.max_attempts))
+        self.rng = rng or random.Random()
+
+    def should_retry(self, failure: Failure, attempt: int) -> bool:
+        """Whether a failed attempt (1-based) gets another one"""
+        if not failure.retryable:
+            return False
+        limit = self.extraction_attempts if failure.kind == FAILURE_EXTRACTION else self.max_attempts
+        return attempt < limit
+
+    def delay(self, attempt: int) -> float:
+        """Backoff after a failed attempt: uniformly random up to the exponential cap"""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class _Circuit:
+    __slots__ = ('failures', 'trips', 'open_until', 'probing')
+
+    def __init__(self):
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        # URL of the request probing a half-open host, or None
+        self.probing: Optional[str] = None
+
+
+class CircuitBreaker:
+    """Pause work on hosts that keep failing"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        max_trips: int = 4,
+        probe_wait: float = 1.0,
+    ):
+        """
+        Initialize the breaker
+
+        Args:
+            failure_threshold: Consecutive host failures that open the circuit
+            cooldown: First pause of an open host (seconds); it doubles
+                with every trip
+            max_cooldown: Longest pause
+            max_trips: Trips after which the host is given up for this run
+            probe_wait: How long other work for a host waits while one
+                probe request checks whether it recovered
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_trips = max(1, max_trips)
+        self.probe_wait = probe_wait
+
+        self._circuits: Dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, url: str) -> _Circuit:
+        host = urlsplit(url).netloc.lower()
+        circuit = self._circuits.get(host)
+        if circuit is None:
+            circuit = self._circuits[host] = _Circuit()
+        return circuit
+
+    def wait_time(self, url: str) -> Optional[float]:
+        """
+        Check whether a URL's host may be requested
+
+        Returns:
+            0 if it may, seconds until it may be tried again, or None if
+            the host was given up
+        """
+        with self._lock:
+            circuit = self._circuit(url)
+            if circuit.trips > self.max_trips:
+                return None
+            now = time.monotonic()
+            if now < circuit.open_until:
+                return circuit.open_until - now
+            if circuit.trips:
+                # Half-open: one request probes the host, the rest wait for it
+                if circuit.probing is not None:
+                    return self.probe_wait
+                circuit.probing = url
+            return 0.0
+
+    def record_success(self, url: str) -> None:
+        """Close a host's circuit (the host answered, even if not with a product)"""
+        with self._lock:
+            circuit = self._circuit(url)
+            circuit.failures = 0
+            circuit.trips = 0
+            circuit.probing = None
+
+    def end_probe(self, url: str) -> None:
+        """Let another request probe a half-open host when this URL sent no request"""
+        with self._lock:
+            circuit = self._circuit(url)
+            if circuit.probing == url:
+                circuit.probing = None
+
+    def record_failure(self, url: str) -> None:
+        """Count a host failure, opening the circuit past the threshold or after a failed probe"""
+        with self._lock:
+            circuit = self._circuit(url)
+            if circuit.trips > self.max_trips or time.monotonic() < circuit.open_until:
+                # Requests sent before the pause; already counted
+                return
+            circuit.failures += 1
+            if not circuit.trips and circuit.failures < self.failure_threshold:
+                return
+
+            circuit.trips += 1
+            circuit.failures = 0
+            circuit.probing = None
+            host = urlsplit(url).netloc
+            if circuit.trips > self.max_trips:
+                logger.error(f"Giving up on {host} after {self.max_trips} pauses")
+                return
+            pause = min(self.max_cooldown, self.cooldown * 2 ** (circuit.trips - 1))
+            circuit.open_until = time.monotonic() + pause
+            logger.warning(f"{host} keeps failing - pausing it for {pause:.0f}s")
+
+    def record(self, url: str, failure: Failure) -> None:
+        """
+        Update a host's circuit after a failed request
+
+        Host failures count against the host. Any other answer from the host
+        (a 404, a page without the product) closes its circuit; failures that
+        say nothing about the host (a browser crash) end a probe without a verdict.
+
+        Args:
+            url: URL that failed
+            failure: How it failed
+        """
+        if failure.host_failure:
+            self.record_failure(url)
+        elif failure.kind in (FAILURE_HTTP, FAILURE_EXTRACTION):
+            self.record_success(url)
+        else:
+            self.end_probe(url)
+
+    def is_down(self, url: str) -> bool:
+        """Whether a URL's host was given up"""
+        with self._lock:
+            return self._circuit(url).trips > self.max_trips
+
+
+class Task(NamedTuple):
+    """A URL handed out by the scheduler"""
+
+    index: int
+    url: str
+    attempt: int
+    # The host was given up; report the task with scheduler.failure(task, HostUnavailable(url))
+    host_down: bool = False
+
+
+class RetryScheduler:
+    """Hand out URLs, schedule retries with backoff and respect host circuits"""
+
+    def __init__(self, policy: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None):
+        """
+        Initialize the scheduler
+
+        Args:
+            policy: Retry policy (default: RetryPolicy())
+            breaker: Circuit breaker (default: CircuitBreaker())
+        """
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+
+        self.retries = 0
+        self.recovered = 0
+        self.failures: Counter = Counter()
+        self.failed: Dict[str, str] = {}
+
+        self._heap: List = []
+        self._seq = 0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def add(self, urls: Iterable[str]) -> int:
+        """
+        Queue URLs for their first attempt
+
+        Returns:
+            Number of URLs queued
+        """
+        added = 0
+        with self._cond:
+            for url in urls:
+                self._push(0.0, Task(self._seq, url, 1))
+                self._seq += 1
+                added += 1
+            self._cond.notify_all()
+        return added
+
+    @property
+    def added(self) -> int:
+        """URLs added so far; the next URL added gets this index"""
+        return self._seq
+
+    def _push(self, ready_at: float, task: Task) -> None:
+        heapq.heappush(self._heap, (ready_at, task.index, task.attempt, task))
+
+    def next(self) -> Optional[Task]:
+        """
+        Get the next URL whose retry time has come and whose host is not paused
+
+        Blocks while every queued URL is waiting, and while other callers
+        still hold tasks that may be retried.
+
+        Returns:
+            Task, or None once every URL is finished
+        """
+        with self._cond:
+            while True:
+                if not self._heap:
+                    if not self._in_flight:
+                        return None
+                    self._cond.wait()
+                    continue
+
+                ready_at, _, _, task = self._heap[0]
+                now = time.monotonic()
+                if ready_at > now:
+                    self._cond.wait(ready_at - now)
+                    continue
+                heapq.heappop(self._heap)
+
+                wait = self.breaker.wait_time(task.url)
+                if wait:
+                    self._push(now + wait, task)
+                    continue
+
+                self._in_flight += 1
+                return task._replace(host_down=wait is None)
+
+    def success(self, task: Task) -> None:
+        """Report that a task's URL was scraped"""
+        self.breaker.record_success(task.url)
+        with self._cond:
+            if task.attempt > 1:
+                self.recovered += 1
+            self._done()
+
+    def skip(self, task: Task) -> None:
+        """Report that a task's URL needed no request"""
+        self.breaker.end_probe(task.url)
+        with self._cond:
+            self._done()
+
+    def failure(self, task: Task, error: Exception) -> Optional[Failure]:
+        """
+        Report that a task's URL failed
+
+        Args:
+            task: Task from next()
+            error: The exception raised
+
+        Returns:
+            None if the URL will be retried, else the final Failure
+        """
+        failure = classify_error(error)
+        self.breaker.record(task.url, failure)
+
+        with self._cond:
+            self.failures[failure.kind] += 1
+            if self.policy.should_retry(failure, task.attempt):
+                delay = self.policy.delay(task.attempt)
+                self.retries += 1
+                logger.info(
+                    f"Retrying {task.url} in {delay:.1f}s "
+                    f"(attempt {task.attempt + 1}/{self.policy.max_attempts}): {failure.describe()}"
+                )
+                self._push(time.monotonic() + delay, task._replace(attempt=task.attempt + 1))
+                self._done()
+                return None
+
+            if not (isinstance(error, ExtractionMiss) and error.product is not None):
+                # A partial product is still emitted, so the URL is not failed
+                self.failed[task.url] = failure.describe()
+            self._done()
+            return failure
+
+    def _done(self) -> None:
+        self._in_flight -= 1
+        self._cond.notify_all()
+
+    def summary(self) -> List[str]:
+        """Describe the retries of this run"""
+        if not self.failures:
+            return []
+        kinds = ', '.join(f"{count} {kind}" for kind, count in self.failures.most_common())
+        return [
+            f"Retries: {self.retries} retried, {self.recovered} recovered, "
+            f"{len(self.failed)} failed for good (errors: {kinds})"
+        ]
@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+Product Sinks - stream scraped products to disk as they are produced
+
+This module handles:
+- A fixed output schema, so rows can be written before the crawl ends
+- Periodic flush + fsync, so a crash loses at most the last few rows
+- Parsing the price text of each batch of rows into numeric amount and
+  min/max columns (see scraper_prices) before it is written
+- Pluggable back ends chosen by file extension: CSV, JSON Lines (optionally
+  gzip-compressed), Parquet with one row group per batch of rows (needs
+  pyarrow), a SQLite table keyed and upserted by URL, and a PostgreSQL
+  table loaded with COPY and upserted by URL or SKU (needs psycopg2)
+
+Usage:
+    with open_sink('products.parquet') as sink:
+        scraper.scrape_all_products(sink=sink)
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Type
+from urllib.parse import urlsplit, urlunsplit
+
+from scraper_prices import PRICE_FIELDS, PriceNormalizer
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_INSTALLED = True
+except ImportError:
+    pa = None
+    pq = None
+    PYARROW_INSTALLED = False
+
+try:
+    import psycopg2
+    import psycopg2.pool
+    PSYCOPG2_INSTALLED = True
+except ImportError:
+    psycopg2 = None
+    PSYCOPG2_INSTALLED = False
+
+
+logger = logging.getLogger(__name__)
+
+# Output columns, in order
+PRODUCT_FIELDS = [
+    'url',
+    'title',
+    'price',
+    'description',
+    'image_url',
+    'sku',
+    'availability',
+    'category',
+    'brand',
+    'currency',
+    # Parsed from 'price' when the rows are written
+    'price_amount',
+    'price_min',
+    'price_max',
+]
+
+
+# Rows per Parquet row group
+ROW_GROUP_SIZE = 50_000
+
+# URL schemes written to PostgreSQL instead of a file
+DATABASE_SCHEMES = ('postgresql', 'postgres')
+
+# Connections kept open per database by the shared PostgreSQL pools
+POOL_SIZE = 4
+
+
+class ProductSink:
+    """Base class for streaming product writers"""
+
+    def __init__(
+        self,
+        path: str,
+        fieldnames: Optional[Sequence[str]] = None,
+        flush_every: int = 100,
+        flush_interval: float = 5.0,
+        append: bool = False,
+    ):
+        """
+        Open the sink
+
+        Args:
+            path: Output file path
+            fieldnames: Output columns (defaults to PRODUCT_FIELDS); keys
+                outside the schema are dropped, missing keys are left empty.
+                Price columns (PRICE_FIELDS) in the schema are filled in
+                from each row's price text
+            flush_every: Flush and fsync after this many rows
+            flush_interval: Flush and fsync when this many seconds have
+                passed since the last flush
+            append: Add to an existing file instead of replacing it
+        """
+        self.path = path
+        self.fieldnames: List[str] = list(fieldnames or PRODUCT_FIELDS)
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.append = append
+
+        self.count = 0
+        # Rows known to be on disk (count at the last fsync)
+        self.synced = 0
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._warned_keys = set()
+        self._closed = False
+        # Rows waiting for the next flush, normalized together
+        self._batch: List[Dict] = []
+        self._normalizer = (
+            PriceNormalizer() if any(field in self.fieldnames for field in PRICE_FIELDS) else None
+        )
+
+        existing = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self._open(existing)
+
+    def _open(self, existing: bool) -> None:
+        """Open the underlying file; existing is True when appending to data"""
+        raise NotImplementedError
+
+    def _write_row(self, row: Dict) -> None:
+        """Write one row that already matches the schema"""
+        raise NotImplementedError
+
+    def _file_handle(self):
+        """File object to flush and fsync"""
+        raise NotImplementedError
+
+    def _sync(self) -> None:
+        """Write buffered rows through to disk"""
+        handle = self._file_handle()
+        handle.flush()
+        try:
+            os.fsync(handle.fileno())
+        except (OSError, ValueError) as e:
+            logger.debug(f"Could not fsync {self.path}: {e}")
+
+    def _close(self) -> None:
+        """Close the underlying file once everything is synced"""
+        self._file_handle().close()
+
+    def _row(self, product: Dict) -> Dict:
+        """Fit a product dictionary to the schema"""
+        extra = set(product) - set(self.fieldnames) - self._warned_keys
+        if extra:
+            logger.warning(f"Dropping fields not in the output schema: {', '.join(sorted(extra))}")
+            self._warned_keys.update(extra)
+        return {field: product.get(field, '') for field in self.fieldnames}
+
+    def write(self, product: Dict) -> None:
+        """
+        Write one product
+
+        Args:
+            product: Product dictionary
+        """
+        with self._lock:
+            self._batch.append(product)
+            self.count += 1
+            self._unflushed += 1
+
+            if (self._unflushed >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def flush(self) -> None:
+        """Flush buffered rows and fsync them to disk"""
+        with self._lock:
+            self._flush()
+
+    def _write_batch(self) -> None:
+        """Normalize the rows waiting for a flush and hand them to the back end"""
+        batch, self._batch = self._batch, []
+        if self._normalizer is not None:
+            batch = self._normalizer.normalize(batch)
+        for product in batch:
+            self._write_row(self._row(product))
+
+    def _flush(self) -> None:
+        self._write_batch()
+        self._sync()
+        self.synced = self.count
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Flush remaining rows and close the file"""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush()
+            self._close()
+            self.synced = self.count
+            self._closed = True
+        logger.info(f"Wrote {self.count} products to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvSink(ProductSink):
+    """Write products as CSV rows"""
+
+    def _open(self, existing: bool) -> None:
+        self._file = open(self.path, 'a' if existing else 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+        if not existing:
+            self._writer.writeheader()
+
+    def _write_row(self, row: Dict) -> None:
+        self._writer.writerow(row)
+
+    def _file_handle(self):
+        return self._file
+
+
+class JsonlSink(ProductSink):
+    """Write products as JSON Lines, one object per line"""
+
+    def _open(self, existing: bool) -> None:
+        self._file = open(self.path, 'a' if existing else 'w', encoding='utf-8')
+
+    def _write_row(self, row: Dict) -> None:
+        self._file.write(json.dumps(row, ensure_ascii=False))
+        self._file.write('\n')
+
+    def _file_handle(self):
+        return self._file
+
+
+class GzipJsonlSink(JsonlSink):
+    """Write products as gzip-compressed JSON Lines"""
+
+    def _open(self, existing: bool) -> None:
+        # Appending adds a gzip member; readers decompress the members as one stream
+        self._file = gzip.open(self.path, 'at' if existing else 'wt', encoding='utf-8')
+
+
+class ParquetSink(ProductSink):
+    """
+    Write products to a Parquet file in row groups of row_group_size rows
+
+    Price columns (PRICE_FIELDS) are float64 and every other column is a
+    string column, so a reader can load just the columns it needs.
+
+    A Parquet file is unreadable until its footer is written, so each flush
+    writes its batch to a small complete file in <path>.parts/ and fsyncs
+    it. close() merges the parts (after the rows of an existing file when
+    appending) into full-size row groups under a temporary name and moves
+    the result into place. An interrupted crawl leaves the previous file
+    intact, and a run resumed with append=True merges the parts it left.
+    """
+
+    def __init__(self, path: str, fieldnames: Optional[Sequence[str]] = None,
+                 row_group_size: int = ROW_GROUP_SIZE, compression: str = 'zstd', **kwargs):
+        """
+        Open the sink
+
+        Args:
+            path: Output file path
+            fieldnames: Output columns (defaults to PRODUCT_FIELDS)
+            row_group_size: Rows per row group of the final file
+            compression: Parquet compression codec
+            **kwargs: Passed to ProductSink
+        """
+        if not PYARROW_INSTALLED:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        self.row_group_size = max(1, row_group_size)
+        self.compression = compression
+        super().__init__(path, fieldnames=fieldnames, **kwargs)
+
+    def _open(self, existing: bool) -> None:
+        self._schema = pa.schema([
+            (field, pa.float64() if field in PRICE_FIELDS else pa.string()) for field in self.fieldnames
+        ])
+        self._columns: Dict[str, List] = {field: [] for field in self.fieldnames}
+        self._existing = existing
+        self._parts_dir = f"{self.path}.parts"
+        if os.path.isdir(self._parts_dir):
+            # Keep the parts of an interrupted run only when resuming it
+            for name in os.listdir(self._parts_dir):
+                if not self.append or not name.endswith('.parquet'):
+                    os.remove(os.path.join(self._parts_dir, name))
+        os.makedirs(self._parts_dir, exist_ok=True)
+        self._parts = len(self._part_paths())
+
+    def _part_paths(self) -> List[str]:
+        return sorted(
+            os.path.join(self._parts_dir, name) for name in os.listdir(self._parts_dir)
+            if name.endswith('.parquet')
+        )
+
+    def _write_row(self, row: Dict) -> None:
+        for field in self.fieldnames:
+            value = row[field]
+            if value is None or (value == '' and field in PRICE_FIELDS):
+                value = None
+            elif field in PRICE_FIELDS:
+                value = float(value)
+            else:
+                value = str(value)
+            self._columns[field].append(value)
+
+    def _file_handle(self):
+        return None
+
+    def _sync(self) -> None:
+        if not self._columns[self.fieldnames[0]]:
+            return
+        table = pa.table(self._columns, schema=self._schema)
+        self._parts += 1
+        part = os.path.join(self._parts_dir, f"part-{self._parts:06d}.parquet")
+        with open(f"{part}.tmp", 'wb') as f:
+            pq.write_table(table, f, compression=self.compression)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{part}.tmp", part)
+        self._columns = {field: [] for field in self.fieldnames}
+
+    def _conform(self, table: 'pa.Table') -> 'pa.Table':
+        """Cast a table read back from disk to this sink's schema"""
+        columns = [
+            table.column(field.name).cast(field.type) if field.name in table.column_names
+            else pa.nulls(table.num_rows, field.type)
+            for field in self._schema
+        ]
+        return pa.Table.from_arrays(columns, schema=self._schema)
+
+    def _close(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        sources = ([self.path] if self._existing else []) + self._part_paths()
+        pending: List = []
+        buffered = 0
+        with pq.ParquetWriter(tmp_path, self._schema, compression=self.compression) as writer:
+            for source in sources:
+                for batch in pq.ParquetFile(source).iter_batches():
+                    pending.append(self._conform(pa.Table.from_batches([batch])))
+                    buffered += batch.num_rows
+                    if buffered >= self.row_group_size:
+                        table = pa.concat_tables(pending)
+                        full = buffered - buffered % self.row_group_size
+                        writer.write_table(table.slice(0, full), row_group_size=self.row_group_size)
+                        pending = [table.slice(full)]
+                        buffered -= full
+            if buffered:
+                writer.write_table(pa.concat_tables(pending), row_group_size=self.row_group_size)
+        os.replace(tmp_path, self.path)
+
+        for part in self._part_paths():
+            os.remove(part)
+        os.rmdir(self._parts_dir)
+
+
+class SqliteSink(ProductSink):
+    """
+    Write products to a SQLite table keyed by URL
+
+    Rows are upserted in one transaction per batch, so a product scraped
+    again replaces its earlier row instead of adding a duplicate.
+    """
+
+    TABLE = 'products'
+
+    def _open(self, existing: bool) -> None:
+        if 'url' not in self.fieldnames:
+            raise ValueError("SQLite output needs a 'url' column")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        columns = ', '.join(
+            f'"{field}" TEXT PRIMARY KEY' if field == 'url' else f'"{field}" {self._type(field)}'
+            for field in self.fieldnames
+        )
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS {self.TABLE} ({columns})')
+        known = {row[1] for row in self._conn.execute(f'PRAGMA table_info({self.TABLE})')}
+        for field in self.fieldnames:
+            if field not in known:
+                self._conn.execute(f'ALTER TABLE {self.TABLE} ADD COLUMN "{field}" {self._type(field)}')
+        if not existing:
+            self._conn.execute(f'DELETE FROM {self.TABLE}')
+        self._conn.commit()
+
+        names = ', '.join(f'"{field}"' for field in self.fieldnames)
+        updates = ', '.join(f'"{field}" = excluded."{field}"' for field in self.fieldnames if field != 'url')
+        self._upsert = (
+            f'INSERT INTO {self.TABLE} ({names}) VALUES ({", ".join("?" * len(self.fieldnames))}) '
+            f'ON CONFLICT(url) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING')
+        )
+        self._rows: List[tuple] = []
+
+    @staticmethod
+    def _type(field: str) -> str:
+        return 'REAL' if field in PRICE_FIELDS else 'TEXT'
+
+    def _write_row(self, row: Dict) -> None:
+        self._rows.append(tuple(
+            None if field in PRICE_FIELDS and row[field] == '' else row[field] for field in self.fieldnames
+        ))
+
+    def _file_handle(self):
+        return self._conn
+
+    def _sync(self) -> None:
+        if self._rows:
+            with self._conn:
+                self._conn.executemany(self._upsert, self._rows)
+            self._rows = []
+
+    def _close(self) -> None:
+        self._conn.close()
+
+
+def is_database_url(path: str) -> bool:
+    """Whether an output path is a PostgreSQL connection URL"""
+    return urlsplit(path).scheme.lower() in DATABASE_SCHEMES
+
+
+def _redact(dsn: str) -> str:
+    """Connection URL without its password, for logs"""
+    parts = urlsplit(dsn)
+    if parts.password is None:
+        return dsn
+    netloc = f"{parts.username}:***@{parts.hostname}" + (f":{parts.port}" if parts.port else '')
+    return urlunsplit(parts._replace(netloc=netloc))
+
+
+def _quote(name: str) -> str:
+    """Quote a (possibly schema-qualified) SQL identifier"""
+    return '.'.join('"' + part.replace('"', '""') + '"' for part in name.split('.'))
+
+
+def _copy_value(value) -> str:
+    """Encode one value for COPY ... FROM STDIN in text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, float):
+        return repr(value)
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+_pools: Dict[str, 'psycopg2.pool.ThreadedConnectionPool'] = {}
+_pools_lock = threading.Lock()
+
+
+def connection_pool(dsn: str) -> 'psycopg2.pool.ThreadedConnectionPool':
+    """
+    Shared connection pool for a database, opened on first use
+
+    Args:
+        dsn: PostgreSQL connection URL
+
+    Returns:
+        A psycopg2 ThreadedConnectionPool
+    """
+    with _pools_lock:
+        pool = _pools.get(dsn)
+        if pool is None or pool.closed:
+            pool = psycopg2.pool.ThreadedConnectionPool(1, POOL_SIZE, dsn)
+            _pools[dsn] = pool
+        return pool
+
+
+def close_pools() -> None:
+    """Close every shared PostgreSQL connection pool"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
+
+
+class PostgresSink(ProductSink):
+    """
+    Write products to a PostgreSQL table keyed by URL or SKU
+
+    Each flush is one transaction on a pooled connection: the batch is
+    COPYed into a temporary staging table and merged into the target table
+    with a single INSERT ... ON CONFLICT, so loading a catalog costs one
+    round trip per batch instead of one per row. The table (and any column
+    missing from it) is created on first use, with an updated_at column
+    that records when each row was last written. Existing rows are never
+    deleted; append has no effect.
+    """
+
+    def __init__(self, path: str, fieldnames: Optional[Sequence[str]] = None,
+                 table: str = 'scraped_products', key: str = 'url', pool=None,
+                 flush_every: int = 1000, **kwargs):
+        """
+        Open the sink
+
+        Args:
+            path: PostgreSQL connection URL, e.g. postgresql://user@host/db
+            fieldnames: Output columns (defaults to PRODUCT_FIELDS)
+            table: Target table, optionally schema-qualified
+            key: Column that identifies a product ('url' or 'sku'); rows
+                without a value for it are skipped
+            pool: psycopg2 connection pool to use instead of the shared one
+            flush_every: Rows per COPY batch and transaction
+            **kwargs: Passed to ProductSink
+        """
+        if not PSYCOPG2_INSTALLED:
+            raise ImportError("PostgreSQL output needs psycopg2: pip install psycopg2-binary")
+        self.dsn = path
+        self.table = table
+        self.key = key
+        self._pool = pool
+        self.skipped = 0
+        super().__init__(_redact(path), fieldnames=fieldnames, flush_every=flush_every, **kwargs)
+
+    def _open(self, existing: bool) -> None:
+        if self.key not in self.fieldnames:
+            raise ValueError(f"PostgreSQL output needs a '{self.key}' column")
+        if self._pool is None:
+            self._pool = connection_pool(self.dsn)
+
+        table = _quote(self.table)
+        columns = ', '.join(f'{_quote(field)} {self._type(field)}' for field in self.fieldnames)
+        index = _quote(f"{self.table.split('.')[-1]}_{self.key}_key")
+        statements = [
+            f'CREATE TABLE IF NOT EXISTS {table} ({columns}, updated_at TIMESTAMPTZ NOT NULL DEFAULT now())',
+        ] + [
+            f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {_quote(field)} {self._type(field)}'
+            for field in self.fieldnames
+        ] + [
+            f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()',
+            f'CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} ({_quote(self.key)})',
+        ]
+        self._run(statements)
+
+        names = ', '.join(_quote(field) for field in self.fieldnames)
+        key = _quote(self.key)
+        updates = ', '.join(
+            f'{_quote(field)} = EXCLUDED.{_quote(field)}' for field in self.fieldnames if field != self.key
+        )
+        self._staging = _quote(f"{self.table.split('.')[-1]}_staging")
+        self._create_staging = (
+            f'CREATE TEMP TABLE {self._staging} (_row INTEGER, {columns}) ON COMMIT DROP'
+        )
+        self._copy = f'COPY {self._staging} (_row, {names}) FROM STDIN'
+        # DISTINCT ON keeps the last row of a key scraped twice in one batch
+        self._upsert = (
+            f'INSERT INTO {table} ({names}, updated_at) '
+            f'SELECT DISTINCT ON ({key}) {names}, now() FROM {self._staging} '
+            f"WHERE {key} IS NOT NULL AND {key} NOT IN ('', 'N/A') ORDER BY {key}, _row DESC "
+            f'ON CONFLICT ({key}) DO UPDATE SET '
+            + (f'{updates}, ' if updates else '') + 'updated_at = EXCLUDED.updated_at'
+        )
+        self._rows: List[Dict] = []
+
+    @staticmethod
+    def _type(field: str) -> str:
+        return 'DOUBLE PRECISION' if field in PRICE_FIELDS else 'TEXT'
+
+    def _run(self, statements: Sequence[str]) -> None:
+        """Run statements in one transaction on a pooled connection"""
+        conn = self._pool.getconn()
+        try:
+            with conn, conn.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+        finally:
+            self._pool.putconn(conn)
+
+    def _write_row(self, row: Dict) -> None:
+        self._rows.append(row)
+
+    def _file_handle(self):
+        return None
+
+    def _sync(self) -> None:
+        if not self._rows:
+            return
+        buffer = io.StringIO()
+        for number, row in enumerate(self._rows):
+            values = [str(number)] + [
+                _copy_value(None if field in PRICE_FIELDS and row[field] == '' else row[field])
+                for field in self.fieldnames
+            ]
+            buffer.write('\t'.join(values))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        conn = self._pool.getconn()
+        try:
+            # One transaction per batch: the staging table is dropped on commit
+            with conn, conn.cursor() as cursor:
+                cursor.execute(self._create_staging)
+                cursor.copy_expert(self._copy, buffer)
+                cursor.execute(self._upsert)
+                written = cursor.rowcount
+        finally:
+            self._pool.putconn(conn)
+
+        skipped = len(self._rows) - written
+        if skipped > 0:
+            self.skipped += skipped
+            logger.debug(f"Skipped {skipped} rows without a {self.key} or repeated in the batch")
+        self._rows = []
+
+    def _close(self) -> None:
+        # The connection goes back to the pool; close_pools() closes it
+        pass
+
+
+# Sink classes by file extension
+SINKS = {
+    '.csv': CsvSink,
+    '.jsonl': JsonlSink,
+    '.ndjson': JsonlSink,
+    '.jsonl.gz': GzipJsonlSink,
+    '.ndjson.gz': GzipJsonlSink,
+    '.parquet': ParquetSink,
+    '.db': SqliteSink,
+    '.sqlite': SqliteSink,
+    '.sqlite3': SqliteSink,
+}
+
+
+def sink_extension(path: str) -> str:
+    """
+    Output extension of a path, e.g. '.jsonl.gz'
+
+    Args:
+        path: Output file path
+
+    Returns:
+        The longest extension in SINKS the path ends with, or its last
+        extension if none matches
+    """
+    name = path.lower()
+    for extension in sorted(SINKS, key=len, reverse=True):
+        if name.endswith(extension):
+            return path[len(path) - len(extension):]
+    return os.path.splitext(path)[1]
+
+
+def sink_class(path: str) -> Type[ProductSink]:
+    """
+    Sink class for a file's extension (CSV for unknown extensions)
+
+    Args:
+        path: Output file path, or a postgresql:// connection URL
+
+    Returns:
+        ProductSink subclass
+    """
+    if is_database_url(path):
+        return PostgresSink
+    return SINKS.get(sink_extension(path).lower(), CsvSink)
+
+
+def open_sink(path: str, fieldnames: Optional[Sequence[str]] = None, **kwargs) -> ProductSink:
+    """
+    Open the sink matching a file's extension (CSV for unknown extensions)
+
+    Args:
+        path: Output file path, or a postgresql:// connection URL
+        fieldnames: Output columns (defaults to PRODUCT_FIELDS)
+        **kwargs: Passed to the sink (flush_every, flush_interval, append;
+            table and key for PostgreSQL)
+
+    Returns:
+        An open ProductSink
+    """
+    return sink_class(path)(path, fieldnames=fieldnames, **kwargs)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Sitemap Discovery - find product URLs from robots.txt and XML sitemaps
+
+This module handles:
+- Reading Sitemap: lines from robots.txt (falling back to /sitemap.xml)
+- Following sitemap indexes, preferring product sitemaps when the index
+  names them (e.g. sitemap_products_1.xml)
+- Streaming plain and gzipped sitemaps through an incremental XML parser
+  that discards each <url> once read, so memory stays constant no matter
+  how many URLs a sitemap lists
+- Parsing <lastmod> so unchanged products can be skipped
+
+Usage:
+    reader = SitemapReader(http_fetcher)
+    for entry in reader.entries(reader.discover('https://example.com')):
+        print(entry.loc, entry.lastmod)
+"""
+
+import gzip
+import logging
+import re
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+from urllib.parse import urljoin, urlsplit
+
+
+logger = logging.getLogger(__name__)
+
+# Child sitemaps of an index whose URL contains one of these are preferred
+PRODUCT_SITEMAP_HINTS = ('product', 'item', 'catalog')
+
+# Maximum number of sitemap files read for one site
+MAX_SITEMAPS = 500
+
+_ROBOTS_SITEMAP_RE = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+class SitemapEntry(NamedTuple):
+    """A <url> entry of a sitemap"""
+
+    loc: str
+    lastmod: Optional[datetime]
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a W3C datetime from <lastmod>
+
+    Date-only values count as the end of that day, so a page changed later
+    on the same day is never mistaken for unchanged.
+
+    Args:
+        value: Text such as '2024-05-01' or '2024-05-01T10:00:00+02:00'
+
+    Returns:
+        Timezone-aware datetime in UTC, or None if missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        if len(value) == 10:
+            day = datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            return day + timedelta(days=1)
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def sitemaps_from_robots(robots_txt: str, base_url: str) -> List[str]:
+    """
+    Read the Sitemap: lines of a robots.txt file
+
+    Args:
+        robots_txt: robots.txt content
+        base_url: URL relative sitemap locations are resolved against
+
+    Returns:
+        Absolute sitemap URLs in file order
+    """
+    return [urljoin(base_url, url) for url in _ROBOTS_SITEMAP_RE.findall(robots_txt)]
+
+
+def _local(tag: str) -> str:
+    """Tag name without its XML namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _is_product_sitemap(url: str) -> bool:
+    """Whether a child sitemap's file name suggests it lists products"""
+    # "sitemap" itself contains "item"
+    name = urlsplit(url).path.rsplit('/', 1)[-1].lower().replace('sitemap', '')
+    return any(hint in name for hint in PRODUCT_SITEMAP_HINTS)
+
+
+class _GzipAwareStream:
+    """Decompress a response body on the fly if it is gzipped"""
+
+    def __init__(self, raw):
+        head = raw.read(2)
+        if head == _GZIP_MAGIC:
+            self._stream = gzip.GzipFile(fileobj=_Prefixed(head, raw))
+        else:
+            self._stream = _Prefixed(head, raw)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+
+class _Prefixed:
+    """A file-like object that returns some already-read bytes first"""
+
+    def __init__(self, prefix: bytes, raw):
+        self._prefix = prefix
+        self._raw = raw
+
+    def read(self, size: int = -1) -> bytes:
+        if not self._prefix:
+            return self._raw.read(size)
+        if size is None or size < 0:
+            data, self._prefix = self._prefix + self._raw.read(), b''
+            return data
+        data, self._prefix = self._prefix[:size], self._prefix[size:]
+        if len(data) < size:
+            data += self._raw.read(size - len(data))
+        return data
+
+
+class SitemapReader:
+    """Stream product URLs out of a site's sitemaps"""
+
+    def __init__(self, fetcher, max_sitemaps: int = MAX_SITEMAPS):
+        """
+        Initialize the reader
+
+        Args:
+            fetcher: HttpFetcher; requests go through its rate limiter
+            max_sitemaps: Maximum number of sitemap files to read
+        """
+        self.fetcher = fetcher
+        self.max_sitemaps = max_sitemaps
+        self.sitemaps_read = 0
+        self.urls_read = 0
+
+    def discover(self, base_url: str) -> List[str]:
+        """
+        Find a site's sitemaps from robots.txt, or guess /sitemap.xml
+
+        Args:
+            base_url: Any URL of the site
+
+        Returns:
+            Sitemap URLs
+        """
+        parts = urlsplit(base_url)
+        root = f"{parts.scheme}://{parts.netloc}/"
+        try:
+            response = self.fetcher.get(urljoin(root, 'robots.txt'))
+            sitemaps = sitemaps_from_robots(response.text, root)
+            if sitemaps:
+                return sitemaps
+        except Exception as e:
+            logger.debug(f"Could not read robots.txt for {root}: {e}")
+
+        return [urljoin(root, 'sitemap.xml')]
+
+    def entries(self, sitemap_urls: Iterable[str]) -> Iterator[SitemapEntry]:
+        """
+        Yield every <url> entry reachable from the given sitemaps
+
+        Sitemap indexes are followed breadth first. When an index lists
+        child sitemaps that look like product sitemaps, only those are read.
+
+        Args:
+            sitemap_urls: Sitemap or sitemap index URLs
+
+        Yields:
+            SitemapEntry for each <url>
+        """
+        queue = deque(sitemap_urls)
+        seen = set(queue)
+
+        while queue and self.sitemaps_read < self.max_sitemaps:
+            sitemap_url = queue.popleft()
+            children: List[str] = []
+            try:
+                for kind, entry in self._parse(sitemap_url):
+                    if kind == 'sitemap':
+                        children.append(entry.loc)
+                    else:
+                        self.urls_read += 1
+                        yield entry
+            except Exception as e:
+                logger.warning(f"Could not read sitemap {sitemap_url}: {e}")
+                continue
+
+            product_children = [url for url in children if _is_product_sitemap(url)]
+            for child in product_children or children:
+                if child not in seen:
+                    seen.add(child)
+                    queue.append(child)
+
+    def _parse(self, sitemap_url: str) -> Iterator:
+        """Yield ('url' | 'sitemap', SitemapEntry) pairs from one sitemap file"""
+        logger.info(f"Reading sitemap: {sitemap_url}")
+        self.sitemaps_read += 1
+
+        response = self.fetcher.get(sitemap_url, stream=True)
+        try:
+            response.raw.decode_content = True
+            stream = _GzipAwareStream(response.raw)
+
+            root = None
+            depth = 0
+            loc = lastmod = None
+            for event, element in ElementTree.iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = element
+                    depth += 1
+                    continue
+
+                depth -= 1
+                tag = _local(element.tag)
+                # Only direct children of <url>/<sitemap>: image and video
+                # extensions have a <loc> of their own
+                if depth == 2 and tag == 'loc':
+                    loc = (element.text or '').strip()
+                elif depth == 2 and tag == 'lastmod':
+                    lastmod = element.text
+                elif depth == 1 and tag in ('url', 'sitemap'):
+                    if loc:
+                        yield tag, SitemapEntry(urljoin(sitemap_url, loc), parse_lastmod(lastmod))
+                    loc = lastmod = None
+                    # Drop everything parsed so far: memory stays constant
+                    root.clear()
+        finally:
+            response.close()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Crawl State - crash-safe checkpoints so an interrupted crawl can resume
+
+This module handles:
+- A SQLite database in WAL mode holding the crawl frontier, completed and
+  failed URLs, and the listing-page cursor
+- Batching state writes in memory and committing them in one transaction
+  every few hundred updates or seconds, so checkpointing stays off the hot
+  path
+- The content fingerprint and product of every finished page, so the next
+  run can re-crawl incrementally (see scraper_delta)
+
+Usage:
+    with CrawlStateStore('products.csv.state.db') as state:
+        state.add_urls(urls)
+        state.mark_done(url)
+        pending = state.pending_urls()
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Frontier statuses
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL,
+    fingerprint TEXT,
+    product TEXT
+);
+CREATE INDEX IF NOT EXISTS frontier_status ON frontier (status, seq);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class CrawlStateStore:
+    """Persistent crawl state with batched writes"""
+
+    def __init__(self, path: str, batch_size: int = 200, flush_interval: float = 2.0):
+        """
+        Open (or create) the state database
+
+        Args:
+            path: SQLite database file
+            batch_size: Buffered updates that trigger a commit
+            flush_interval: Seconds after which buffered updates are committed
+        """
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(frontier)')}
+        for column in ('fingerprint', 'product'):
+            if column not in columns:
+                # State files written before incremental crawls existed
+                self._conn.execute(f'ALTER TABLE frontier ADD COLUMN {column} TEXT')
+        self._conn.commit()
+
+        self._lock = threading.RLock()
+        self._new_urls: List[Tuple[str, int, float]] = []
+        self._updates: List[Tuple] = []
+        self._meta: dict = {}
+        self._last_flush = time.monotonic()
+
+        row = self._conn.execute('SELECT COALESCE(MAX(seq), 0) FROM frontier').fetchone()
+        self._next_seq = row[0] + 1
+
+    def reset(self) -> None:
+        """Forget all state, e.g. when starting a fresh crawl"""
+        with self._lock:
+            self._new_urls.clear()
+            self._updates.clear()
+            self._meta.clear()
+            self._conn.execute('DELETE FROM frontier')
+            self._conn.execute('DELETE FROM meta')
+            self._conn.commit()
+            self._next_seq = 1
+
+    def add_urls(self, urls: Iterable[str]) -> None:
+        """
+        Add discovered URLs to the frontier (already known URLs are ignored)
+
+        Args:
+            urls: Product URLs in discovery order
+        """
+        now = time.time()
+        with self._lock:
+            for url in urls:
+                self._new_urls.append((url, self._next_seq, now))
+                self._next_seq += 1
+            self._maybe_flush()
+
+    def mark_done(self, url: str, fingerprint: Optional[str] = None, product: Optional[Dict] = None) -> None:
+        """
+        Record that a URL was scraped successfully
+
+        Args:
+            url: Product URL
+            fingerprint: Content fingerprint of the page
+            product: Product dictionary extracted from the page
+        """
+        product_json = json.dumps(product, ensure_ascii=False) if product is not None else None
+        with self._lock:
+            self._updates.append((url, STATUS_DONE, time.time(), None, fingerprint, product_json))
+            self._maybe_flush()
+
+    def mark_failed(self, url: str, error: str = '') -> None:
+        """Record that a URL could not be scraped"""
+        with self._lock:
+            self._updates.append((url, STATUS_FAILED, time.time(), error[:500], None, None))
+            self._maybe_flush()
+
+    def requeue_failed(self) -> int:
+        """
+        Put failed URLs back in the frontier so the next run retries them
+
+        Returns:
+            Number of URLs requeued
+        """
+        with self._lock:
+            self._flush()
+            cursor = self._conn.execute(
+                'UPDATE frontier SET status = ?, error = NULL WHERE status = ?',
+                (STATUS_PENDING, STATUS_FAILED),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        """
+        Store a crawl setting or cursor value (written with the next batch)
+
+        Args:
+            key: Name, e.g. 'listing_url'
+            value: Value, or None to delete it
+        """
+        with self._lock:
+            self._meta[key] = value
+            self._maybe_flush()
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Read a crawl setting or cursor value"""
+        with self._lock:
+            if key in self._meta:
+                value = self._meta[key]
+                return default if value is None else value
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _urls_with_status(self, status: str) -> List[str]:
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(
+                'SELECT url FROM frontier WHERE status = ? ORDER BY seq', (status,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def pending_urls(self) -> List[str]:
+        """URLs discovered but not yet scraped, in discovery order"""
+        return self._urls_with_status(STATUS_PENDING)
+
+    def failed_urls(self) -> List[str]:
+        """URLs whose last attempt failed, in discovery order"""
+        return self._urls_with_status(STATUS_FAILED)
+
+    def urls(self) -> List[str]:
+        """Every URL in the frontier, in discovery order"""
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute('SELECT url FROM frontier ORDER BY seq').fetchall()
+        return [row[0] for row in rows]
+
+    def completed(self, url: str) -> Optional[Tuple[Optional[str], Optional[Dict]]]:
+        """
+        Look up a finished URL
+
+        Args:
+            url: Product URL
+
+        Returns:
+            Tuple of (fingerprint, product), or None if the URL was not
+            scraped successfully
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fingerprint, product FROM frontier WHERE url = ? AND status = ?',
+                (url, STATUS_DONE),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def completed_products(self) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """Yield (url, product) for every finished URL, in discovery order"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, product FROM frontier WHERE status = ? ORDER BY seq', (STATUS_DONE,)
+            ).fetchall()
+        for url, product in rows:
+            yield url, json.loads(product) if product else None
+
+    def counts(self) -> dict:
+        """Number of frontier URLs per status"""
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM frontier GROUP BY status').fetchall()
+        return dict(rows)
+
+    def _maybe_flush(self) -> None:
+        buffered = len(self._new_urls) + len(self._updates) + len(self._meta)
+        if buffered >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush()
+
+    def flush(self) -> None:
+        """Commit all buffered updates"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not (self._new_urls or self._updates or self._meta):
+            self._last_flush = time.monotonic()
+            return
+
+        with self._conn:
+            if self._new_urls:
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO frontier (url, seq, updated) VALUES (?, ?, ?)',
+                    self._new_urls,
+                )
+            if self._updates:
+                self._conn.executemany(
+                    'INSERT INTO frontier (url, seq, status, attempts, updated, error, fingerprint, product) '
+                    'VALUES (?1, (SELECT COALESCE(MAX(seq), 0) + 1 FROM frontier), ?2, 1, ?3, ?4, ?5, ?6) '
+                    'ON CONFLICT(url) DO UPDATE SET status = ?2, attempts = attempts + 1, '
+                    'updated = ?3, error = ?4, fingerprint = COALESCE(?5, fingerprint), '
+                    'product = COALESCE(?6, product)',
+                    self._updates,
+                )
+            for key, value in self._meta.items():
+                if value is None:
+                    self._conn.execute('DELETE FROM meta WHERE key = ?', (key,))
+                else:
+                    self._conn.execute(
+                        'INSERT INTO meta (key, value) VALUES (?, ?) '
+                        'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                        (key, str(value)),
+                    )
+
+        self._new_urls.clear()
+        self._updates.clear()
+        self._meta.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Commit buffered updates and close the database"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
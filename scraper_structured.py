@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Structured Data - read product fields from JSON-LD, microdata and OpenGraph
+
+This module handles:
+- Locating application/ld+json scripts and <meta>/<link> tags with regular
+  expressions, without building a parse tree
+- Finding the schema.org Product (including inside @graph and lists)
+- Mapping offers, brand, image and availability onto the product columns
+- OpenGraph / product:* meta tags and microdata meta/link tags as fallbacks
+
+Usage:
+    fields = extract_structured_data(html, page_url)
+    # {'title': ..., 'price': '1299.00', 'currency': 'PKR', ...}
+"""
+
+import html as html_lib
+import json
+import logging
+import re
+from typing import Dict, Iterator, List
+from urllib.parse import urljoin
+
+from scraper_extract import DESCRIPTION_LIMIT
+
+
+logger = logging.getLogger(__name__)
+
+# Columns only structured data can fill
+STRUCTURED_ONLY_FIELDS = ('currency',)
+
+_LD_JSON_RE = re.compile(
+    r'<script\b[^>]*\btype\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+_META_RE = re.compile(r'<(?:meta|link)\b[^>]*>', re.IGNORECASE)
+_ATTRIBUTE_RE = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+
+# schema.org availability values (after the last '/') to display text
+AVAILABILITY_LABELS = {
+    'instock': "In Stock",
+    'outofstock': "Out of Stock",
+    'soldout': "Out of Stock",
+    'discontinued': "Discontinued",
+    'preorder': "Pre-Order",
+    'presale': "Pre-Order",
+    'backorder': "Backorder",
+    'limitedavailability': "Limited Availability",
+    'onlineonly': "In Stock",
+    'instoreonly': "In Store Only",
+}
+
+# OpenGraph / product:* meta properties to columns, highest priority first
+META_PROPERTIES = {
+    'title': ('og:title',),
+    'description': ('og:description',),
+    'image_url': ('og:image:secure_url', 'og:image'),
+    'price': ('product:price:amount', 'og:price:amount', 'product:sale_price:amount'),
+    'currency': ('product:price:currency', 'og:price:currency', 'product:sale_price:currency'),
+    'availability': ('product:availability', 'og:availability'),
+    'brand': ('product:brand', 'og:brand'),
+    'sku': ('product:retailer_item_id', 'product:sku'),
+    'category': ('product:category',),
+}
+
+# Microdata itemprop values carried in <meta content> / <link href>
+ITEMPROP_FIELDS = {
+    'price': 'price',
+    'priceCurrency': 'currency',
+    'availability': 'availability',
+    'sku': 'sku',
+    'image': 'image_url',
+}
+
+
+def _clean_text(value) -> str:
+    """Collapse whitespace and strip tags from a structured-data string"""
+    if value is None:
+        return ''
+    text = html_lib.unescape(str(value))
+    if '<' in text:
+        text = _TAG_RE.sub(' ', text)
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def _availability_label(value) -> str:
+    """Turn 'https://schema.org/InStock' or 'instock' into display text"""
+    text = _clean_text(value)
+    key = text.rstrip('/').rsplit('/', 1)[-1].replace(' ', '').replace('_', '').lower()
+    return AVAILABILITY_LABELS.get(key, text)
+
+
+def _first(value):
+    """First element of a list value, or the value itself"""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _types(node: Dict) -> List[str]:
+    value = node.get('@type', [])
+    if isinstance(value, str):
+        value = [value]
+    return [str(t).rsplit('/', 1)[-1] for t in value]
+
+
+def _walk(data) -> Iterator[Dict]:
+    """Yield every JSON object in a JSON-LD document"""
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            yield item
+            stack.extend(v for v in item.values() if isinstance(v, (dict, list)))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+
+
+def _ld_json_documents(html: str) -> Iterator:
+    """Parse every JSON-LD script in the page"""
+    for match in _LD_JSON_RE.finditer(html):
+        text = match.group(1).strip()
+        if text.startswith('<!--'):
+            text = text[4:]
+        if text.endswith('-->'):
+            text = text[:-3]
+        try:
+            yield json.loads(text, strict=False)
+        except ValueError as e:
+            logger.debug(f"Skipping invalid JSON-LD block: {e}")
+
+
+def _product_from_ld(node: Dict, base_url: str) -> Dict[str, str]:
+    """Map a schema.org Product object onto product columns"""
+    fields: Dict[str, str] = {}
+
+    name = _clean_text(node.get('name'))
+    if name:
+        fields['title'] = name
+
+    description = _clean_text(node.get('description'))
+    if description:
+        fields['description'] = description[:DESCRIPTION_LIMIT]
+
+    image = _first(node.get('image'))
+    if isinstance(image, dict):
+        image = image.get('url') or image.get('contentUrl')
+    if image:
+        fields['image_url'] = urljoin(base_url, _clean_text(image))
+
+    sku = _clean_text(node.get('sku') or node.get('mpn') or node.get('productID'))
+    if sku:
+        fields['sku'] = sku
+
+    brand = _first(node.get('brand'))
+    if isinstance(brand, dict):
+        brand = brand.get('name')
+    brand = _clean_text(brand)
+    if brand:
+        fields['brand'] = brand
+
+    category = node.get('category')
+    if isinstance(category, list):
+        category = category[-1] if category else None
+    category = _clean_text(category)
+    if category:
+        # Google product taxonomy style "A > B > C": keep the leaf
+        fields['category'] = category.rsplit('>', 1)[-1].strip()
+
+    offers = node.get('offers')
+    if isinstance(offers, list):
+        offers = next((o for o in offers if isinstance(o, dict) and o.get('price') is not None), _first(offers))
+    if isinstance(offers, dict):
+        price = offers.get('price')
+        if price is None:
+            price = offers.get('lowPrice')
+        if price is None and isinstance(offers.get('priceSpecification'), dict):
+            price = offers['priceSpecification'].get('price')
+        if price is not None and _clean_text(price):
+            fields['price'] = _clean_text(price)
+            high = offers.get('highPrice')
+            if offers.get('price') is None and high is not None and str(high) != str(price):
+                fields['price'] = f"{_clean_text(price)}-{_clean_text(high)}"
+
+        currency = offers.get('priceCurrency')
+        if not currency and isinstance(offers.get('priceSpecification'), dict):
+            currency = offers['priceSpecification'].get('priceCurrency')
+        if currency:
+            fields['currency'] = _clean_text(currency)
+
+        if offers.get('availability'):
+            fields['availability'] = _availability_label(offers['availability'])
+
+    return fields
+
+
+def _breadcrumb_names(node: Dict) -> List[str]:
+    """Names in a BreadcrumbList, in position order"""
+    items = node.get('itemListElement')
+    if not isinstance(items, list):
+        return []
+
+    def position(item):
+        try:
+            return float(item.get('position', 0))
+        except (TypeError, ValueError):
+            return 0
+
+    names = []
+    for item in sorted((i for i in items if isinstance(i, dict)), key=position):
+        name = item.get('name')
+        if not name and isinstance(item.get('item'), dict):
+            name = item['item'].get('name')
+        if name:
+            names.append(_clean_text(name))
+
+    return names
+
+
+def _meta_tags(html: str) -> Iterator[Dict[str, str]]:
+    """Yield the attributes of every <meta> and <link> tag"""
+    for match in _META_RE.finditer(html):
+        attributes = {}
+        for name, double, single, bare in _ATTRIBUTE_RE.findall(match.group(0)):
+            attributes[name.lower()] = html_lib.unescape(double or single or bare)
+        yield attributes
+
+
+def extract_structured_data(html: str, base_url: str) -> Dict[str, str]:
+    """
+    Extract product fields from JSON-LD, OpenGraph and microdata meta tags
+
+    JSON-LD takes precedence, then OpenGraph / product:* properties, then
+    microdata carried in <meta itemprop> / <link itemprop> tags.
+
+    Args:
+        html: Page HTML
+        base_url: URL that relative image URLs are resolved against
+
+    Returns:
+        Dictionary with only the fields that were found
+    """
+    fields: Dict[str, str] = {}
+    if not html:
+        return fields
+
+    breadcrumb: List[str] = []
+    for document in _ld_json_documents(html):
+        for node in _walk(document):
+            types = _types(node)
+            if 'BreadcrumbList' in types and not breadcrumb:
+                breadcrumb = _breadcrumb_names(node)
+            elif any(t in ('Product', 'ProductGroup', 'IndividualProduct') for t in types):
+                for field, value in _product_from_ld(node, base_url).items():
+                    fields.setdefault(field, value)
+
+    # The last crumb is often the product itself; the category is the one before
+    if breadcrumb and breadcrumb[-1] == fields.get('title'):
+        breadcrumb = breadcrumb[:-1]
+    if breadcrumb:
+        fields.setdefault('category', breadcrumb[-1])
+
+    # OpenGraph and microdata only fill what JSON-LD left out; skip the scan
+    # when there is nothing left for them to add
+    wanted = set(META_PROPERTIES) | set(ITEMPROP_FIELDS.values())
+    if wanted.issubset(fields):
+        return fields
+
+    properties: Dict[str, str] = {}
+    itemprops: Dict[str, str] = {}
+    for attributes in _meta_tags(html):
+        prop = attributes.get('property') or attributes.get('name')
+        content = attributes.get('content')
+        if prop and content:
+            properties.setdefault(prop.lower(), content)
+
+        itemprop = attributes.get('itemprop')
+        value = attributes.get('content') or attributes.get('href')
+        if itemprop and value and itemprop in ITEMPROP_FIELDS:
+            itemprops.setdefault(ITEMPROP_FIELDS[itemprop], value)
+
+    if 'product' in properties.get('og:type', 'product').lower() or 'product:price:amount' in properties:
+        for field, names in META_PROPERTIES.items():
+            if field in fields:
+                continue
+            for name in names:
+                value = _clean_text(properties.get(name))
+                if value:
+                    fields[field] = value
+                    break
+
+    for field, value in itemprops.items():
+        value = _clean_text(value)
+        if value and field not in fields:
+            fields[field] = value
+
+    if 'image_url' in fields:
+        fields['image_url'] = urljoin(base_url, fields['image_url'])
+    if 'availability' in fields:
+        fields['availability'] = _availability_label(fields['availability'])
+    if 'description' in fields:
+        fields['description'] = fields['description'][:DESCRIPTION_LIMIT]
+
+    return fields
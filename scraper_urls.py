@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+URL Canonicalization - one frontier entry per product page
+
+This module handles:
+- Canonicalizing product URLs: lowercase scheme and host, no default port,
+  fragment or trailing slash, tracking and variant parameters removed and
+  the remaining query sorted
+- Per-site rules loaded from a JSON file (extra parameters to drop or keep,
+  dropping the whole query, lowercasing the path)
+- Compact sets of 64-bit URL hashes (about 16 bytes per URL) that
+  deduplicate millions of URLs; the canonical URL is only the key, pages
+  are fetched under the first spelling the site linked to
+- Reading <link rel="canonical"> so alias pages of one product are
+  recognised
+
+Usage:
+    canonicalizer = UrlCanonicalizer(load_rules('url_rules.json'))
+    frontier = UrlFrontier(canonicalizer)
+    url = frontier.add('https://shop.com/p/rose/?utm_source=x#reviews')
+    # -> 'https://shop.com/p/rose/?utm_source=x'
+    frontier.add('https://shop.com/p/rose/')
+    # -> None (same canonical URL, https://shop.com/p/rose)
+"""
+
+import bisect
+import hashlib
+import heapq
+import json
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import parse_qsl, urldefrag, urlencode, urlsplit, urlunsplit
+
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = frozenset((
+    'gclid', 'gclsrc', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'twclid', 'ttclid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'ref', 'ref_', 'ref_src', 'srsltid', '_hsenc', '_hsmi',
+    # Shopify search and recommendation tracking
+    '_pos', '_sid', '_ss', '_psq', '_fid', '_v', 'pr_prod_strat', 'pr_rec_id', 'pr_rec_pid',
+    'pr_ref_pid', 'pr_seq',
+))
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_', 'hsa_')
+
+# Query parameters that select a variant of the same product page
+VARIANT_PARAMS = frozenset(('variant', 'variant_id'))
+
+# Keys allowed in a site's rules
+RULE_KEYS = ('drop_params', 'keep_params', 'drop_query', 'strip_trailing_slash', 'lowercase_path')
+
+# Hashes buffered in a plain set before being merged into the sorted array
+MIN_BUFFER = 4096
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+_CANONICAL_LINK_RE = re.compile(r'<link\b[^>]*\brel\s*=\s*["\']?canonical\b[^>]*>', re.IGNORECASE)
+_HREF_RE = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+
+
+def url_hash(url: str) -> int:
+    """64-bit hash of a URL"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def canonical_link(html: str) -> Optional[str]:
+    """
+    Find the href of a page's <link rel="canonical">
+
+    Args:
+        html: Page HTML (only the head is needed)
+
+    Returns:
+        The href as written in the page, or None
+    """
+    match = _CANONICAL_LINK_RE.search(html or '')
+    if not match:
+        return None
+    href = _HREF_RE.search(match.group(0))
+    if not href:
+        return None
+    value = next(v for v in href.groups() if v is not None).strip()
+    return value or None
+
+
+class CanonicalRules:
+    """How URLs of one site are canonicalized"""
+
+    __slots__ = RULE_KEYS
+
+    def __init__(self, drop_params: Iterable[str] = (), keep_params: Iterable[str] = (),
+                 drop_query: bool = False, strip_trailing_slash: bool = True,
+                 lowercase_path: bool = False):
+        """
+        Initialize the rules
+
+        Args:
+            drop_params: Query parameters removed on top of the tracking and
+                variant parameters
+            keep_params: Parameters never removed (e.g. 'variant' on sites
+                where each variant has its own page)
+            drop_query: Remove the whole query string
+            strip_trailing_slash: Treat /p/rose/ and /p/rose as one page
+            lowercase_path: Treat the path as case-insensitive
+        """
+        self.drop_params = frozenset(p.lower() for p in drop_params)
+        self.keep_params = frozenset(p.lower() for p in keep_params)
+        self.drop_query = drop_query
+        self.strip_trailing_slash = strip_trailing_slash
+        self.lowercase_path = lowercase_path
+
+    def drops(self, name: str) -> bool:
+        """Whether a query parameter is removed"""
+        name = name.lower()
+        if name in self.keep_params:
+            return False
+        return (
+            name in TRACKING_PARAMS or name in VARIANT_PARAMS or name in self.drop_params
+            or name.startswith(TRACKING_PREFIXES)
+        )
+
+
+def load_rules(path: str) -> Dict[str, CanonicalRules]:
+    """
+    Load per-site canonicalization rules from a JSON file
+
+    The file maps a host (subdomains included) or "*" to its rules, e.g.
+    {"shop.example.com": {"drop_params": ["color"], "keep_params": ["variant"]}}
+
+    Args:
+        path: JSON file
+
+    Returns:
+        Mapping of host to rules
+
+    Raises:
+        ValueError: If the file has unknown keys or is not an object
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must contain an object mapping hosts to rules")
+
+    rules = {}
+    for host, options in data.items():
+        unknown = set(options) - set(RULE_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown URL rule keys for {host}: {', '.join(sorted(unknown))}")
+        rules[host.lower()] = CanonicalRules(**options)
+    return rules
+
+
+class UrlCanonicalizer:
+    """Turn the spellings of a product URL into one canonical URL"""
+
+    def __init__(self, rules: Optional[Dict[str, CanonicalRules]] = None):
+        """
+        Initialize the canonicalizer
+
+        Args:
+            rules: Mapping of host (or "*") to rules; hosts without rules
+                use the defaults
+        """
+        self.rules = dict(rules or {})
+        self.default = self.rules.pop('*', CanonicalRules())
+
+    def rules_for(self, host: str) -> CanonicalRules:
+        """Rules of a host, or of its closest parent domain with rules"""
+        labels = host.split('.')
+        for i in range(len(labels)):
+            rules = self.rules.get('.'.join(labels[i:]))
+            if rules is not None:
+                return rules
+        return self.default
+
+    def canonical(self, url: str) -> str:
+        """
+        Canonicalize a URL
+
+        Args:
+            url: Absolute URL
+
+        Returns:
+            Canonical URL (URLs that are not http(s) are returned unchanged)
+        """
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        if scheme not in _DEFAULT_PORTS:
+            return url
+
+        host = (parts.hostname or '').lower()
+        rules = self.rules_for(host)
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and port != _DEFAULT_PORTS[scheme]:
+            host = f"{host}:{port}"
+
+        path = parts.path or '/'
+        if rules.strip_trailing_slash and len(path) > 1:
+            path = path.rstrip('/') or '/'
+        if rules.lowercase_path:
+            path = path.lower()
+
+        query = ''
+        if not rules.drop_query and parts.query:
+            params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not rules.drops(k)]
+            query = urlencode(sorted(params))
+
+        return urlunsplit((scheme, host, path, query, ''))
+
+
+class CompactHashSet:
+    """
+    Set of 64-bit hashes in about 16 bytes per entry
+
+    New hashes go to a small set; once it grows past a fraction of the
+    total they are merged into a sorted array of unsigned 64-bit integers
+    that is searched by bisection.
+    """
+
+    def __init__(self):
+        self._sorted = array('Q')
+        self._recent = set()
+        self._lock = threading.Lock()
+
+    def __contains__(self, value: int) -> bool:
+        if value in self._recent:
+            return True
+        values = self._sorted
+        i = bisect.bisect_left(values, value)
+        return i < len(values) and values[i] == value
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._recent)
+
+    def add(self, value: int) -> bool:
+        """
+        Add a hash
+
+        Returns:
+            True if it was not in the set before
+        """
+        with self._lock:
+            if value in self:
+                return False
+            self._recent.add(value)
+            if len(self._recent) > max(MIN_BUFFER, len(self._sorted) // 4):
+                self._sorted = array('Q', heapq.merge(self._sorted, sorted(self._recent)))
+                self._recent = set()
+            return True
+
+
+class UrlFrontier:
+    """Deduplicated product URLs, compared by their canonical form but kept as first spelled"""
+
+    def __init__(self, canonicalizer: Optional[UrlCanonicalizer] = None, keep_urls: bool = True):
+        """
+        Initialize the frontier
+
+        Args:
+            canonicalizer: Canonicalizer for URLs added or looked up
+            keep_urls: Keep the URL strings so the frontier can be iterated;
+                without them memory stays at ~16 bytes per URL (the crawl
+                state store keeps the strings on disk instead)
+        """
+        self.canonicalizer = canonicalizer or UrlCanonicalizer()
+        self.keep_urls = keep_urls
+        self._seen = CompactHashSet()
+        # Every spelling added, so repeats of one link are not counted as merges
+        self._spellings = CompactHashSet()
+        self._urls: List[str] = []
+        self.merged = 0
+
+    def add(self, url: str) -> Optional[str]:
+        """
+        Add a URL
+
+        The canonical URL only decides whether the page is new: the URL
+        returned is the one the site linked to, without its fragment, so
+        it is fetched without a redirect (e.g. for a trailing slash the
+        canonical form drops) and its query is sent as written.
+
+        Args:
+            url: Absolute URL in any spelling
+
+        Returns:
+            The URL to fetch if its page is new, else None
+        """
+        canonical = self.canonicalizer.canonical(url)
+        spelling_is_new = self._spellings.add(url_hash(url))
+        if not self._seen.add(url_hash(canonical)):
+            if spelling_is_new:
+                self.merged += 1
+            return None
+        url = urldefrag(url.strip()).url
+        if self.keep_urls:
+            self._urls.append(url)
+        return url
+
+    def drop_urls(self) -> None:
+        """Stop keeping URL strings (they are kept elsewhere, e.g. in the state store)"""
+        self.keep_urls = False
+        self._urls = []
+
+    def __contains__(self, url: str) -> bool:
+        return url_hash(self.canonicalizer.canonical(url)) in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._urls)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Readiness Waits - decide a page is ready from real signals instead of sleeping
+
+This module handles:
+- DOM mutation quiescence (a MutationObserver injected into the page)
+- Network idle (in-flight XHR/fetch calls and the resource timeline)
+- Product-count growth after a "Load More" click
+- Presence of key selectors such as the product title and price
+- Per-site timing statistics that tune each step's timeout
+
+Usage:
+    waiter = PageWaiter(SiteTimings(default_timeout=10))
+    driver.get(url)
+    waiter.wait_for_page(driver, 'product', required=[TITLE_SELECTORS, PRICE_SELECTORS])
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Sequence, Tuple
+from urllib.parse import urlparse
+
+
+logger = logging.getLogger(__name__)
+
+# Injected on first use in each document. Tracks the time of the last DOM
+# mutation and the number of in-flight XHR/fetch requests, then reports the
+# page state along with the count and presence of the requested selectors.
+PROBE_SCRIPT = """
+var w = window.__scraperWait;
+if (!w) {
+  w = window.__scraperWait = {
+    token: Math.random().toString(36).slice(2),
+    last: performance.now(),
+    pending: 0
+  };
+  var touch = function () { w.last = performance.now(); };
+  try {
+    new MutationObserver(touch).observe(document.documentElement || document, {
+      childList: true, subtree: true, characterData: true
+    });
+  } catch (e) {}
+  var send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    w.pending++;
+    this.addEventListener('loadend', function () { w.pending--; touch(); });
+    return send.apply(this, arguments);
+  };
+  if (window.fetch) {
+    var fetch = window.fetch;
+    window.fetch = function () {
+      w.pending++;
+      var done = function () { w.pending--; touch(); };
+      return fetch.apply(this, arguments).then(
+        function (r) { done(); return r; },
+        function (e) { done(); throw e; }
+      );
+    };
+  }
+}
+var countSelector = arguments[0];
+var required = arguments[1] || [];
+var exists = function (selector) {
+  try { return !!document.querySelector(selector); } catch (e) { return false; }
+};
+var count = 0;
+if (countSelector && countSelector.charAt(0) === '@') {
+  var counter = window[countSelector.slice(1)];
+  count = counter ? counter.total : 0;
+} else if (countSelector) {
+  try { count = document.querySelectorAll(countSelector).length; } catch (e) {}
+}
+return {
+  token: w.token,
+  url: location.href,
+  readyState: document.readyState,
+  quietMs: performance.now() - w.last,
+  pending: w.pending,
+  resources: performance.getEntriesByType ? performance.getEntriesByType('resource').length : 0,
+  count: count,
+  present: required.length > 0 && required.every(function (group) { return group.some(exists); })
+};
+"""
+
+
+class SiteTimings:
+    """
+    Track how long each wait step takes per site and derive timeouts
+
+    The timeout for a step is a multiple of the recent 95th percentile,
+    clamped between a floor and a ceiling, so fast sites stop paying for
+    slow ones and slow sites get more time than the defaults.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = 10,
+        min_timeout: float = 2,
+        max_timeout: float = 30,
+        multiplier: float = 2.0,
+        min_samples: int = 5,
+        window: int = 50,
+    ):
+        """
+        Initialize the timing stats
+
+        Args:
+            default_timeout: Timeout used until enough samples exist
+            min_timeout: Lower bound for learned timeouts
+            max_timeout: Upper bound for learned timeouts
+            multiplier: Learned timeout as a multiple of the p95 duration
+            min_samples: Samples needed before timeouts are learned
+            window: Number of recent samples kept per site and step
+        """
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max(max_timeout, default_timeout)
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._timeouts: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def record(self, url: str, step: str, elapsed: float, timed_out: bool = False) -> None:
+        """
+        Record how long a wait step took
+
+        Args:
+            url: Page URL the wait ran on
+            step: Name of the wait step (e.g. 'product', 'load_more')
+            elapsed: Seconds spent waiting
+            timed_out: Whether the wait gave up before the page was ready
+        """
+        key = (self._host(url), step)
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=self.window))
+            samples.append(elapsed)
+            if timed_out:
+                self._timeouts[key] = self._timeouts.get(key, 0) + 1
+
+    def timeout_for(self, url: str, step: str) -> float:
+        """
+        Get the timeout to use for a wait step on a site
+
+        Args:
+            url: Page URL the wait will run on
+            step: Name of the wait step
+
+        Returns:
+            Timeout in seconds
+        """
+        key = (self._host(url), step)
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+
+        if len(samples) < self.min_samples:
+            return self.default_timeout
+
+        p95 = samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)]
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.multiplier))
+
+    def summary(self) -> List[str]:
+        """Describe the learned timings, one line per site and step"""
+        lines = []
+        with self._lock:
+            keys = sorted(self._samples)
+        for host, step in keys:
+            samples = list(self._samples[(host, step)])
+            mean = sum(samples) / len(samples)
+            lines.append(
+                f"{host} {step}: mean {mean:.2f}s over {len(samples)} waits, "
+                f"{self._timeouts.get((host, step), 0)} timeouts, "
+                f"next timeout {self.timeout_for('//' + host, step):.1f}s"
+            )
+        return lines
+
+
+class PageWaiter:
+    """Wait for a page to become ready by polling signals from the browser"""
+
+    def __init__(self, timings: SiteTimings, poll_interval: float = 0.1, quiet_ms: float = 300):
+        """
+        Initialize the waiter
+
+        Args:
+            timings: Per-site timing stats used to pick timeouts
+            poll_interval: Seconds between probes
+            quiet_ms: Milliseconds without DOM mutations or network activity
+                before a page counts as settled
+        """
+        self.timings = timings
+        self.poll_interval = poll_interval
+        self.quiet_ms = quiet_ms
+
+    def probe(self, driver, count_selector: str = '', required: Sequence[Sequence[str]] = ()) -> Dict:
+        """
+        Read the current page state
+
+        Args:
+            driver: WebDriver session
+            count_selector: CSS selector whose matches should be counted, or
+                '@name' to read the running total of the page global
+                window[name] (e.g. the link harvester's) without a query
+            required: Groups of selectors; 'present' is true when every group
+                has at least one matching element
+
+        Returns:
+            Dictionary with token, url, readyState, quietMs, pending,
+            resources, count and present
+        """
+        state = driver.execute_script(PROBE_SCRIPT, count_selector, [list(g) for g in required])
+        return state if isinstance(state, dict) else {}
+
+    def _poll(self, driver, step: str, condition, count_selector: str = '',
+              required: Sequence[Sequence[str]] = ()) -> Tuple[bool, Dict]:
+        """
+        Poll the page until condition(state, idle, elapsed) is true or the step times out
+
+        Returns:
+            Tuple of (ready, last state)
+        """
+        start = time.monotonic()
+        url = ''
+        state: Dict = {}
+        last_resources = None
+        idle_since = start
+
+        while True:
+            try:
+                state = self.probe(driver, count_selector, required)
+            except Exception as e:
+                # The document may be mid-navigation; try again on the next poll
+                logger.debug(f"Readiness probe failed: {e}")
+                state = {}
+
+            now = time.monotonic()
+            url = url or state.get('url', '')
+
+            # Network idle: no XHR/fetch in flight and the resource timeline
+            # has stopped growing for the quiet window
+            resources = state.get('resources')
+            if state.get('pending', 1) > 0 or resources != last_resources:
+                idle_since = now
+            last_resources = resources
+            idle = (
+                state.get('readyState') == 'complete'
+                and (now - idle_since) * 1000 >= self.quiet_ms
+                and state.get('quietMs', 0) >= self.quiet_ms
+            )
+
+            if state and condition(state, idle, now - start):
+                self.timings.record(url, step, now - start)
+                return True, state
+
+            timeout = self.timings.timeout_for(url, step)
+            if now - start >= timeout:
+                self.timings.record(url, step, now - start, timed_out=True)
+                logger.debug(f"Gave up waiting for {step} after {timeout:.1f}s")
+                return False, state
+
+            time.sleep(self.poll_interval)
+
+    def wait_for_page(self, driver, step: str, required: Sequence[Sequence[str]] = ()) -> bool:
+        """
+        Wait until a freshly loaded page is ready
+
+        Ready means every group of required selectors is present, or, if
+        they never appear, that the document is complete and both the DOM
+        and the network have been quiet for the quiet window.
+
+        Args:
+            driver: WebDriver session
+            step: Name of the wait step for timing stats
+            required: Groups of selectors that indicate the content is there
+
+        Returns:
+            True if the page became ready before the timeout
+        """
+        def ready(state, idle, elapsed):
+            if state.get('present') and state.get('readyState') != 'loading':
+                return True
+            return idle
+
+        return self._poll(driver, step, ready, required=required)[0]
+
+    def wait_for_quiet(self, driver, step: str) -> bool:
+        """
+        Wait until the DOM and network have settled, e.g. after scrolling
+
+        Args:
+            driver: WebDriver session
+            step: Name of the wait step for timing stats
+
+        Returns:
+            True if the page settled before the timeout
+        """
+        return self._poll(driver, step, lambda state, idle, elapsed: idle)[0]
+
+    def count(self, driver, selector: str) -> int:
+        """Count elements matching a CSS selector in the current page"""
+        try:
+            return int(self.probe(driver, selector).get('count', 0))
+        except Exception as e:
+            logger.debug(f"Could not count {selector}: {e}")
+            return 0
+
+    def snapshot(self, driver) -> Dict:
+        """Get the current page state, e.g. before clicking a link"""
+        try:
+            return self.probe(driver)
+        except Exception as e:
+            logger.debug(f"Readiness probe failed: {e}")
+            return {}
+
+    def wait_for_growth(self, driver, step: str, selector: str, previous_count: int) -> int:
+        """
+        Wait until more elements match the selector, e.g. after "Load More"
+
+        Returns as soon as the count grows and in-flight requests have
+        finished, or when the page settles without growing.
+
+        Args:
+            driver: WebDriver session
+            step: Name of the wait step for timing stats
+            selector: CSS selector for product elements
+            previous_count: Number of matches before the action
+
+        Returns:
+            Number of matches after waiting
+        """
+        def grown(state, idle, elapsed):
+            if state.get('count', 0) > previous_count and state.get('pending', 0) == 0:
+                return True
+            return idle and state.get('quietMs', 0) >= 2 * self.quiet_ms
+
+        _, state = self._poll(driver, step, grown, count_selector=selector)
+        return int(state.get('count', previous_count))
+
+    def wait_for_navigation(self, driver, step: str, previous: Dict,
+                            required: Sequence[Sequence[str]] = ()) -> bool:
+        """
+        Wait until a click has loaded the next page and it is ready
+
+        Handles both full navigations (a new document) and in-place updates
+        where the click rewrites the DOM without leaving the page.
+
+        Args:
+            driver: WebDriver session
+            step: Name of the wait step for timing stats
+            previous: Page state from snapshot() taken before the click
+            required: Groups of selectors that indicate the content is there
+
+        Returns:
+            True if the next page became ready before the timeout
+        """
+        def navigated(state, idle, elapsed):
+            if state.get('readyState') == 'loading':
+                return False
+            if state.get('token') != previous.get('token'):
+                return bool(state.get('present')) or idle
+            # Same document: require a DOM change after the click, then settle
+            changed = state.get('url') != previous.get('url') or state.get('quietMs', 0) < elapsed * 1000
+            return changed and idle
+
+        return self._poll(driver, step, navigated, required=required)[0]